@@ -3,8 +3,12 @@
 __all__ = [
     "agent",
     "config",
+    "event_stream",
+    "frame_analyzer",
     "hydro_client",
     "llm_providers",
     "mcp_server",
+    "tool_cache",
     "tools",
+    "vision",
 ]
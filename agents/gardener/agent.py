@@ -3,13 +3,12 @@ from __future__ import annotations
 
 import json
 import logging
-from typing import Any, Dict, Iterable, List, Sequence
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
-import httpx
-
-from .config import settings
 from .llm_providers import ChatMessage, LLMProvider, ProviderResponse
 from .tools import ToolRegistry
+from .vision import VisionAPIError, VisionUnavailableError, describe_image
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +21,9 @@ DEFAULT_SYSTEM_PROMPT = (
 # Maximum characters for tool results to prevent context overflow
 MAX_TOOL_RESULT_LENGTH = 10000
 
+# In-process vision descriptions kept by content hash (backend copy is authoritative)
+MAX_CACHED_DESCRIPTIONS = 128
+
 
 class GardenerAgent:
     """Simple tool-aware agent loop."""
@@ -38,13 +40,14 @@ class GardenerAgent:
         self._registry = registry
         self._system_prompt = system_prompt
         self._max_iterations = max_iterations
+        self._descriptions: OrderedDict[str, str] = OrderedDict()
 
     async def run(self, *, messages: Sequence[Dict[str, str] | ChatMessage], temperature: float = 0.2, max_iterations: int | None = None) -> Dict[str, Any]:
         limit = max_iterations if max_iterations is not None else self._max_iterations
         provider_messages: List[ChatMessage] = [ChatMessage(role="system", content=self._system_prompt)]
         provider_messages.extend(self._coerce_messages(messages))
 
-        await self._registry.refresh()
+        await self._registry.ensure_fresh()
         tool_specs = self._registry.all()
         trace: List[Dict[str, Any]] = []
 
@@ -133,12 +136,31 @@ class GardenerAgent:
         if isinstance(result.get("content"), list):
             for item in result["content"]:
                 if isinstance(item, dict) and item.get("type") == "image":
-                    # Extract image data and describe it
-                    image_data = item.get("data", "")
-                    mime_type = item.get("mimeType", "image/jpeg")
-                    logger.info(f"Tool '{tool_name}' returned image ({mime_type}, {len(image_data)} chars base64) - sending to vision API")
-                    description = await self._describe_image(image_data, mime_type)
+                    frame_id = item.get("frame_id")
+                    content_hash = item.get("content_hash")
+                    description = await self._lookup_image_description(frame_id, content_hash)
+                    if description is not None:
+                        logger.info(f"Tool '{tool_name}' image already described (frame {frame_id}) - reusing stored analysis")
+                        return json.dumps({
+                            "status": "success",
+                            "image_description": description,
+                            "note": "Image was analyzed by vision AI earlier; stored description reused"
+                        }, ensure_ascii=False)
+
+                    # Fetch the bytes only now that a vision call is actually needed
+                    try:
+                        image_data, mime_type = await self._registry.resolve_image(item)
+                    except Exception as exc:
+                        logger.warning(f"Failed to load image for '{tool_name}' (frame {frame_id}): {exc}")
+                        return json.dumps({
+                            "status": "error",
+                            "message": f"Camera image could not be loaded: {exc}",
+                        }, ensure_ascii=False)
+                    logger.info(f"Tool '{tool_name}' returned image ({mime_type}, {len(image_data)} bytes) - sending to vision API")
+                    description, model = await self._describe_image(image_data, mime_type)
                     logger.info(f"Vision API returned description for '{tool_name}': {description[:150]}...")
+                    if model:
+                        await self._remember_image_description(frame_id, content_hash, description, model)
                     return json.dumps({
                         "status": "success",
                         "image_description": description,
@@ -157,118 +179,68 @@ class GardenerAgent:
         
         return serialized
     
-    async def _describe_image(self, base64_data: str, mime_type: str) -> str:
-        """Use vision API to describe an image, returning just the description."""
-        
-        vision_prompt = (
-            "Describe this hydroponics/garden camera image concisely. "
-            "Focus on: plant health, growth stage, any visible issues (pests, wilting, discoloration), "
-            "water levels if visible, lighting conditions. Be specific and actionable."
-        )
-        
-        # Try OpenAI first if key is available
-        if settings.openai_api_key:
-            logger.info("Using OpenAI vision API to describe camera image")
-            try:
-                # Clean base64 data - remove any whitespace/newlines
-                clean_base64 = base64_data.replace("\n", "").replace("\r", "").replace(" ", "")
-                
-                # Build the data URL
-                data_url = f"data:{mime_type};base64,{clean_base64}"
-                logger.debug(f"Image data URL length: {len(data_url)}, first 100 chars: {data_url[:100]}")
-                
-                async with httpx.AsyncClient(timeout=60.0) as client:
-                    response = await client.post(
-                        "https://api.openai.com/v1/chat/completions",
-                        headers={
-                            "Authorization": f"Bearer {settings.openai_api_key}",
-                            "Content-Type": "application/json",
-                        },
-                        json={
-                            "model": "gpt-4o",  # Use full gpt-4o for reliable vision
-                            "messages": [
-                                {
-                                    "role": "user",
-                                    "content": [
-                                        {"type": "text", "text": vision_prompt},
-                                        {
-                                            "type": "image_url",
-                                            "image_url": {
-                                                "url": data_url,
-                                                "detail": "auto"  # Let the model decide detail level
-                                            }
-                                        }
-                                    ]
-                                }
-                            ],
-                            "max_tokens": 500,
-                        },
-                    )
-                    
-                    if response.status_code != 200:
-                        error_text = response.text
-                        logger.error(f"OpenAI vision API error {response.status_code}: {error_text}")
-                        return f"Vision API error: {response.status_code} - {error_text[:200]}"
-                    
-                    data = response.json()
-                    description = data["choices"][0]["message"]["content"]
-                    logger.info(f"OpenAI vision description: {description[:100]}...")
-                    return description
-                    
-            except Exception as e:
-                logger.exception("OpenAI vision API failed")
-                return f"OpenAI vision failed: {str(e)}"
-        
-        # Try Grok vision if OpenAI not available
-        if settings.grok_api_key:
-            logger.info("Using Grok vision API to describe camera image")
-            try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.post(
-                        "https://api.x.ai/v1/chat/completions",
-                        headers={
-                            "Authorization": f"Bearer {settings.grok_api_key}",
-                            "Content-Type": "application/json",
-                        },
-                        json={
-                            "model": "grok-vision-beta",
-                            "messages": [
-                                {
-                                    "role": "user",
-                                    "content": [
-                                        {"type": "text", "text": vision_prompt},
-                                        {
-                                            "type": "image_url",
-                                            "image_url": {
-                                                "url": f"data:{mime_type};base64,{base64_data}",
-                                                "detail": "low"
-                                            }
-                                        }
-                                    ]
-                                }
-                            ],
-                            "max_tokens": 300,
-                        },
-                    )
-                    
-                    if response.status_code != 200:
-                        error_text = response.text
-                        logger.error(f"Grok vision API error {response.status_code}: {error_text}")
-                        return f"Grok vision error: {response.status_code} - {error_text[:200]}"
-                    
-                    data = response.json()
-                    description = data["choices"][0]["message"]["content"]
-                    logger.info(f"Grok vision description: {description[:100]}...")
-                    return description
-                    
-            except Exception as e:
-                logger.exception("Grok vision API failed")
-                return f"Grok vision failed: {str(e)}"
-        
-        # No vision API available
-        logger.warning("No vision API keys configured - cannot analyze camera image")
-        return (
-            "Camera image was retrieved but cannot be analyzed - "
-            "no vision API key is configured. Set GARDENER_OPENAI_API_KEY or GARDENER_GROK_API_KEY "
-            "to enable image analysis."
-        )
+    async def _lookup_image_description(self, frame_id: Optional[int], content_hash: Optional[str]) -> Optional[str]:
+        """Return a previously stored description for this frame, if any."""
+
+        if content_hash and content_hash in self._descriptions:
+            self._descriptions.move_to_end(content_hash)
+            return self._descriptions[content_hash]
+
+        if frame_id is None:
+            return None
+        try:
+            stored = await self._registry.client.get_frame_analysis(frame_id, content_hash=content_hash)
+        except Exception as exc:
+            logger.warning(f"Failed to look up stored analysis for frame {frame_id}: {exc}")
+            return None
+        if not stored or not stored.get("notes"):
+            return None
+
+        if content_hash:
+            self._cache_description(content_hash, stored["notes"])
+        return stored["notes"]
+
+    async def _remember_image_description(
+        self,
+        frame_id: Optional[int],
+        content_hash: Optional[str],
+        description: str,
+        model: str,
+    ) -> None:
+        if content_hash:
+            self._cache_description(content_hash, description)
+        if frame_id is None:
+            return
+        try:
+            await self._registry.client.save_frame_analysis(frame_id, analysis_model=model, notes=description)
+        except Exception as exc:
+            logger.warning(f"Failed to persist analysis for frame {frame_id}: {exc}")
+
+    def _cache_description(self, content_hash: str, description: str) -> None:
+        self._descriptions[content_hash] = description
+        self._descriptions.move_to_end(content_hash)
+        while len(self._descriptions) > MAX_CACHED_DESCRIPTIONS:
+            self._descriptions.popitem(last=False)
+
+    async def _describe_image(self, image: Union[bytes, str], mime_type: str) -> Tuple[str, Optional[str]]:
+        """Use vision API to describe an image.
+
+        Returns (description, model). ``model`` is None when no analysis was
+        produced, in which case the description is an error message that
+        must not be persisted.
+        """
+
+        try:
+            return await describe_image(image, mime_type)
+        except VisionUnavailableError:
+            logger.warning("No vision API keys configured - cannot analyze camera image")
+            return (
+                "Camera image was retrieved but cannot be analyzed - "
+                "no vision API key is configured. Set GARDENER_OPENAI_API_KEY or GARDENER_GROK_API_KEY "
+                "to enable image analysis."
+            ), None
+        except VisionAPIError as e:
+            return f"{e.provider} vision error: {e.status_code} - {e.body[:200]}", None
+        except Exception as e:
+            logger.exception("Vision API failed")
+            return f"Vision analysis failed: {str(e)}", None
@@ -3,7 +3,6 @@ from __future__ import annotations
 
 import logging
 from datetime import datetime, timezone
-from pathlib import Path
 from typing import Any, Dict, List, Optional, Sequence
 
 from fastapi import Depends, FastAPI, HTTPException, Request
@@ -12,17 +11,15 @@ from pydantic import BaseModel, Field
 
 from .agent import GardenerAgent
 from .config import settings
+from .event_stream import BackendEventStream
 from .hydro_client import HydroAPIClient
 from .llm_providers import ChatMessage, create_provider
 from .rule_manager import RuleManager
 from .tools import ToolRegistry, build_tool_registry
+from .vision import aclose_http_client
 
 logger = logging.getLogger(__name__)
 
-# Shared rule manager instance (singleton pattern)
-_rules_path = Path(__file__).parent / 'data' / 'automation_rules.json'
-_rule_manager = RuleManager(_rules_path)
-
 app = FastAPI(title="Hydro Gardener", version="0.1.0")
 app.add_middleware(
     CORSMiddleware,
@@ -90,6 +87,13 @@ async def get_registry(request: Request) -> ToolRegistry:
     return registry
 
 
+async def get_rule_manager(request: Request) -> RuleManager:
+    client: HydroAPIClient | None = getattr(request.app.state, "client", None)
+    if not client:
+        raise HTTPException(status_code=503, detail="Hydro client not initialised")
+    return RuleManager(client)
+
+
 @app.on_event("startup")
 async def startup_event() -> None:
     client = HydroAPIClient()
@@ -97,20 +101,30 @@ async def startup_event() -> None:
     provider = create_provider()
     agent = GardenerAgent(provider=provider, registry=registry)
 
+    # Rebuild the tool catalog when the backend reports roster changes
+    event_stream = BackendEventStream()
+    event_stream.subscribe(registry.handle_backend_event)
+    event_stream.start()
+
     app.state.client = client
     app.state.registry = registry
     app.state.provider = provider
     app.state.agent = agent
+    app.state.event_stream = event_stream
 
 
 @app.on_event("shutdown")
 async def shutdown_event() -> None:
+    event_stream = getattr(app.state, "event_stream", None)
+    if event_stream:
+        await event_stream.aclose()
     provider = getattr(app.state, "provider", None)
     if provider:
         await provider.aclose()
     client = getattr(app.state, "client", None)
     if client:
         await client.aclose()
+    await aclose_http_client()
 
 
 @app.get("/health")
@@ -126,7 +140,7 @@ async def health() -> Dict[str, Any]:
 
 @app.get("/tools")
 async def list_tools(registry: ToolRegistry = Depends(get_registry)) -> Dict[str, Any]:
-    await registry.refresh()
+    await registry.ensure_fresh()
     return {
         "tools": [
             {
@@ -139,6 +153,12 @@ async def list_tools(registry: ToolRegistry = Depends(get_registry)) -> Dict[str
     }
 
 
+@app.get("/tools/cache")
+async def tool_cache_stats(registry: ToolRegistry = Depends(get_registry)) -> Dict[str, Any]:
+    """Hit/miss counters for memoized tool results."""
+    return registry.cache_stats()
+
+
 @app.post("/agent/run", response_model=AgentRunResponse)
 async def run_agent(
     payload: AgentRunRequest,
@@ -213,15 +233,18 @@ async def run_agent(
 # Automation Rules Management Endpoints (No AI Protection - For Human Use)
 
 @app.get("/automation/rules")
-async def list_automation_rules() -> Dict[str, Any]:
+async def list_automation_rules(rule_manager: RuleManager = Depends(get_rule_manager)) -> Dict[str, Any]:
     """List all automation rules."""
-    return _rule_manager.list_rules()
+    return await rule_manager.list_rules()
 
 
 @app.post("/automation/rules")
-async def create_automation_rule(rule: AutomationRuleCreate) -> Dict[str, Any]:
+async def create_automation_rule(
+    rule: AutomationRuleCreate,
+    rule_manager: RuleManager = Depends(get_rule_manager),
+) -> Dict[str, Any]:
     """Create a new automation rule (humans can create protected rules)."""
-    result = _rule_manager.create_rule(
+    result = await rule_manager.create_rule(
         name=rule.name,
         conditions=rule.conditions,
         actions=rule.actions,
@@ -239,9 +262,13 @@ async def create_automation_rule(rule: AutomationRuleCreate) -> Dict[str, Any]:
 
 
 @app.patch("/automation/rules/{rule_id}")
-async def update_automation_rule(rule_id: str, rule: AutomationRuleUpdate) -> Dict[str, Any]:
+async def update_automation_rule(
+    rule_id: str,
+    rule: AutomationRuleUpdate,
+    rule_manager: RuleManager = Depends(get_rule_manager),
+) -> Dict[str, Any]:
     """Update an existing automation rule (humans can edit protected rules)."""
-    result = _rule_manager.update_rule(
+    result = await rule_manager.update_rule(
         rule_id=rule_id,
         name=rule.name,
         description=rule.description,
@@ -260,9 +287,12 @@ async def update_automation_rule(rule_id: str, rule: AutomationRuleUpdate) -> Di
 
 
 @app.delete("/automation/rules/{rule_id}")
-async def delete_automation_rule(rule_id: str) -> Dict[str, Any]:
+async def delete_automation_rule(
+    rule_id: str,
+    rule_manager: RuleManager = Depends(get_rule_manager),
+) -> Dict[str, Any]:
     """Delete an automation rule (humans can delete protected rules)."""
-    result = _rule_manager.delete_rule(rule_id, modified_by="api")
+    result = await rule_manager.delete_rule(rule_id, modified_by="api")
 
     if result.get("status") == "error":
         raise HTTPException(status_code=404, detail=result.get("message"))
@@ -271,9 +301,13 @@ async def delete_automation_rule(rule_id: str) -> Dict[str, Any]:
 
 
 @app.post("/automation/rules/{rule_id}/toggle")
-async def toggle_automation_rule(rule_id: str, toggle: AutomationRuleToggle) -> Dict[str, Any]:
+async def toggle_automation_rule(
+    rule_id: str,
+    toggle: AutomationRuleToggle,
+    rule_manager: RuleManager = Depends(get_rule_manager),
+) -> Dict[str, Any]:
     """Enable or disable an automation rule (humans can toggle protected rules)."""
-    result = _rule_manager.toggle_rule(rule_id, toggle.enabled, modified_by="api")
+    result = await rule_manager.toggle_rule(rule_id, toggle.enabled, modified_by="api")
 
     if result.get("status") == "error":
         raise HTTPException(status_code=404, detail=result.get("message"))
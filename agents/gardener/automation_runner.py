@@ -1,61 +1,112 @@
 """Automation engine for hydroponics system.
 
-This module loads automation rules from JSON and evaluates them against
+This module loads automation rules from the backend and evaluates them against
 current sensor data and time conditions. Actions are only executed for
 actuators in AUTO mode.
+
+The engine runs either as a polling loop (``run_loop``) or event driven
+(``run_event_driven``): readings streamed from the backend's ``/ws/sensors``
+socket update a local value cache and only rules that reference a changed
+(device_key, metric_key) are re-evaluated. Time-based rules sit on a
+timeline of their next boundary (see ``schedule``) and the engine sleeps
+until exactly the next one.
+
+Actuator commands go through ``reconciler.ActuatorReconciler``, which tracks
+commands until the device confirms them and enforces minimum on/off times.
+
+Rules are stored in the backend database. The engine fetches them whenever
+a ``rules_changed`` event (or, on full cycles, a version check) says the
+rule set moved on, and compiles them once per load (see ``rule_compiler``)
+into predicates over a flat readings dict, with an index from each reading
+to its dependent rules. Each time a rule starts matching, the firing is
+appended to the backend's execution log.
 """
 
 import asyncio
-import json
 import logging
-from datetime import datetime, time, timezone
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, TYPE_CHECKING
-
-from croniter import croniter
-
-try:
-    import zoneinfo
-except ImportError:
-    from backports import zoneinfo  # Python < 3.9
+from typing import Any, Dict, Iterable, List, Optional, Set, TYPE_CHECKING
 
 from .hydro_client import HydroAPIClient
+from .config import settings
+from .reconciler import ActuatorPlan, ActuatorReconciler, claim_actuator
+from .rule_compiler import CompiledRule, ReadingKey, Readings, RuleIndex
+from .schedule import CronLedger, ScheduleTimeline
+from .windows import WindowStore
 
 if TYPE_CHECKING:
     from .agent import GardenerAgent
+    from .event_stream import BackendEventStream
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_STATE_PATH = Path(__file__).parent / 'data' / 'automation_state.json'
+
 
 class AutomationEngine:
     """Automation engine that evaluates rules and executes actions."""
 
-    def __init__(self, rules_path: Path, hydro_client: HydroAPIClient, agent: Optional['GardenerAgent'] = None):
+    def __init__(
+        self,
+        hydro_client: HydroAPIClient,
+        agent: Optional['GardenerAgent'] = None,
+        state_path: Optional[Path] = None,
+    ):
         """Initialize the automation engine.
 
         Args:
-            rules_path: Path to automation_rules.json file
-            hydro_client: Client for communicating with hydro-app API
+            hydro_client: Client for communicating with hydro-app API (or the
+                in-process equivalent when embedded in the backend)
             agent: Optional GardenerAgent instance for AI actions
+            state_path: Where cron last-fired times are persisted
+                (default: data/automation_state.json)
         """
-        self.rules_path = rules_path
         self.hydro_client = hydro_client
         self.agent = agent
         self.rules: List[Dict[str, Any]] = []
-        self._last_load_time: Optional[datetime] = None
-        self._rule_last_executed: Dict[str, datetime] = {}  # Track cron rule execution times
-
-    def load_rules(self) -> None:
-        """Load automation rules from JSON file."""
+        self._rules_version: Optional[int] = None
+        self._rules_stale = True
+        self.cron_ledger = CronLedger(
+            state_path or DEFAULT_STATE_PATH,
+            catchup_seconds=settings.automation_cron_catchup_seconds,
+        )
+
+        self.index = RuleIndex()
+        self.timeline = ScheduleTimeline()
+        # Rolling windows for windowed conditions; they outlive rule reloads
+        self.windows = WindowStore()
+        self.reconciler = ActuatorReconciler(
+            command_timeout=settings.automation_command_timeout_seconds,
+            max_attempts=settings.automation_command_max_attempts,
+        )
+
+        # Event-driven state: latest value per (device_key, metric_key)
+        self._values: Readings = {}
+        self._changed: Set[ReadingKey] = set()
+        self._snapshot_pending = False
+        self._wakeup = asyncio.Event()
+
+        # Rule ids whose conditions held at their last evaluation, and the
+        # firings not yet sent to the backend's execution log
+        self._matching: Set[str] = set()
+        self._executions: List[Dict[str, Any]] = []
+        # run_ai_agent runs in progress, by rule id
+        self._agent_runs: Dict[str, asyncio.Task] = {}
+
+    async def load_rules(self) -> None:
+        """Fetch and compile automation rules from the backend."""
         try:
-            if not self.rules_path.exists():
-                logger.warning(f"Rules file not found: {self.rules_path}")
-                self.rules = []
-                return
-
-            with open(self.rules_path, 'r') as f:
-                data = json.load(f)
+            data = await self.hydro_client.list_automation_rules()
+        except Exception as e:
+            # Keep the last compiled rules; still stale, so the next cycle retries
+            logger.error(f"Failed to fetch rules: {e}")
+            return
 
+        self._rules_stale = False
+        self._rules_version = data.get('version')
+        try:
             # Extract and sort rules by priority (higher priority first)
             self.rules = sorted(
                 data.get('rules', []),
@@ -63,341 +114,209 @@ class AutomationEngine:
                 reverse=True
             )
 
-            self._last_load_time = datetime.now()
-            
-            # Clean up stale entries in _rule_last_executed for deleted rules
-            current_rule_ids = {rule.get('id') for rule in self.rules if rule.get('id')}
-            stale_ids = set(self._rule_last_executed.keys()) - current_rule_ids
-            for stale_id in stale_ids:
-                del self._rule_last_executed[stale_id]
-            
+            self.index = RuleIndex.build(self.rules, self.cron_ledger, self.windows)
+            self.timeline.rebuild(self.index.time_rules, datetime.now().astimezone())
+
+            # Clean up cron state for deleted rules
+            self.cron_ledger.prune(rule.get('id') for rule in self.rules if rule.get('id'))
+            self.cron_ledger.save()
+
             logger.info(f"Loaded {len(self.rules)} automation rules")
 
         except Exception as e:
             logger.error(f"Failed to load rules: {e}")
             self.rules = []
+            self.index = RuleIndex()
+            self.timeline.rebuild([], datetime.now().astimezone())
 
-    def reload_rules_if_changed(self) -> None:
-        """Reload rules file if it has been modified since last load."""
-        try:
-            if not self.rules_path.exists():
-                return
-
-            mtime = datetime.fromtimestamp(self.rules_path.stat().st_mtime)
-
-            if self._last_load_time is None or mtime > self._last_load_time:
-                logger.info("Rules file changed, reloading...")
-                self.load_rules()
+    async def reload_rules_if_changed(self, check_version: bool = False) -> bool:
+        """Reload rules if they changed since they were compiled.
 
-        except Exception as e:
-            logger.error(f"Error checking rules file modification: {e}")
-
-    async def evaluate_condition(
-        self,
-        condition: Dict[str, Any],
-        sensor_data: Dict[str, List[Dict[str, Any]]]
-    ) -> bool:
-        """Evaluate a single condition.
-
-        Args:
-            condition: Condition dictionary from rule
-            sensor_data: Current sensor readings by device
+        ``rules_changed`` events mark the rules stale as edits happen.
+        ``check_version`` also asks the backend for the current version, for
+        edits made while the event stream was down.
 
         Returns:
-            True if condition is met, False otherwise
-        """
-        cond_type = condition.get('type')
-
-        if cond_type == 'time_range':
-            return self._evaluate_time_range(condition)
-
-        elif cond_type == 'days_of_week':
-            return self._evaluate_days_of_week(condition)
-
-        elif cond_type == 'sensor_threshold':
-            return self._evaluate_sensor_threshold(condition, sensor_data)
-
-        elif cond_type == 'cron':
-            return self._evaluate_cron(condition)
-
-        else:
-            logger.warning(f"Unknown condition type: {cond_type}")
-            return False
-
-    def _evaluate_time_range(self, condition: Dict[str, Any]) -> bool:
-        """Check if current time is within the specified range.
-        
-        Supports optional timezone field - defaults to local time if not specified.
-        """
-        try:
-            start_str = condition.get('start_time', '00:00')
-            end_str = condition.get('end_time', '23:59')
-            tz_name = condition.get('timezone')
-
-            # Parse time strings (HH:MM format)
-            start_hour, start_min = map(int, start_str.split(':'))
-            end_hour, end_min = map(int, end_str.split(':'))
-
-            start_time = time(start_hour, start_min)
-            end_time = time(end_hour, end_min)
-
-            # Get current time in the specified timezone (or local if not specified)
-            if tz_name:
-                try:
-                    tz = zoneinfo.ZoneInfo(tz_name)
-                    current_time = datetime.now(tz).time()
-                except Exception as tz_err:
-                    logger.warning(f"Invalid timezone '{tz_name}', using local time: {tz_err}")
-                    current_time = datetime.now().time()
-            else:
-                current_time = datetime.now().time()
-
-            # Handle overnight ranges (e.g., 22:00 to 06:00)
-            if start_time <= end_time:
-                return start_time <= current_time <= end_time
-            else:
-                return current_time >= start_time or current_time <= end_time
-
-        except Exception as e:
-            logger.error(f"Error evaluating time_range condition: {e}")
-            return False
-
-    def _evaluate_days_of_week(self, condition: Dict[str, Any]) -> bool:
-        """Check if current day is in the specified list."""
-        try:
-            days = condition.get('days', [])
-            current_day = datetime.now().strftime('%A').lower()
-            return current_day in [d.lower() for d in days]
-
-        except Exception as e:
-            logger.error(f"Error evaluating days_of_week condition: {e}")
-            return False
-
-    def _evaluate_cron(self, condition: Dict[str, Any]) -> bool:
-        """Check if current time matches cron expression.
-
-        Cron expressions follow standard format: minute hour day month weekday
-        Example: "0 */2 * * *" = every 2 hours at the top of the hour
-        
-        Uses last_executed tracking to prevent double-firing within the same cron window.
+            True if the rules were reloaded
         """
-        try:
-            expression = condition.get('expression')
-            if not expression:
-                logger.error("Cron condition missing 'expression' field")
-                return False
-
-            # Get rule ID from parent context (will be set during evaluation)
-            rule_id = condition.get('_rule_id', 'unknown')
-
-            now = datetime.now()
-            cron = croniter(expression, now)
-
-            # Get the previous scheduled time
-            prev_time = cron.get_prev(datetime)
-
-            # Check if we haven't executed since the last scheduled time
-            last_executed = self._rule_last_executed.get(rule_id)
-
-            # If we've already executed after this cron trigger, skip
-            if last_executed is not None and last_executed >= prev_time:
-                return False
-
-            # Check if the previous scheduled time is recent enough
-            # Use a tighter window to prevent edge cases
-            time_since_prev = (now - prev_time).total_seconds()
-            
-            # Only trigger if within 90 seconds of the scheduled time
-            # (allows for some clock drift but prevents running stale triggers)
-            if time_since_prev < 90:
-                # Immediately mark as executed to prevent double-firing
-                # This is a side-effect but necessary for correctness
-                self._rule_last_executed[rule_id] = now
-                return True
-
-            return False
-
-        except Exception as e:
-            logger.error(f"Error evaluating cron condition: {e}")
-            return False
-
-    def _evaluate_sensor_threshold(
-        self,
-        condition: Dict[str, Any],
-        sensor_data: Dict[str, List[Dict[str, Any]]]
-    ) -> bool:
-        """Check if sensor value meets the threshold condition."""
-        try:
-            device_key = condition.get('device_key')
-            metric_key = condition.get('metric_key')
-            operator = condition.get('operator')
-            threshold = condition.get('value')
-
-            # Get sensor readings for the device
-            device_readings = sensor_data.get(device_key, [])
-
-            # Find the specific metric
-            metric_reading = None
-            for reading in device_readings:
-                if reading.metric_key == metric_key:
-                    metric_reading = reading
-                    break
-
-            if metric_reading is None:
-                logger.warning(f"Metric {metric_key} not found for device {device_key}")
-                return False
-
-            current_value = metric_reading.value
-
-            # Handle numeric comparisons
-            if operator == 'greater_than':
-                return float(current_value) > float(threshold)
-            elif operator == 'less_than':
-                return float(current_value) < float(threshold)
-            elif operator == 'equals':
-                return float(current_value) == float(threshold)
-            elif operator == 'greater_than_or_equal':
-                return float(current_value) >= float(threshold)
-            elif operator == 'less_than_or_equal':
-                return float(current_value) <= float(threshold)
-            else:
-                logger.warning(f"Unknown operator: {operator}")
-                return False
+        if check_version and not self._rules_stale:
+            try:
+                if await self.hydro_client.get_automation_rules_version() != self._rules_version:
+                    self._rules_stale = True
+            except Exception as e:
+                logger.error(f"Error checking rules for changes: {e}")
 
-        except Exception as e:
-            logger.error(f"Error evaluating sensor_threshold condition: {e}")
+        if not self._rules_stale:
             return False
+        logger.info("Automation rules changed, reloading...")
+        await self.load_rules()
+        return not self._rules_stale
 
-    async def evaluate_rule(
-        self,
-        rule: Dict[str, Any],
-        sensor_data: Dict[str, List[Dict[str, Any]]]
-    ) -> bool:
-        """Evaluate all conditions for a rule.
+    def evaluate_rule(self, rule: CompiledRule, now: Optional[datetime] = None) -> bool:
+        """Evaluate a compiled rule against the value cache.
 
         Args:
-            rule: Rule dictionary
-            sensor_data: Current sensor readings
+            rule: Compiled rule from ``self.index``
+            now: Evaluation time (defaults to the current local time)
 
         Returns:
             True if all conditions are met, False otherwise
         """
-        conditions = rule.get('conditions', {})
-        rule_id = rule.get('id', 'unknown')
+        return rule.predicate(self._values, now or datetime.now().astimezone())
 
-        # Handle all_of logic (AND)
-        all_of = conditions.get('all_of', [])
-        for condition in all_of:
-            # Inject rule_id for cron condition tracking
-            condition['_rule_id'] = rule_id
-            if not await self.evaluate_condition(condition, sensor_data):
-                return False
-
-        # Handle any_of logic (OR) - future expansion
-        any_of = conditions.get('any_of', [])
-        if any_of:
-            any_met = False
-            for condition in any_of:
-                # Inject rule_id for cron condition tracking
-                condition['_rule_id'] = rule_id
-                if await self.evaluate_condition(condition, sensor_data):
-                    any_met = True
-                    break
-            if not any_met:
-                return False
-
-        return True
-
-    async def execute_actions(self, rule: Dict[str, Any]) -> None:
+    async def execute_actions(
+        self,
+        rule: Dict[str, Any],
+        plan: Optional[ActuatorPlan] = None,
+        run_agents: bool = True,
+    ) -> None:
         """Execute actions for a rule.
 
-        Only executes actions for actuators in AUTO mode.
+        ``set_actuator`` actions are collected into ``plan`` and sent together
+        by ``apply_actuator_plan`` at the end of the cycle. Without a plan they
+        are sent straight away. ``run_ai_agent`` actions start a background
+        run and do not hold up the cycle.
 
         Args:
             rule: Rule dictionary with actions
+            plan: Desired actuator states collected for the current cycle
+            run_agents: Whether to start ``run_ai_agent`` actions (the engine
+                only does so when the rule starts matching)
         """
         actions = rule.get('actions', [])
         rule_name = rule.get('name', 'unknown')
         rule_id = rule.get('id', 'unknown')
 
-        actions_executed = False
+        own_plan = plan is None
+        if plan is None:
+            plan = {}
 
         for action in actions:
             action_type = action.get('type')
 
             if action_type == 'set_actuator':
-                await self._execute_set_actuator(action, rule_name)
-                actions_executed = True
+                self._plan_set_actuator(plan, action, rule)
 
             elif action_type == 'run_ai_agent':
-                await self._execute_run_ai_agent(action, rule_name, rule_id)
-                actions_executed = True
+                if run_agents:
+                    self._start_agent_run(action, rule_name, rule_id)
 
             else:
                 logger.warning(f"Unknown action type: {action_type}")
-        
-        # Note: Cron execution is tracked in _evaluate_cron() to prevent double-firing
 
-    async def _execute_set_actuator(self, action: Dict[str, Any], rule_name: str) -> None:
-        """Execute a set_actuator action.
+        if own_plan:
+            await self.apply_actuator_plan(plan)
+
+    def _plan_set_actuator(self, plan: ActuatorPlan, action: Dict[str, Any], rule: Dict[str, Any]) -> None:
+        """Record a set_actuator action, keeping the first (highest-priority) rule's state.
 
         Args:
+            plan: Desired actuator states collected for the current cycle
             action: Action dictionary
-            rule_name: Name of the rule (for logging)
-        
-        Mode logic: Automation rules can only control actuators in AUTO mode.
-        MANUAL mode means user has taken emergency control.
+            rule: Rule the action belongs to
+        """
+        claimed = claim_actuator(plan, action, rule)
+        if claimed is not None:
+            logger.info(
+                f"Rule '{rule.get('name', 'unknown')}': {action.get('device_key')}:{action.get('actuator_key')} "
+                f"-> '{action.get('state')}' overridden by higher-priority rule "
+                f"'{claimed.rule_name}' ('{claimed.state}')"
+            )
+
+    async def apply_actuator_plan(self, plan: ActuatorPlan) -> None:
+        """Merge one cycle's desired actuator states and reconcile them.
+
+        Args:
+            plan: Desired actuator states collected for the current cycle
         """
+        self.reconciler.update(plan)
+        await self.reconcile_actuators()
+
+    async def reconcile_actuators(self) -> None:
+        """Send commands for desired actuator states that are not yet reached.
+
+        Actuators already in their desired state (per the value cache), with a
+        command still awaiting confirmation, or held by a minimum on/off time
+        are skipped (see ``ActuatorReconciler``). Control modes are fetched
+        once for the remaining ones: automation rules can only control
+        actuators in AUTO mode, MANUAL mode means the user has taken emergency
+        control. Everything left goes out in a single batch.
+        """
+        due = self.reconciler.due(self._values)
+        if not due:
+            return
+
         try:
-            device_key = action.get('device_key')
-            actuator_key = action.get('actuator_key')
-            state = action.get('state')
-
-            # Get current control modes (local check for efficiency)
-            modes = await self.hydro_client.get_actuator_modes()
-            actuator_mode = modes.get(device_key, {}).get(actuator_key)
-
-            if actuator_mode != 'auto':
-                logger.debug(
-                    f"Skipping actuator {device_key}:{actuator_key} - "
-                    f"mode is {actuator_mode}, not 'auto' (user has manual control)"
-                )
-                return
+            modes = await self.hydro_client.get_actuator_modes(
+                device_keys=sorted({device_key for device_key, _ in due})
+            )
 
-            # Get current state to avoid redundant commands
-            latest = await self.hydro_client.latest_readings()
-            device_readings = latest.get(device_key, [])
+            commands: List[Dict[str, Any]] = []
+            rule_names: Dict[ReadingKey, str] = {}
+            for device_key, actuator_key in due:
+                desired = self.reconciler.desired[(device_key, actuator_key)]
+                actuator_mode = modes.get(device_key, {}).get(actuator_key)
+                if actuator_mode != 'auto':
+                    logger.debug(
+                        f"Skipping actuator {device_key}:{actuator_key} - "
+                        f"mode is {actuator_mode}, not 'auto' (user has manual control)"
+                    )
+                    self.reconciler.drop((device_key, actuator_key))
+                    continue
 
-            current_state = None
-            for reading in device_readings:
-                if reading.metric_key == actuator_key:
-                    current_state = reading.value
-                    break
+                commands.append({'device_id': device_key, 'actuator_key': actuator_key, 'state': desired.state})
+                rule_names[(device_key, actuator_key)] = desired.rule_name
 
-            # Only send command if state needs to change
-            if current_state == state:
-                logger.debug(
-                    f"Actuator {device_key}:{actuator_key} already in state '{state}'"
-                )
+            if not commands:
                 return
 
-            # Send control command with source="automation"
-            success = await self.hydro_client.control_actuator(
-                device_key, actuator_key, state, source="automation"
-            )
+            # Mark in flight before sending, so a failed request is retried after the timeout
+            self.reconciler.sent(list(rule_names))
+            result = await self.hydro_client.control_actuators(commands, source="automation")
+            if result.get('dry_run'):
+                # Nothing was published, so no confirmation will ever arrive
+                for key in rule_names:
+                    self.reconciler.drop(key)
 
-            if success:
+            for detail in result.get('details', commands):
+                key = (detail.get('device_id'), detail.get('actuator_key'))
                 logger.info(
-                    f"Rule '{rule_name}': Set {device_key}:{actuator_key} to '{state}'"
+                    f"Rule '{rule_names.get(key, 'unknown')}': Set {key[0]}:{key[1]} to '{detail.get('state')}'"
                 )
-            else:
+            for entry in list(result.get('blocked') or []) + list(result.get('missing') or []):
+                key = (entry.get('device_id'), entry.get('actuator_key'))
+                self.reconciler.drop(key)
                 logger.warning(
-                    f"Rule '{rule_name}': Failed to set {device_key}:{actuator_key} "
-                    f"to '{state}' (may have been blocked by mode change)"
+                    f"Rule '{rule_names.get(key, 'unknown')}': Failed to set {key[0]}:{key[1]} "
+                    f"({entry.get('reason', 'actuator not found')})"
                 )
 
         except Exception as e:
-            logger.error(f"Error executing set_actuator action: {e}")
+            logger.error(f"Error applying actuator actions: {e}")
+            # Back off instead of retrying on every wakeup while the backend is down
+            self.reconciler.defer(due)
+
+    async def _cancel_agent_runs(self) -> None:
+        """Cancel AI agent runs still in progress and wait for them to finish."""
+        runs = list(self._agent_runs.values())
+        for task in runs:
+            task.cancel()
+        await asyncio.gather(*runs, return_exceptions=True)
+
+    def _start_agent_run(self, action: Dict[str, Any], rule_name: str, rule_id: str) -> None:
+        """Run a run_ai_agent action as a task; a rule has at most one run in progress."""
+        running = self._agent_runs.get(rule_id)
+        if running is not None and not running.done():
+            logger.info(f"Rule '{rule_name}': AI agent still running; not starting another")
+            return
+        task = asyncio.create_task(self._execute_run_ai_agent(action, rule_name, rule_id))
+        self._agent_runs[rule_id] = task
+
+        def finished(done: asyncio.Task) -> None:
+            if self._agent_runs.get(rule_id) is done:
+                del self._agent_runs[rule_id]
+
+        task.add_done_callback(finished)
 
     async def _execute_run_ai_agent(
         self,
@@ -486,34 +405,198 @@ class AutomationEngine:
         except Exception as e:
             logger.error(f"Error executing run_ai_agent action: {e}", exc_info=True)
 
-    async def run_once(self) -> None:
-        """Run one evaluation cycle of all rules."""
+    async def _fire(self, rule: CompiledRule, plan: ActuatorPlan) -> None:
+        """Execute a matching rule's actions, logging it if it just started matching."""
+        fired_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        error: Optional[str] = None
+        rising = rule.rule_id not in self._matching
         try:
-            # Reload rules if file changed
-            self.reload_rules_if_changed()
+            # Actuator states are re-asserted every cycle; AI runs start once per match
+            await self.execute_actions(rule.rule, plan, run_agents=rising)
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Error executing rule '{rule.name}': {e}")
+
+        # Rules are level-triggered; only the transition into matching is a firing
+        if not rising and error is None:
+            return
+        self._matching.add(rule.rule_id)
+        self._executions.append({
+            'rule_id': rule.rule_id,
+            'rule_name': rule.name,
+            'fired_at': fired_at,
+            'duration_ms': round((time.perf_counter() - started) * 1000),
+            'actions': rule.rule.get('actions', []),
+            'outcome': 'error' if error else 'success',
+            'error': error,
+        })
+
+    async def _flush_executions(self) -> None:
+        """Send the firings collected this cycle to the backend's execution log."""
+        if not self._executions:
+            return
+        executions, self._executions = self._executions, []
+        try:
+            await self.hydro_client.record_rule_executions(executions)
+        except Exception as e:
+            logger.warning(f"Failed to record {len(executions)} rule executions: {e}")
 
-            # Get current sensor data
-            sensor_data = await self.hydro_client.latest_readings()
+    async def _evaluate_rules(self, rules: Iterable[CompiledRule]) -> None:
+        """Evaluate the given rules against the value cache and execute those that match."""
+        now = datetime.now().astimezone()
+        plan: ActuatorPlan = {}
+        for rule in rules:
+            if not rule.enabled:
+                self._matching.discard(rule.rule_id)
+                continue
 
-            # Evaluate and execute enabled rules
-            for rule in self.rules:
-                if not rule.get('enabled', False):
-                    continue
+            try:
+                matched = self.evaluate_rule(rule, now)
+            except Exception as e:
+                logger.error(f"Error evaluating rule '{rule.name}': {e}")
+                continue
 
-                try:
-                    rule_met = await self.evaluate_rule(rule, sensor_data)
+            if matched:
+                await self._fire(rule, plan)
+            else:
+                self._matching.discard(rule.rule_id)
 
-                    if rule_met:
-                        await self.execute_actions(rule)
+        self.cron_ledger.save()
+        await self.apply_actuator_plan(plan)
+        await self._flush_executions()
 
-                except Exception as e:
-                    logger.error(
-                        f"Error evaluating rule '{rule.get('name', 'unknown')}': {e}"
-                    )
+    async def run_once(self) -> None:
+        """Run one evaluation cycle of all rules."""
+        try:
+            # Reload rules if they changed, even if the change event was missed
+            await self.reload_rules_if_changed(check_version=True)
+
+            # Get current sensor data (each poll is also a sample for rolling windows)
+            self._values = await self.hydro_client.latest_values()
+            self._changed.clear()
+            sampled_at = time.time()
+            for key, value in self._values.items():
+                self.windows.add(key, value, sampled_at)
+            for key in list(self.reconciler.pending):
+                if key in self._values:
+                    self.reconciler.observe(key, self._values[key])
+
+            # Evaluate and execute enabled rules
+            await self._evaluate_rules(self.index.rules)
 
         except Exception as e:
             logger.error(f"Error in automation cycle: {e}")
 
+    async def handle_backend_event(self, event: Dict[str, Any]) -> None:
+        """Update the value cache (or mark rules stale) from a backend event and wake the engine."""
+        event_type = event.get('type')
+        if event_type == 'snapshot':
+            self._values = {
+                (device_key, metric_key): value
+                for device_key, entry in (event.get('latest') or {}).items()
+                for metric_key, value in (entry.get('values') or {}).items()
+            }
+            self._snapshot_pending = True
+        elif event_type == 'reading':
+            device_key = event.get('device_id')
+            if not device_key:
+                return
+            sampled_at = event['timestamp'] / 1000 if event.get('timestamp') else time.time()
+            for group in ('sensors', 'actuators'):
+                for metric_key, value in (event.get(group) or {}).items():
+                    key = (device_key, metric_key)
+                    if group == 'actuators':
+                        # Actuator state reported on the device's /actuators topic
+                        self.reconciler.observe(key, value)
+                    if self.windows.add(key, value, sampled_at):
+                        # A repeated value still moves a rolling aggregate
+                        self._changed.add(key)
+                    if self._values.get(key) != value:
+                        self._values[key] = value
+                        self._changed.add(key)
+            if not self._changed:
+                return
+        elif event_type == 'rules_changed':
+            if event.get('version') == self._rules_version:
+                return
+            self._rules_stale = True
+        else:
+            return
+        self._wakeup.set()
+
+    async def run_event_driven(
+        self,
+        stream: 'BackendEventStream',
+        poll_interval: int = 30,
+        reconcile_interval: int = 300,
+    ) -> None:
+        """Evaluate rules as readings arrive on the backend event stream.
+
+        A full HTTP poll still runs every ``reconcile_interval`` seconds while
+        the stream is connected (to catch anything missed) and every
+        ``poll_interval`` seconds while it is not.
+
+        Args:
+            stream: Backend event stream to subscribe to
+            poll_interval: Full-cycle interval while the stream is down
+            reconcile_interval: Full-cycle interval while the stream is up
+        """
+        logger.info(
+            f"Starting event-driven automation engine (reconcile: {reconcile_interval}s, "
+            f"fallback poll: {poll_interval}s)"
+        )
+        await self.load_rules()
+        stream.subscribe(self.handle_backend_event)
+
+        loop = asyncio.get_running_loop()
+        next_full = loop.time()
+
+        try:
+            while True:
+                try:
+                    now = loop.time()
+                    rules_reloaded = await self.reload_rules_if_changed()
+                    # Always advance the timeline so due entries are rescheduled
+                    scheduled = self.timeline.pop_due(datetime.now().astimezone())
+
+                    if now >= next_full:
+                        await self.run_once()
+                        next_full = now + (reconcile_interval if stream.connected else poll_interval)
+                    elif self._snapshot_pending or rules_reloaded:
+                        # (Re)connected: the snapshot replaced the cache, or the rules
+                        # changed, so every rule may have a new result
+                        self._snapshot_pending = False
+                        self._changed.clear()
+                        await self._evaluate_rules(self.index.rules)
+                    else:
+                        changed, self._changed = self._changed, set()
+                        rules = self.index.affected(changed, scheduled)
+                        if rules:
+                            await self._evaluate_rules(rules)
+                        else:
+                            # Retry timed-out commands and send ones whose hold expired
+                            await self.reconcile_actuators()
+                except Exception as e:
+                    logger.error(f"Unexpected error in automation loop: {e}")
+
+                # Sleep until a reading arrives, the next time boundary passes or a full cycle is due
+                timeout = next_full - loop.time()
+                until_boundary = self.timeline.seconds_until_next(datetime.now().astimezone())
+                if until_boundary is not None:
+                    timeout = min(timeout, until_boundary)
+                until_due = self.reconciler.seconds_until_due()
+                if until_due is not None:
+                    timeout = min(timeout, until_due)
+                timeout = max(0.0, timeout)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+        finally:
+            await self._cancel_agent_runs()
+
     async def run_loop(self, interval: int = 30) -> None:
         """Run the automation engine in a continuous loop.
 
@@ -523,15 +606,18 @@ class AutomationEngine:
         logger.info(f"Starting automation engine (interval: {interval}s)")
 
         # Load rules initially
-        self.load_rules()
+        await self.load_rules()
 
-        while True:
-            try:
-                await self.run_once()
-            except Exception as e:
-                logger.error(f"Unexpected error in automation loop: {e}")
+        try:
+            while True:
+                try:
+                    await self.run_once()
+                except Exception as e:
+                    logger.error(f"Unexpected error in automation loop: {e}")
 
-            await asyncio.sleep(interval)
+                await asyncio.sleep(interval)
+        finally:
+            await self._cancel_agent_runs()
 
 
 async def main():
@@ -541,15 +627,11 @@ async def main():
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
 
-    # Setup paths
-    base_path = Path(__file__).parent
-    rules_path = base_path / 'data' / 'automation_rules.json'
-
     # Create hydro client
     hydro_client = HydroAPIClient(base_url='http://localhost:8001')
 
     # Create and run engine
-    engine = AutomationEngine(rules_path, hydro_client)
+    engine = AutomationEngine(hydro_client)
 
     try:
         await engine.run_loop(interval=30)
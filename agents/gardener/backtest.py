@@ -0,0 +1,236 @@
+"""Replay historical readings through automation rules on a virtual clock.
+
+``Backtest`` compiles rules with the same ``rule_compiler`` predicates the
+live engine uses and advances a virtual clock through batches of stored
+readings. Like the event-driven engine, it only re-evaluates rules that
+depend on a reading whose value changed, plus time-based rules when their
+next boundary (see ``schedule.ScheduleTimeline``) passes, so replay cost
+scales with the number of changes rather than with the length of the range.
+
+Actuator commands go through an ``ActuatorReconciler`` driven by the same
+virtual clock, so minimum on/off times apply, and are assumed to be
+confirmed instantly in AUTO mode. Stored readings of actuators the rules
+control are ignored: the simulated state replaces them.
+
+The report lists every firing (a rule starting to match), the resulting
+actuator timeline and each actuator's duty cycle over the range.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .config import settings
+from .reconciler import ActuatorPlan, ActuatorReconciler, claim_actuator
+from .rule_compiler import CompiledRule, ReadingKey, Readings, RuleIndex
+from .schedule import CronLedger, ScheduleTimeline
+from .windows import WindowStore
+
+logger = logging.getLogger(__name__)
+
+# Actuator-state follow-up passes per instant (a rule may depend on a relay another rule switched)
+MAX_CASCADE_DEPTH = 3
+
+
+class Backtest:
+    """Replays reading batches through a rule set and collects firings and actuator switches."""
+
+    def __init__(self, rules: Iterable[Dict[str, Any]], start: datetime, end: datetime):
+        """Prepare a replay.
+
+        Args:
+            rules: Rule dictionaries; each is replayed as if enabled
+            start: Beginning of the replayed range (aware datetime)
+            end: End of the replayed range (aware datetime)
+        """
+        self.start = start
+        self.end = end
+        self.now = start
+
+        rules = [{**rule, 'enabled': True} for rule in rules]
+        # An in-memory ledger, so cron dedupe never touches the live engine's state
+        ledger = CronLedger(catchup_seconds=settings.automation_cron_catchup_seconds)
+        self.windows = WindowStore()
+        self.index = RuleIndex.build(rules, ledger, self.windows)
+        self.timeline = ScheduleTimeline()
+        self.timeline.rebuild(self.index.time_rules, start)
+        self.reconciler = ActuatorReconciler()
+
+        self.controlled: Set[ReadingKey] = {
+            (action.get('device_key'), action.get('actuator_key'))
+            for rule in rules
+            for action in rule.get('actions', [])
+            if action.get('type') == 'set_actuator' and action.get('device_key') and action.get('actuator_key')
+        }
+        self.inputs: Set[ReadingKey] = set().union(*(rule.inputs for rule in self.index.rules)) - self.controlled
+
+        self.values: Readings = {}
+        self.initial: Dict[ReadingKey, Any] = {}
+        self.readings_replayed = 0
+        self.evaluations = 0
+        self.firings: List[Dict[str, Any]] = []
+        self.switches: Dict[ReadingKey, List[Tuple[datetime, str, str]]] = {key: [] for key in self.controlled}
+        self._matching: Set[str] = set()
+        self._started = False
+
+    def seed(self, values: Readings) -> None:
+        """Set the state at ``start`` (e.g. the last reading of each input before it)."""
+        self.values.update(values)
+        self.initial.update({key: value for key, value in values.items() if key in self.controlled})
+
+    def feed(self, at: datetime, readings: Readings) -> None:
+        """Replay the readings stored at one instant.
+
+        Batches must be fed in chronological order.
+        """
+        if at < self.start or at > self.end:
+            return
+        self._ensure_started()
+        self._advance(at)
+        self.now = at
+
+        changed: Set[ReadingKey] = set()
+        sampled_at = at.timestamp()
+        for key, value in readings.items():
+            if key in self.controlled:
+                continue
+            self.readings_replayed += 1
+            if self.windows.add(key, value, sampled_at):
+                changed.add(key)
+            if self.values.get(key) != value:
+                self.values[key] = value
+                changed.add(key)
+
+        rules = self.index.affected(changed)
+        if rules:
+            self._evaluate(rules, at)
+
+    def finish(self) -> Dict[str, Any]:
+        """Run the clock to ``end`` and build the report."""
+        self._ensure_started()
+        self._advance(self.end)
+        return self.report()
+
+    def _ensure_started(self) -> None:
+        if not self._started:
+            self._started = True
+            self._evaluate(self.index.rules, self.start)
+
+    def _advance(self, until: datetime) -> None:
+        """Process time boundaries and expiring holds up to ``until``."""
+        while True:
+            instants = []
+            boundary = self.timeline.next_at()
+            if boundary is not None:
+                instants.append(boundary)
+            until_due = self.reconciler.seconds_until_due(self.now.timestamp())
+            if until_due is not None:
+                instants.append(self.now.timestamp() + until_due)
+            next_at = min(instants) if instants else None
+            if next_at is None or next_at > until.timestamp():
+                return
+
+            at = datetime.fromtimestamp(next_at, tz=timezone.utc)
+            if at.timestamp() < next_at:
+                # Rounded down to the microsecond; step past the instant so it is consumed
+                at += timedelta(microseconds=1)
+            self.now = at
+            self._evaluate(self.timeline.pop_due(self.now), self.now)
+
+    def _evaluate(self, rules: Iterable[CompiledRule], at: datetime, depth: int = 0) -> None:
+        """Evaluate rules at ``at`` and apply the resulting actuator plan."""
+        plan: ActuatorPlan = {}
+        for rule in rules:
+            self.evaluations += 1
+            try:
+                matched = rule.predicate(self.values, at)
+            except Exception as e:
+                logger.error(f"Error evaluating rule '{rule.name}': {e}")
+                continue
+
+            if not matched:
+                self._matching.discard(rule.rule_id)
+                continue
+
+            if rule.rule_id not in self._matching:
+                self._matching.add(rule.rule_id)
+                self.firings.append({'rule_id': rule.rule_id, 'rule_name': rule.name, 'fired_at': at})
+            for action in rule.rule.get('actions', []):
+                if action.get('type') == 'set_actuator':
+                    claim_actuator(plan, action, rule.rule)
+
+        self.reconciler.update(plan)
+        ts = at.timestamp()
+        switched: Set[ReadingKey] = set()
+        for key in self.reconciler.due(self.values, now=ts):
+            desired = self.reconciler.desired[key]
+            self.reconciler.sent([key], now=ts)
+            self.reconciler.observe(key, desired.state, now=ts)
+            self.values[key] = desired.state
+            self.switches.setdefault(key, []).append((at, desired.state, desired.rule_name))
+            switched.add(key)
+
+        dependents = self.index.affected(switched)
+        if dependents and depth < MAX_CASCADE_DEPTH:
+            self._evaluate(dependents, at, depth + 1)
+
+    def report(self) -> Dict[str, Any]:
+        total = max((self.end - self.start).total_seconds(), 0.0)
+
+        firing_counts: Dict[str, int] = {}
+        for firing in self.firings:
+            firing_counts[firing['rule_id']] = firing_counts.get(firing['rule_id'], 0) + 1
+
+        actuators = []
+        for (device_key, actuator_key), switches in sorted(self.switches.items()):
+            state = self.initial.get((device_key, actuator_key))
+            since = self.start
+            on_seconds = 0.0
+            for at, new_state, _ in switches:
+                if state == 'on':
+                    on_seconds += (at - since).total_seconds()
+                state, since = new_state, at
+            if state == 'on':
+                on_seconds += (self.end - since).total_seconds()
+
+            actuators.append({
+                'device_key': device_key,
+                'actuator_key': actuator_key,
+                'initial_state': self.initial.get((device_key, actuator_key)),
+                'switches': len(switches),
+                'on_seconds': round(on_seconds, 1),
+                'duty_cycle': round(on_seconds / total, 4) if total else 0.0,
+                'timeline': [
+                    {'at': at.isoformat(), 'state': new_state, 'rule_name': rule_name}
+                    for at, new_state, rule_name in switches
+                ],
+            })
+
+        return {
+            'start': self.start.isoformat(),
+            'end': self.end.isoformat(),
+            'readings_replayed': self.readings_replayed,
+            'evaluations': self.evaluations,
+            'rules': [
+                {'rule_id': rule.rule_id, 'rule_name': rule.name, 'firings': firing_counts.get(rule.rule_id, 0)}
+                for rule in self.index.rules
+            ],
+            'firings': [{**firing, 'fired_at': firing['fired_at'].isoformat()} for firing in self.firings],
+            'actuators': actuators,
+        }
+
+
+def run_backtest(
+    rules: Iterable[Dict[str, Any]],
+    batches: Iterable[Tuple[datetime, Readings]],
+    start: datetime,
+    end: datetime,
+    initial: Optional[Readings] = None,
+) -> Dict[str, Any]:
+    """Replay chronologically ordered ``(timestamp, readings)`` batches and return the report."""
+    backtest = Backtest(rules, start, end)
+    if initial:
+        backtest.seed(initial)
+    for at, readings in batches:
+        backtest.feed(at, readings)
+    return backtest.finish()
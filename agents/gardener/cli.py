@@ -5,9 +5,9 @@ import argparse
 import asyncio
 import logging
 from contextlib import asynccontextmanager
-from pathlib import Path
 
 from .automation_runner import AutomationEngine
+from .event_stream import BackendEventStream
 from .hydro_client import HydroAPIClient
 from .mcp_server import serve_stdio
 from .tools import build_tool_registry
@@ -25,7 +25,13 @@ async def _managed_client():
 async def _run_stdio() -> None:
     async with _managed_client() as client:
         registry = await build_tool_registry(client)
-        await serve_stdio(registry)
+        event_stream = BackendEventStream()
+        event_stream.subscribe(registry.handle_backend_event)
+        event_stream.start()
+        try:
+            await serve_stdio(registry)
+        finally:
+            await event_stream.aclose()
 
 
 async def _run_automation(interval: int = 30) -> None:
@@ -39,13 +45,9 @@ async def _run_automation(interval: int = 30) -> None:
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
 
-    # Setup paths
-    base_path = Path(__file__).parent
-    rules_path = base_path / 'data' / 'automation_rules.json'
-
     # Create hydro client and engine
     async with _managed_client() as client:
-        engine = AutomationEngine(rules_path, client)
+        engine = AutomationEngine(client)
 
         try:
             await engine.run_loop(interval=interval)
@@ -48,6 +48,70 @@ class Settings(BaseSettings):
 
     request_log_sample_rate: float = Field(1.0, ge=0.0, le=1.0, description="Fraction of requests to log verbosely")
     tool_refresh_interval_seconds: int = Field(60, ge=5, description="How often to refresh cached tool metadata")
+    snapshot_cache_ttl_seconds: float = Field(
+        5.0, ge=0.0, description="How long get_sensor_snapshot results are reused across tool calls (0 disables)"
+    )
+    history_cache_ttl_seconds: float = Field(
+        300.0, ge=0.0, description="How long get_historical_readings results are reused across tool calls (0 disables)"
+    )
+
+    camera_image_mode: Literal["reference", "inline"] = Field(
+        "reference",
+        description=(
+            "'reference' makes get_camera_image return a frame id/URL and bytes are fetched only by the "
+            "consumer (vision call or MCP image); 'inline' embeds base64 in the tool result"
+        ),
+    )
+    camera_image_size: Literal["thumb", "medium", "full"] = Field(
+        "medium", description="Stored frame resolution fetched for vision analysis and MCP images"
+    )
+    vision_max_image_edge: int = Field(
+        1024, ge=256, description="Longest image edge (px) sent to vision models; larger frames are downscaled"
+    )
+    vision_jpeg_quality: int = Field(85, ge=30, le=95, description="JPEG quality used when recompressing frames")
+
+    frame_analysis_enabled: bool = Field(
+        False,
+        description="Run the background worker that pre-analyzes new camera frames with the vision API.",
+    )
+    frame_analysis_interval_seconds: int = Field(60, ge=5, description="Seconds between pending-frame polls")
+    frame_analysis_batch_size: int = Field(8, ge=1, le=200, description="Frames fetched per worker cycle")
+    frame_analysis_concurrency: int = Field(2, ge=1, description="Concurrent vision calls made by the worker")
+    frame_analysis_max_retries: int = Field(3, ge=0, description="Retries per frame for transient vision errors")
+    frame_analysis_max_age_hours: int = Field(
+        24, ge=1, description="Only frames captured within this window are analyzed in the background"
+    )
+
+    automation_enabled: bool = Field(
+        True,
+        description="Run the automation engine here; disable when the backend runs it embedded (AUTOMATION_EMBEDDED)",
+    )
+    automation_event_driven: bool = Field(
+        True,
+        description=(
+            "Re-evaluate automation rules as readings arrive on the backend event stream instead of "
+            "polling every 30s; falls back to polling while the stream is disconnected"
+        ),
+    )
+    automation_reconcile_interval_seconds: int = Field(
+        300, ge=30, description="Full re-evaluation interval while the event stream is connected"
+    )
+
+    automation_cron_catchup_seconds: int = Field(
+        900,
+        ge=60,
+        description=(
+            "A cron occurrence missed by a slow cycle or restart still fires once if it is at most this old; "
+            "older ones are skipped"
+        ),
+    )
+
+    automation_command_timeout_seconds: float = Field(
+        15.0, ge=1.0, description="How long an actuator command may stay unconfirmed before it is re-sent"
+    )
+    automation_command_max_attempts: int = Field(
+        3, ge=1, description="Sends of one unconfirmed actuator command before the engine gives up on it"
+    )
 
     actuator_dry_run: bool = Field(
         False,
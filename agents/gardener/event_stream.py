@@ -0,0 +1,102 @@
+"""Subscriber for the hydro backend's ``/ws/sensors`` event stream."""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def backend_ws_url(base_url: Optional[str] = None) -> str:
+    """Translate the backend HTTP base URL into its sensors WebSocket URL."""
+
+    base = (base_url or settings.hydro_api_base_url).rstrip("/")
+    if base.startswith("https://"):
+        base = "wss://" + base[len("https://"):]
+    elif base.startswith("http://"):
+        base = "ws://" + base[len("http://"):]
+    return f"{base}/ws/sensors"
+
+
+class BackendEventStream:
+    """Keeps a WebSocket open to the backend and fans events out to handlers.
+
+    Reconnects with exponential backoff. If the ``websockets`` package is not
+    installed the stream logs once and exits, leaving consumers on their
+    polling/TTL fallback.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        *,
+        min_backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 60.0,
+    ) -> None:
+        self._url = url or backend_ws_url()
+        self._handlers: List[EventHandler] = []
+        self._min_backoff = min_backoff_seconds
+        self._max_backoff = max_backoff_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.connected = False
+
+    def subscribe(self, handler: EventHandler) -> None:
+        self._handlers.append(handler)
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def dispatch(self, event: Dict[str, Any]) -> None:
+        for handler in list(self._handlers):
+            try:
+                await handler(event)
+            except Exception as exc:  # pragma: no cover - defensive logging
+                logger.warning("Backend event handler failed: %s", exc)
+
+    async def run(self) -> None:
+        try:
+            import websockets
+        except ImportError:
+            logger.warning("websockets package not installed; backend event stream disabled")
+            return
+
+        backoff = self._min_backoff
+        while True:
+            try:
+                async with websockets.connect(self._url, max_size=None) as socket:
+                    logger.info("Connected to backend event stream at %s", self._url)
+                    self.connected = True
+                    backoff = self._min_backoff
+                    async for raw in socket:
+                        try:
+                            event = json.loads(raw)
+                        except (TypeError, json.JSONDecodeError):
+                            continue
+                        if isinstance(event, dict):
+                            await self.dispatch(event)
+            except asyncio.CancelledError:
+                self.connected = False
+                raise
+            except Exception as exc:
+                logger.warning("Backend event stream disconnected (%s); retrying in %.0fs", exc, backoff)
+            self.connected = False
+
+            await asyncio.sleep(backoff)
+            backoff = min(self._max_backoff, backoff * 2)
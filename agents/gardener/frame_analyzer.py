@@ -0,0 +1,231 @@
+"""Background worker that analyzes new camera frames ahead of agent runs."""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+import httpx
+
+from .config import settings
+from .hydro_client import HydroAPIClient
+from .vision import DEFAULT_VISION_PROMPT, VisionAPIError, VisionUnavailableError, describe_image, vision_available
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_PROMPT = (
+    DEFAULT_VISION_PROMPT
+    + " Respond with JSON only, in the form "
+    '{"description": "<text>", "plant_health_score": <0-100>, "anomaly_detected": <true|false>}.'
+)
+
+
+@dataclass
+class FrameAnalysisResult:
+    """Structured output stored against a frame."""
+
+    notes: str
+    analysis_model: str
+    plant_health_score: Optional[int] = None
+    anomaly_detected: Optional[bool] = None
+
+    def to_payload(self) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"notes": self.notes}
+        if self.plant_health_score is not None:
+            payload["plant_health_score"] = self.plant_health_score
+        if self.anomaly_detected is not None:
+            payload["anomaly_detected"] = self.anomaly_detected
+        return payload
+
+
+def parse_analysis(text: str, model: str) -> FrameAnalysisResult:
+    """Parse the JSON answer requested by ``ANALYSIS_PROMPT``.
+
+    Models sometimes wrap JSON in code fences or ignore the format entirely; in
+    the latter case the raw text is kept as the description.
+    """
+
+    cleaned = text.strip()
+    if cleaned.startswith("```"):
+        cleaned = cleaned.strip("`")
+        if cleaned.lower().startswith("json"):
+            cleaned = cleaned[4:]
+        cleaned = cleaned.strip()
+
+    try:
+        data = json.loads(cleaned)
+    except json.JSONDecodeError:
+        return FrameAnalysisResult(notes=text.strip(), analysis_model=model)
+    if not isinstance(data, dict):
+        return FrameAnalysisResult(notes=text.strip(), analysis_model=model)
+
+    score = data.get("plant_health_score")
+    try:
+        score = max(0, min(100, int(score))) if score is not None else None
+    except (TypeError, ValueError):
+        score = None
+    anomaly = data.get("anomaly_detected")
+
+    return FrameAnalysisResult(
+        notes=str(data.get("description") or text).strip(),
+        analysis_model=model,
+        plant_health_score=score,
+        anomaly_detected=anomaly if isinstance(anomaly, bool) else None,
+    )
+
+
+class FrameAnalyzer(ABC):
+    """Turns one frame (raw bytes or base64) into a stored analysis."""
+
+    @abstractmethod
+    async def analyze(self, image: Union[bytes, str], mime_type: str) -> FrameAnalysisResult:
+        raise NotImplementedError
+
+
+class VisionFrameAnalyzer(FrameAnalyzer):
+    """Uses the configured OpenAI/Grok vision model."""
+
+    async def analyze(self, image: Union[bytes, str], mime_type: str) -> FrameAnalysisResult:
+        text, model = await describe_image(image, mime_type, prompt=ANALYSIS_PROMPT)
+        return parse_analysis(text, model)
+
+
+class MockFrameAnalyzer(FrameAnalyzer):
+    """Deterministic analyzer for tests and offline runs."""
+
+    def __init__(self, notes: str = "Plants look healthy.", score: int = 90) -> None:
+        self.notes = notes
+        self.score = score
+        self.calls = 0
+
+    async def analyze(self, image: Union[bytes, str], mime_type: str) -> FrameAnalysisResult:
+        self.calls += 1
+        return FrameAnalysisResult(
+            notes=self.notes,
+            analysis_model="mock-vision",
+            plant_health_score=self.score,
+            anomaly_detected=False,
+        )
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, VisionAPIError):
+        return exc.retryable
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+class FrameAnalysisWorker:
+    """Polls the backend for unanalyzed frames and stores vision results.
+
+    Agent runs then find a stored description for the latest frame instead of
+    waiting on a vision round-trip. Frames that keep failing are skipped for
+    ``failure_cooldown_seconds`` so one bad image cannot stall the queue.
+    """
+
+    def __init__(
+        self,
+        client: HydroAPIClient,
+        analyzer: FrameAnalyzer,
+        *,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        max_age_hours: Optional[int] = None,
+        base_backoff_seconds: float = 2.0,
+        failure_cooldown_seconds: float = 900.0,
+    ) -> None:
+        self.client = client
+        self.analyzer = analyzer
+        self.batch_size = batch_size or settings.frame_analysis_batch_size
+        self.concurrency = concurrency or settings.frame_analysis_concurrency
+        self.max_retries = settings.frame_analysis_max_retries if max_retries is None else max_retries
+        self.max_age_hours = max_age_hours or settings.frame_analysis_max_age_hours
+        self.base_backoff_seconds = base_backoff_seconds
+        self.failure_cooldown_seconds = failure_cooldown_seconds
+        self._failed_until: Dict[int, float] = {}
+
+    async def run_once(self) -> Dict[str, int]:
+        """Analyze one batch of pending frames. Returns counters for logging."""
+
+        frames = await self.client.list_pending_frames(
+            limit=self.batch_size,
+            max_age_hours=self.max_age_hours,
+        )
+        now = time.monotonic()
+        self._failed_until = {fid: until for fid, until in self._failed_until.items() if until > now}
+        pending: List[Dict[str, Any]] = [f for f in frames if f.get("id") not in self._failed_until]
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def _bounded(frame: Dict[str, Any]) -> bool:
+            async with semaphore:
+                return await self._analyze_with_retry(frame)
+
+        results = await asyncio.gather(*(_bounded(frame) for frame in pending))
+        analyzed = sum(1 for ok in results if ok)
+        return {
+            "pending": len(frames),
+            "analyzed": analyzed,
+            "failed": len(results) - analyzed,
+            "skipped": len(frames) - len(pending),
+        }
+
+    async def _analyze_with_retry(self, frame: Dict[str, Any]) -> bool:
+        frame_id = frame["id"]
+        attempt = 0
+        while True:
+            try:
+                image = await self.client.get_frame_image(frame_id)
+                result = await self.analyzer.analyze(image["image_bytes"], image["content_type"])
+                await self.client.save_frame_analysis(
+                    frame_id,
+                    analysis_model=result.analysis_model,
+                    **result.to_payload(),
+                )
+                return True
+            except VisionUnavailableError:
+                raise
+            except Exception as exc:
+                if attempt < self.max_retries and _is_retryable(exc):
+                    delay = self.base_backoff_seconds * (2 ** attempt)
+                    attempt += 1
+                    logger.info("Frame %s analysis failed (%s); retry %s in %.1fs", frame_id, exc, attempt, delay)
+                    await asyncio.sleep(delay)
+                    continue
+                logger.warning("Giving up on frame %s analysis: %s", frame_id, exc)
+                self._failed_until[frame_id] = time.monotonic() + self.failure_cooldown_seconds
+                return False
+
+    async def run_loop(self, interval_seconds: Optional[int] = None) -> None:
+        interval = interval_seconds or settings.frame_analysis_interval_seconds
+        logger.info("Frame analysis worker started (interval=%ss, concurrency=%s)", interval, self.concurrency)
+        while True:
+            try:
+                counts = await self.run_once()
+                if counts["analyzed"] or counts["failed"]:
+                    logger.info("Frame analysis cycle: %s", counts)
+            except asyncio.CancelledError:
+                raise
+            except VisionUnavailableError as exc:
+                logger.warning("Frame analysis worker stopping: %s", exc)
+                return
+            except Exception as exc:
+                logger.error("Frame analysis cycle failed: %s", exc)
+            await asyncio.sleep(interval)
+
+
+def create_frame_analysis_worker(client: HydroAPIClient) -> Optional[FrameAnalysisWorker]:
+    """Build the worker if it is enabled and a vision provider is configured."""
+
+    if not settings.frame_analysis_enabled:
+        return None
+    if not vision_available():
+        logger.warning("Frame analysis is enabled but no vision API key is configured; worker not started")
+        return None
+    return FrameAnalysisWorker(client, VisionFrameAnalyzer())
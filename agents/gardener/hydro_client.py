@@ -2,11 +2,12 @@
 from __future__ import annotations
 
 import base64
+import hashlib
 import json
 from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 import httpx
 
@@ -121,6 +122,16 @@ class HydroAPIClient:
             readings[device_key] = parsed_metrics
         return readings
 
+    async def latest_values(self) -> Dict[Tuple[str, str], Any]:
+        """Latest value per (device_key, metric_key), without building ``MetricReading`` objects."""
+        response = await self._client.get("/api/readings/latest")
+        response.raise_for_status()
+        return {
+            (device_key, metric["metric_key"]): metric.get("value")
+            for device_key, metrics in response.json().get("devices", {}).items()
+            for metric in metrics
+        }
+
     async def control_actuators(
         self, 
         commands: List[Dict[str, Any]], 
@@ -171,23 +182,124 @@ class HydroAPIClient:
         response.raise_for_status()
         return response.json()
 
-    async def get_camera_image(self, device_key: str, *, days_ago: int = 0) -> Dict[str, Any]:
-        params = {"days_ago": days_ago}
+    async def get_camera_image(
+        self,
+        device_key: str,
+        *,
+        days_ago: int = 0,
+        size: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        params = {"days_ago": days_ago, "size": size or settings.camera_image_size}
         response = await self._client.get(f"/api/cameras/{device_key}/image", params=params)
         if response.status_code == 200:
             image_bytes = response.content
             image_base64 = base64.b64encode(image_bytes).decode('utf-8')
             content_type = response.headers.get("content-type", "image/webp")
+            frame_id = response.headers.get("x-frame-id")
 
             return {
                 "status": "success",
                 "content_type": content_type,
                 "content_length": response.headers.get("content-length"),
+                "frame_id": int(frame_id) if frame_id and frame_id.isdigit() else None,
+                "frame_timestamp": response.headers.get("x-frame-timestamp"),
+                "content_hash": response.headers.get("x-frame-hash") or hashlib.sha256(image_bytes).hexdigest(),
                 "image_base64": image_base64
             }
         response.raise_for_status()
         return {"status": "unknown"}
 
+    def frame_image_url(self, frame_id: int, *, size: Optional[str] = None) -> str:
+        url = self._client.base_url.join(f"/api/cameras/frames/{frame_id}/image")
+        return str(url.copy_add_param("size", size or settings.camera_image_size))
+
+    async def get_camera_frame(self, device_key: str, *, days_ago: int = 0) -> Dict[str, Any]:
+        """Resolve the frame a camera image request would return, without its bytes."""
+        response = await self._client.get(f"/api/cameras/{device_key}/frame", params={"days_ago": days_ago})
+        response.raise_for_status()
+        frame = response.json()
+        return {
+            "status": "success",
+            "content_type": "image/webp",
+            "frame_id": frame["id"],
+            "frame_timestamp": frame.get("timestamp"),
+            "content_hash": frame.get("content_hash"),
+            "content_length": frame.get("file_size"),
+            "image_url": self.frame_image_url(frame["id"]),
+        }
+
+    async def get_nearest_frames(
+        self,
+        device_key: str,
+        times: Sequence[datetime],
+        *,
+        direction: str = "closest",
+    ) -> List[Dict[str, Any]]:
+        """Frames nearest each of ``times`` (one request for the whole batch)."""
+        params: List[Tuple[str, str]] = [("at", t.isoformat()) for t in times]
+        params.append(("direction", direction))
+        response = await self._client.get(f"/api/cameras/{device_key}/frames/nearest", params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def list_pending_frames(
+        self,
+        *,
+        limit: int = 20,
+        max_age_hours: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Frames the backend has stored but nobody has analyzed yet (newest first)."""
+        params: Dict[str, Any] = {"limit": limit}
+        if max_age_hours:
+            params["max_age_hours"] = max_age_hours
+        response = await self._client.get("/api/cameras/frames/pending", params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def get_frame_image(self, frame_id: int, *, size: Optional[str] = None) -> Dict[str, Any]:
+        """Download a specific stored frame by id as raw bytes (no base64 copy)."""
+        response = await self._client.get(
+            f"/api/cameras/frames/{frame_id}/image",
+            params={"size": size or settings.camera_image_size},
+        )
+        response.raise_for_status()
+        image_bytes = response.content
+        return {
+            "status": "success",
+            "content_type": response.headers.get("content-type", "image/webp"),
+            "frame_id": frame_id,
+            "content_hash": response.headers.get("x-frame-hash") or hashlib.sha256(image_bytes).hexdigest(),
+            "image_bytes": image_bytes,
+        }
+
+    async def get_frame_analysis(
+        self,
+        frame_id: int,
+        *,
+        content_hash: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Return stored vision analysis for a frame, or None if it was never analyzed."""
+        params = {"content_hash": content_hash} if content_hash else None
+        response = await self._client.get(f"/api/cameras/frames/{frame_id}/analysis", params=params)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    async def save_frame_analysis(
+        self,
+        frame_id: int,
+        *,
+        analysis_model: str,
+        notes: str,
+        **fields: Any,
+    ) -> Dict[str, Any]:
+        """Persist a vision description on the backend CameraFrame row."""
+        payload = {"analysis_model": analysis_model, "notes": notes, **fields}
+        response = await self._client.put(f"/api/cameras/frames/{frame_id}/analysis", json=payload)
+        response.raise_for_status()
+        return response.json()
+
     async def get_historical_readings(
         self,
         *,
@@ -280,6 +392,92 @@ class HydroAPIClient:
         processed = result.get("processed", 0)
         return processed > 0
 
+    async def list_automation_rules(
+        self,
+        *,
+        enabled: Optional[bool] = None,
+        protected: Optional[bool] = None,
+        search: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        """List automation rules in priority order, with counts and the rule-set version."""
+        params: Dict[str, Any] = {"offset": offset}
+        if enabled is not None:
+            params["enabled"] = str(enabled).lower()
+        if protected is not None:
+            params["protected"] = str(protected).lower()
+        if search:
+            params["q"] = search
+        if limit is not None:
+            params["limit"] = limit
+
+        response = await self._client.get("/api/automation/rules", params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def get_automation_rules_version(self) -> int:
+        """Current rule-set version; it changes whenever any rule changes."""
+        response = await self._client.get("/api/automation/rules/version")
+        response.raise_for_status()
+        return response.json().get("version", 0)
+
+    async def get_automation_rule(self, rule_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch one rule; None if it does not exist."""
+        response = await self._client.get(f"/api/automation/rules/{rule_id}")
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    async def create_automation_rule(self, rule: Dict[str, Any]) -> Dict[str, Any]:
+        response = await self._client.post("/api/automation/rules", json=rule)
+        response.raise_for_status()
+        return response.json()
+
+    async def update_automation_rule(self, rule_id: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        response = await self._client.patch(f"/api/automation/rules/{rule_id}", json=changes)
+        response.raise_for_status()
+        return response.json()
+
+    async def delete_automation_rule(self, rule_id: str, *, modified_by: str = "api") -> Dict[str, Any]:
+        response = await self._client.delete(
+            f"/api/automation/rules/{rule_id}",
+            params={"modified_by": modified_by},
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def toggle_automation_rule(
+        self,
+        rule_id: str,
+        enabled: bool,
+        *,
+        modified_by: str = "api",
+    ) -> Dict[str, Any]:
+        response = await self._client.post(
+            f"/api/automation/rules/{rule_id}/toggle",
+            json={"enabled": enabled, "modified_by": modified_by},
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def record_rule_executions(self, executions: List[Dict[str, Any]]) -> None:
+        """Append rule firings to the backend's execution log."""
+        if not executions:
+            return
+
+        payload: List[Dict[str, Any]] = []
+        for execution in executions:
+            serialised = dict(execution)
+            fired_at = serialised.get("fired_at")
+            if isinstance(fired_at, datetime):
+                serialised["fired_at"] = fired_at.isoformat()
+            payload.append(serialised)
+
+        response = await self._client.post("/api/automation/executions", json=payload)
+        response.raise_for_status()
+
     async def save_conversation_messages(
         self,
         messages: List[Dict[str, Any]],
@@ -3,7 +3,7 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from pathlib import Path
+from typing import Optional
 
 import uvicorn
 
@@ -11,31 +11,42 @@ from .agent import GardenerAgent
 from .app import app
 from .automation_runner import AutomationEngine
 from .config import settings
+from .event_stream import BackendEventStream
+from .frame_analyzer import create_frame_analysis_worker
 from .hydro_client import HydroAPIClient
 from .llm_providers import create_provider
 from .tools import build_tool_registry
+from .vision import aclose_http_client
 
 logger = logging.getLogger(__name__)
 
 
 async def run_automation_engine(
-    rules_path: Path,
     client: HydroAPIClient,
     agent: GardenerAgent,
-    interval: int = 30
+    interval: int = 30,
+    event_stream: Optional[BackendEventStream] = None,
 ) -> None:
     """Run the automation engine in a continuous loop.
 
     Args:
-        rules_path: Path to automation rules JSON file
         client: Hydro API client
         agent: Gardener agent instance for AI actions
         interval: Seconds between evaluation cycles (default 30)
+        event_stream: Backend event stream; when given (and enabled in settings)
+            rules are evaluated as readings arrive
     """
-    engine = AutomationEngine(rules_path, client, agent)
+    engine = AutomationEngine(client, agent)
 
     try:
-        await engine.run_loop(interval=interval)
+        if event_stream is not None and settings.automation_event_driven:
+            await engine.run_event_driven(
+                event_stream,
+                poll_interval=interval,
+                reconcile_interval=settings.automation_reconcile_interval_seconds,
+            )
+        else:
+            await engine.run_loop(interval=interval)
     except asyncio.CancelledError:
         logger.info("Automation engine stopped")
         raise
@@ -56,16 +67,18 @@ async def run_services() -> None:
     provider = create_provider()
     agent = GardenerAgent(provider=provider, registry=registry)
 
+    # Rebuild the tool catalog when the backend reports roster changes;
+    # the automation engine subscribes to the same stream for readings
+    event_stream = BackendEventStream()
+    event_stream.subscribe(registry.handle_backend_event)
+    event_stream.start()
+
     # Store in app state for HTTP endpoints
     app.state.client = client
     app.state.registry = registry
     app.state.provider = provider
     app.state.agent = agent
 
-    # Setup paths
-    base_path = Path(__file__).parent
-    rules_path = base_path / 'data' / 'automation_rules.json'
-
     # Create uvicorn config
     log_level = "debug" if settings.request_log_sample_rate >= 1.0 else "info"
     config = uvicorn.Config(
@@ -76,18 +89,30 @@ async def run_services() -> None:
     )
     server = uvicorn.Server(config)
 
-    # Run both HTTP server and automation engine concurrently
-    try:
-        await asyncio.gather(
-            server.serve(),
-            run_automation_engine(rules_path, client, agent, interval=30)
+    services = [server.serve()]
+    if settings.automation_enabled:
+        services.append(
+            run_automation_engine(client, agent, interval=30, event_stream=event_stream)
         )
+    else:
+        logger.info("Automation engine disabled here (GARDENER_AUTOMATION_ENABLED=false)")
+
+    # Pre-analyze new camera frames so agent runs can reuse stored descriptions
+    frame_worker = create_frame_analysis_worker(client)
+    if frame_worker is not None:
+        services.append(frame_worker.run_loop())
+
+    # Run HTTP server, automation engine and optional frame worker concurrently
+    try:
+        await asyncio.gather(*services)
     except KeyboardInterrupt:
         logger.info("Services stopped by user")
     finally:
         # Cleanup
+        await event_stream.aclose()
         await provider.aclose()
         await client.aclose()
+        await aclose_http_client()
 
 
 def main() -> None:
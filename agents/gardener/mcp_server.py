@@ -1,6 +1,7 @@
 """Model Context Protocol server exposing hydro tools."""
 from __future__ import annotations
 
+import base64
 import json
 from typing import Any, Dict, List
 
@@ -25,7 +26,7 @@ def create_server(registry: ToolRegistry) -> Server:
 
     @server.list_tools()
     async def list_tools() -> List[types.Tool]:
-        await registry.refresh()
+        await registry.ensure_fresh()
         return [
             types.Tool(
                 name=tool.name,
@@ -48,11 +49,14 @@ def create_server(registry: ToolRegistry) -> Server:
             content_list = []
             for item in result["content"]:
                 if item.get("type") == "image":
+                    image, mime_type = await registry.resolve_image(item)
+                    if not isinstance(image, str):
+                        image = base64.b64encode(image).decode("ascii")
                     content_list.append(
                         types.ImageContent(
                             type="image",
-                            data=item["data"],
-                            mimeType=item.get("mimeType", "image/webp")
+                            data=image,
+                            mimeType=mime_type,
                         )
                     )
                 elif item.get("type") == "text":
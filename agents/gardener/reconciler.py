@@ -0,0 +1,217 @@
+"""Desired-state reconciliation for actuators driven by automation rules.
+
+Rules declare what state an actuator should be in; ``ActuatorReconciler``
+decides whether a command actually needs to go out. It remembers commands
+that are in flight until the device confirms them on its ``/actuators`` MQTT
+topic (streamed back as actuator readings), so a slow device is not sent the
+same command every cycle, and retries only after a timeout. It also enforces
+per-rule minimum on/off times, so a relay that was just switched is not
+toggled again before the hold expires.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ActuatorKey = Tuple[str, str]
+
+# Shortest wait reported for a deadline that has already passed, so a command
+# that cannot be sent does not turn the engine loop into a busy-wait
+RETRY_FLOOR_SECONDS = 1.0
+
+
+@dataclass
+class DesiredState:
+    """State a rule wants an actuator in, with its minimum hold times."""
+
+    state: str
+    rule_name: str
+    min_on_seconds: float = 0.0
+    min_off_seconds: float = 0.0
+
+    def hold_seconds(self) -> float:
+        """How long the actuator must keep ``state`` once it is confirmed."""
+        return self.min_on_seconds if self.state == 'on' else self.min_off_seconds
+
+
+# Desired state per actuator for one cycle
+ActuatorPlan = Dict[ActuatorKey, DesiredState]
+
+
+def claim_actuator(plan: ActuatorPlan, action: Dict[str, Any], rule: Dict[str, Any]) -> Optional[DesiredState]:
+    """Record a set_actuator action in ``plan`` unless the actuator is already claimed.
+
+    Rules are evaluated in priority order, so the first claim wins.
+    ``min_on_seconds`` / ``min_off_seconds`` may be set on the action or, for
+    all of a rule's actions, on the rule itself.
+
+    Returns:
+        The earlier claim if it wants a different state (this action lost), else None
+    """
+    rule_name = rule.get('name', 'unknown')
+    # Normalized the way the backend does, so blocked/missing entries it
+    # reports come back under the same key
+    device_key = str(action.get('device_key') or '').strip()
+    actuator_key = str(action.get('actuator_key') or '').lower().replace(' ', '')
+    state = action.get('state')
+    if not device_key or not actuator_key or state is None:
+        logger.warning(f"Rule '{rule_name}': set_actuator action missing device_key, actuator_key or state")
+        return None
+    state = str(state).lower()
+    if state not in ('on', 'off'):
+        # The backend rejects the whole batch for one bad state
+        logger.warning(f"Rule '{rule_name}': invalid state '{action.get('state')}' for {device_key}/{actuator_key}")
+        return None
+
+    key = (device_key, actuator_key)
+    claimed = plan.get(key)
+    if claimed is None:
+        plan[key] = DesiredState(
+            state=state,
+            rule_name=rule_name,
+            min_on_seconds=float(action.get('min_on_seconds', rule.get('min_on_seconds', 0))),
+            min_off_seconds=float(action.get('min_off_seconds', rule.get('min_off_seconds', 0))),
+        )
+        return None
+    return claimed if claimed.state != state else None
+
+
+@dataclass
+class PendingCommand:
+    desired: DesiredState
+    sent_at: float
+    attempts: int = 1
+
+
+class ActuatorReconciler:
+    """Desired-state table with in-flight command tracking and hold times."""
+
+    def __init__(self, command_timeout: float = 15.0, max_attempts: int = 3):
+        self.command_timeout = command_timeout
+        self.max_attempts = max_attempts
+        self.desired: Dict[ActuatorKey, DesiredState] = {}
+        self.pending: Dict[ActuatorKey, PendingCommand] = {}
+        # Monotonic time before which the actuator must keep its current state
+        self._held_until: Dict[ActuatorKey, Tuple[str, float]] = {}
+        # Monotonic time before which a command the backend failed to take is not retried
+        self._retry_at: Dict[ActuatorKey, float] = {}
+
+    def update(self, plan: ActuatorPlan) -> None:
+        """Merge one cycle's desired states into the table."""
+        for key, desired in plan.items():
+            current = self.desired.get(key)
+            if current is None or current.state != desired.state:
+                self.pending.pop(key, None)
+            self.desired[key] = desired
+
+    def observe(self, key: ActuatorKey, value: Any, now: Optional[float] = None) -> None:
+        """Record a reported actuator state, confirming a pending command if it matches."""
+        pending = self.pending.get(key)
+        if pending is None or value != pending.desired.state:
+            return
+        now = time.monotonic() if now is None else now
+        del self.pending[key]
+        self._retry_at.pop(key, None)
+        desired = self.desired.get(key)
+        if desired is not None and desired.state == value:
+            del self.desired[key]
+        hold = pending.desired.hold_seconds()
+        if hold > 0:
+            self._held_until[key] = (pending.desired.state, now + hold)
+        logger.debug(
+            f"Actuator {key[0]}:{key[1]} confirmed '{value}' "
+            f"after {now - pending.sent_at:.1f}s"
+        )
+
+    def due(self, values: Dict[ActuatorKey, Any], now: Optional[float] = None) -> List[ActuatorKey]:
+        """Actuators whose desired state still needs a command right now.
+
+        Entries already in their desired state are settled and dropped. Entries
+        with a command in flight, or held by a minimum on/off time, wait.
+        """
+        now = time.monotonic() if now is None else now
+        due: List[ActuatorKey] = []
+        for key, desired in list(self.desired.items()):
+            if values.get(key) == desired.state:
+                self.desired.pop(key)
+                self.pending.pop(key, None)
+                self._retry_at.pop(key, None)
+                continue
+
+            retry_at = self._retry_at.get(key)
+            if retry_at is not None:
+                if retry_at > now:
+                    continue
+                del self._retry_at[key]
+
+            pending = self.pending.get(key)
+            if pending is not None and now - pending.sent_at < self.command_timeout:
+                continue
+            if pending is not None and pending.attempts >= self.max_attempts:
+                logger.error(
+                    f"Rule '{desired.rule_name}': {key[0]}:{key[1]} did not confirm '{desired.state}' "
+                    f"after {pending.attempts} attempts; giving up"
+                )
+                self.desired.pop(key)
+                self.pending.pop(key)
+                continue
+
+            held = self._held_until.get(key)
+            if held is not None and held[1] > now and held[0] == values.get(key):
+                logger.debug(
+                    f"Rule '{desired.rule_name}': {key[0]}:{key[1]} held '{held[0]}' "
+                    f"for another {held[1] - now:.0f}s"
+                )
+                continue
+
+            due.append(key)
+        return due
+
+    def sent(self, keys: List[ActuatorKey], now: Optional[float] = None) -> None:
+        """Mark commands for ``keys`` as in flight."""
+        now = time.monotonic() if now is None else now
+        for key in keys:
+            desired = self.desired.get(key)
+            if desired is None:
+                continue
+            previous = self.pending.get(key)
+            attempts = previous.attempts + 1 if previous is not None else 1
+            if previous is not None:
+                logger.warning(
+                    f"Rule '{desired.rule_name}': {key[0]}:{key[1]} did not confirm '{desired.state}' "
+                    f"within {self.command_timeout:.0f}s; resending (attempt {attempts})"
+                )
+            self.pending[key] = PendingCommand(desired, now, attempts)
+
+    def defer(self, keys: List[ActuatorKey], now: Optional[float] = None) -> None:
+        """Retry ``keys`` only after ``command_timeout``, e.g. because the backend is unreachable."""
+        now = time.monotonic() if now is None else now
+        for key in keys:
+            if key in self.desired:
+                self._retry_at[key] = now + self.command_timeout
+
+    def drop(self, key: ActuatorKey) -> None:
+        """Forget an actuator, e.g. because the user switched it to manual."""
+        self.desired.pop(key, None)
+        self.pending.pop(key, None)
+        self._retry_at.pop(key, None)
+
+    def seconds_until_due(self, now: Optional[float] = None) -> Optional[float]:
+        """Time until a command times out, a retry is allowed or a hold expires, if anything is waiting."""
+        now = time.monotonic() if now is None else now
+        # A backed-off command waits for its retry time, not its (past) timeout
+        deadlines = [
+            p.sent_at + self.command_timeout for key, p in self.pending.items() if key not in self._retry_at
+        ]
+        deadlines += [until for key, until in self._retry_at.items() if key in self.desired]
+        deadlines += [until for key, (_, until) in self._held_until.items() if key in self.desired and until > now]
+        if not deadlines:
+            return None
+        earliest = min(deadlines)
+        if earliest <= now:
+            # Overdue but not sent (held, or the backend is unreachable)
+            return RETRY_FLOOR_SECONDS
+        return earliest - now
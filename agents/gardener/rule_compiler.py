@@ -0,0 +1,536 @@
+"""Compile automation rules into predicates and a dependency index.
+
+Rules are parsed once when they are loaded: time strings, timezones,
+thresholds and operators are resolved up front and each condition becomes a
+closure over a flat readings dict keyed by ``(device_key, metric_key)``.
+``RuleIndex`` maps every reading a rule depends on to that rule, so a changed
+input re-evaluates only its dependents instead of every rule. Time-based
+conditions also compile a ``next_change`` function giving the next instant
+their value can flip, which feeds ``schedule.ScheduleTimeline``.
+
+``rolling_window``, ``rate_of_change`` and ``expression`` conditions read
+aggregates from ``windows.WindowStore``, which the engine feeds with every
+reading; expressions are parsed once into a restricted arithmetic evaluator.
+"""
+
+import ast
+import logging
+import math
+import operator
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from croniter import croniter
+
+try:
+    import zoneinfo
+except ImportError:
+    from backports import zoneinfo  # Python < 3.9
+
+from .schedule import CronLedger
+from .windows import AGGREGATES, RollingWindow, WindowStore
+
+logger = logging.getLogger(__name__)
+
+ReadingKey = Tuple[str, str]
+Readings = Dict[ReadingKey, Any]
+Predicate = Callable[[Readings, datetime], bool]
+NextChange = Callable[[datetime], Optional[datetime]]
+
+OPERATORS: Dict[str, Callable[[float, float], bool]] = {
+    'greater_than': operator.gt,
+    'less_than': operator.lt,
+    'equals': operator.eq,
+    'greater_than_or_equal': operator.ge,
+    'less_than_or_equal': operator.le,
+}
+
+# Condition types whose result changes with the clock rather than with readings
+TIME_CONDITION_TYPES = {'time_range', 'days_of_week', 'cron'}
+
+# Condition types that read rolling windows
+WINDOW_CONDITION_TYPES = {'rolling_window', 'rate_of_change', 'expression'}
+
+RATE_UNITS = {'second': 1.0, 'minute': 60.0, 'hour': 3600.0}
+
+# Names callable from expression conditions
+EXPRESSION_FUNCTIONS: Dict[str, Callable[..., float]] = {
+    'abs': abs,
+    'min': min,
+    'max': max,
+    'round': round,
+    'sqrt': math.sqrt,
+    'exp': math.exp,
+    'log': math.log,
+    'log10': math.log10,
+}
+
+_EXPRESSION_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load, ast.Call,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd,
+)
+
+
+def _never(readings: Readings, now: datetime) -> bool:
+    return False
+
+
+@dataclass
+class CompiledCondition:
+    predicate: Predicate
+    inputs: FrozenSet[ReadingKey] = frozenset()
+    time_based: bool = False
+    next_change: Optional[NextChange] = None
+    # Clears hysteresis state; set only for conditions that have any
+    reset: Optional[Callable[[], None]] = None
+
+
+@dataclass
+class CompiledRule:
+    """A rule with its conditions compiled to a single predicate."""
+
+    rule: Dict[str, Any]
+    predicate: Predicate
+    inputs: FrozenSet[ReadingKey] = frozenset()
+    time_based: bool = False
+    conditions: List[CompiledCondition] = field(default_factory=list)
+
+    @property
+    def rule_id(self) -> str:
+        return self.rule.get('id', 'unknown')
+
+    @property
+    def name(self) -> str:
+        return self.rule.get('name', 'unknown')
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rule.get('enabled', False))
+
+    @property
+    def priority(self) -> int:
+        return self.rule.get('priority', 0)
+
+    def next_change(self, now: datetime) -> Optional[datetime]:
+        """Earliest instant after ``now`` at which a time condition of this rule can flip."""
+        instants = [c.next_change(now) for c in self.conditions if c.next_change is not None]
+        instants = [i for i in instants if i is not None]
+        return min(instants) if instants else None
+
+
+def _parse_hhmm(value: str) -> time:
+    hour, minute = map(int, value.split(':'))
+    return time(hour, minute)
+
+
+def _at(day: date, at: time, tz: Optional[Any]) -> datetime:
+    """Aware datetime for a wall-clock time in ``tz`` (local time if None)."""
+    if tz is not None:
+        return datetime.combine(day, at, tzinfo=tz)
+    return datetime.combine(day, at).astimezone()
+
+
+def _next_local_midnight(now: datetime) -> datetime:
+    local = now.astimezone()
+    return _at(local.date() + timedelta(days=1), time(0, 0), None)
+
+
+def _compile_time_range(condition: Dict[str, Any]) -> CompiledCondition:
+    start = _parse_hhmm(condition.get('start_time', '00:00'))
+    end = _parse_hhmm(condition.get('end_time', '23:59'))
+
+    tz = None
+    tz_name = condition.get('timezone')
+    if tz_name:
+        try:
+            tz = zoneinfo.ZoneInfo(tz_name)
+        except Exception as tz_err:
+            logger.warning(f"Invalid timezone '{tz_name}', using local time: {tz_err}")
+
+    overnight = start > end  # e.g. 22:00 to 06:00
+
+    def predicate(readings: Readings, now: datetime) -> bool:
+        current = now.astimezone(tz).time()
+        if overnight:
+            return current >= start or current <= end
+        return start <= current <= end
+
+    def next_change(now: datetime) -> Optional[datetime]:
+        # The range includes its end minute, so it turns false just after ``end``
+        today = now.astimezone(tz).date()
+        candidates = [
+            _at(day, boundary, tz)
+            for day in (today, today + timedelta(days=1))
+            for boundary in (start, end)
+        ]
+        return min(c for c in candidates if c > now)
+
+    return CompiledCondition(predicate, time_based=True, next_change=next_change)
+
+
+def _compile_days_of_week(condition: Dict[str, Any]) -> CompiledCondition:
+    days = frozenset(d.lower() for d in condition.get('days', []))
+
+    def predicate(readings: Readings, now: datetime) -> bool:
+        return now.astimezone().strftime('%A').lower() in days
+
+    return CompiledCondition(predicate, time_based=True, next_change=_next_local_midnight)
+
+
+def _compile_cron(condition: Dict[str, Any], rule_id: str, ledger: CronLedger) -> CompiledCondition:
+    expression = condition.get('expression')
+    if not expression:
+        logger.error("Cron condition missing 'expression' field")
+        return CompiledCondition(_never, time_based=True)
+    # Validate once; a new iterator per evaluation is still needed as it is stateful
+    croniter(expression)
+
+    def predicate(readings: Readings, now: datetime) -> bool:
+        # Cron expressions are in local time
+        local_now = now.astimezone().replace(tzinfo=None)
+        occurrence = croniter(expression, local_now).get_prev(datetime).astimezone()
+
+        # Already fired for this occurrence
+        last = ledger.last(rule_id)
+        if last is not None and last >= occurrence:
+            return False
+
+        # Missed by more than the catch-up window (e.g. long downtime): skip it
+        if (now - occurrence).total_seconds() > ledger.catchup_seconds:
+            return False
+
+        # Record the occurrence (not the evaluation time) so it fires exactly once
+        ledger.mark(rule_id, occurrence)
+        return True
+
+    def next_change(now: datetime) -> Optional[datetime]:
+        local_now = now.astimezone().replace(tzinfo=None)
+        return croniter(expression, local_now).get_next(datetime).astimezone()
+
+    return CompiledCondition(predicate, time_based=True, next_change=next_change)
+
+
+class _Comparison:
+    """``value <operator> threshold``, with optional hysteresis.
+
+    Hysteresis: once true, the comparison stays true until the value moves
+    ``hysteresis`` past the threshold the other way (e.g. less_than 10 with
+    hysteresis 2 turns true below 10 and false again at 12). Each instance
+    keeps that state, so compile one per condition; ``reset`` returns it to
+    the entry threshold.
+    """
+
+    __slots__ = ('compare', 'threshold', 'release', 'active')
+
+    def __init__(self, compare: Callable[[float, float], bool], threshold: float, release: float):
+        self.compare = compare
+        self.threshold = threshold
+        self.release = release
+        self.active = False
+
+    @property
+    def stateful(self) -> bool:
+        return self.release != self.threshold
+
+    def __call__(self, value: float) -> bool:
+        self.active = self.compare(value, self.release if self.active else self.threshold)
+        return self.active
+
+    def reset(self) -> None:
+        self.active = False
+
+
+def _compile_comparison(condition: Dict[str, Any]) -> Optional[_Comparison]:
+    """Compile the condition's ``operator``, ``value`` and ``hysteresis``; None if the operator is unknown."""
+    op_name = condition.get('operator')
+    compare = OPERATORS.get(op_name)
+    if compare is None:
+        logger.warning(f"Unknown operator: {op_name}")
+        return None
+    threshold = float(condition.get('value'))
+
+    hysteresis = abs(float(condition.get('hysteresis') or 0))
+    if op_name in ('greater_than', 'greater_than_or_equal'):
+        release = threshold - hysteresis
+    elif op_name in ('less_than', 'less_than_or_equal'):
+        release = threshold + hysteresis
+    else:
+        release = threshold
+    return _Comparison(compare, threshold, release)
+
+
+def _reset_hook(check: _Comparison) -> Optional[Callable[[], None]]:
+    return check.reset if check.stateful else None
+
+
+def _compile_sensor_threshold(condition: Dict[str, Any]) -> CompiledCondition:
+    key = (condition.get('device_key'), condition.get('metric_key'))
+    check = _compile_comparison(condition)
+    if check is None:
+        return CompiledCondition(_never, inputs=frozenset([key]))
+
+    def predicate(readings: Readings, now: datetime) -> bool:
+        value = readings.get(key)
+        if value is None:
+            return False
+        try:
+            return check(float(value))
+        except (TypeError, ValueError):
+            return False
+
+    return CompiledCondition(predicate, inputs=frozenset([key]), reset=_reset_hook(check))
+
+
+def _window_seconds(spec: Dict[str, Any]) -> float:
+    minutes = float(spec.get('window_minutes', 0))
+    if minutes <= 0:
+        raise ValueError("window_minutes must be positive")
+    return minutes * 60
+
+
+def _compile_rolling_window(condition: Dict[str, Any], windows: WindowStore) -> CompiledCondition:
+    key = (condition.get('device_key'), condition.get('metric_key'))
+    aggregate = condition.get('aggregate', 'avg')
+    if aggregate not in AGGREGATES:
+        raise ValueError(f"Unknown aggregate '{aggregate}' (expected one of {', '.join(AGGREGATES)})")
+    window = windows.track(key, _window_seconds(condition))
+    min_samples = int(condition.get('min_samples', 1))
+    check = _compile_comparison(condition)
+    if check is None:
+        return CompiledCondition(_never, inputs=frozenset([key]))
+
+    def predicate(readings: Readings, now: datetime) -> bool:
+        ts = now.timestamp()
+        if window.count(ts) < min_samples:
+            return False
+        value = window.aggregate(aggregate, ts)
+        return value is not None and check(value)
+
+    return CompiledCondition(predicate, inputs=frozenset([key]), reset=_reset_hook(check))
+
+
+def _compile_rate_of_change(condition: Dict[str, Any], windows: WindowStore) -> CompiledCondition:
+    key = (condition.get('device_key'), condition.get('metric_key'))
+    per = condition.get('per', 'minute')
+    if per not in RATE_UNITS:
+        raise ValueError(f"Unknown rate unit '{per}' (expected one of {', '.join(RATE_UNITS)})")
+    scale = RATE_UNITS[per]
+    window = windows.track(key, _window_seconds(condition))
+    min_samples = max(2, int(condition.get('min_samples', 2)))
+    check = _compile_comparison(condition)
+    if check is None:
+        return CompiledCondition(_never, inputs=frozenset([key]))
+
+    def predicate(readings: Readings, now: datetime) -> bool:
+        ts = now.timestamp()
+        if window.count(ts) < min_samples:
+            return False
+        rate = window.rate(ts)
+        return rate is not None and check(rate * scale)
+
+    return CompiledCondition(predicate, inputs=frozenset([key]), reset=_reset_hook(check))
+
+
+def compile_arithmetic(expression: str, names: Iterable[str]) -> Callable[[Dict[str, float]], float]:
+    """Parse an arithmetic expression once into a function of its variables.
+
+    Only numbers, the given variable names, + - * / // % **, unary signs and
+    ``EXPRESSION_FUNCTIONS`` are allowed. Integer literals become floats, so
+    a huge power overflows instead of building an enormous integer.
+
+    Raises:
+        ValueError: The expression uses anything else
+    """
+    tree = ast.parse(expression, mode='eval')
+    allowed = set(names)
+    for node in ast.walk(tree):
+        if not isinstance(node, _EXPRESSION_NODES):
+            raise ValueError(f"Unsupported syntax in expression: {type(node).__name__}")
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ValueError(f"Unsupported constant in expression: {node.value!r}")
+            node.value = float(node.value)
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in EXPRESSION_FUNCTIONS or node.keywords:
+                raise ValueError("Only calls to " + ", ".join(EXPRESSION_FUNCTIONS) + " are allowed")
+        elif isinstance(node, ast.Name) and node.id not in allowed and node.id not in EXPRESSION_FUNCTIONS:
+            raise ValueError(f"Unknown name '{node.id}' in expression")
+
+    code = compile(tree, '<expression>', 'eval')
+    namespace = {'__builtins__': {}, **EXPRESSION_FUNCTIONS}
+
+    def evaluate(variables: Dict[str, float]) -> float:
+        return eval(code, namespace, variables)
+
+    return evaluate
+
+
+def _compile_expression(condition: Dict[str, Any], windows: WindowStore) -> CompiledCondition:
+    """Compare an arithmetic expression over metrics (latest values or window aggregates).
+
+    Each entry of ``variables`` names a device_key/metric_key, optionally with
+    ``aggregate`` and ``window_minutes`` to use a rolling aggregate instead of
+    the latest value.
+    """
+    variables = condition.get('variables') or {}
+    if not variables:
+        raise ValueError("Expression condition needs 'variables'")
+    evaluate = compile_arithmetic(condition.get('expression', ''), variables)
+
+    getters: List[Tuple[str, ReadingKey, Optional[str], Optional[RollingWindow]]] = []
+    for name, spec in variables.items():
+        key = (spec.get('device_key'), spec.get('metric_key'))
+        aggregate = spec.get('aggregate')
+        window = None
+        if aggregate is not None:
+            if aggregate not in AGGREGATES:
+                raise ValueError(f"Unknown aggregate '{aggregate}' for variable '{name}'")
+            window = windows.track(key, _window_seconds(spec))
+        getters.append((name, key, aggregate, window))
+
+    inputs = frozenset(key for _, key, _, _ in getters)
+    check = _compile_comparison(condition)
+    if check is None:
+        return CompiledCondition(_never, inputs=inputs)
+
+    def predicate(readings: Readings, now: datetime) -> bool:
+        ts = now.timestamp()
+        values: Dict[str, float] = {}
+        try:
+            for name, key, aggregate, window in getters:
+                value = window.aggregate(aggregate, ts) if window is not None else readings.get(key)
+                if value is None:
+                    return False
+                values[name] = float(value)
+            return check(float(evaluate(values)))
+        except (ArithmeticError, TypeError, ValueError):
+            return False
+
+    return CompiledCondition(predicate, inputs=inputs, reset=_reset_hook(check))
+
+
+def compile_condition(
+    condition: Dict[str, Any],
+    rule_id: str,
+    cron_ledger: CronLedger,
+    windows: Optional[WindowStore] = None,
+) -> CompiledCondition:
+    """Compile one condition; malformed conditions compile to a predicate that is never true."""
+    cond_type = condition.get('type')
+    if cond_type in WINDOW_CONDITION_TYPES and windows is None:
+        logger.error(f"{cond_type} condition in rule '{rule_id}' needs a window store; it will never match")
+        return CompiledCondition(_never)
+    try:
+        if cond_type == 'time_range':
+            return _compile_time_range(condition)
+        if cond_type == 'days_of_week':
+            return _compile_days_of_week(condition)
+        if cond_type == 'cron':
+            return _compile_cron(condition, rule_id, cron_ledger)
+        if cond_type == 'sensor_threshold':
+            return _compile_sensor_threshold(condition)
+        if cond_type == 'rolling_window':
+            return _compile_rolling_window(condition, windows)
+        if cond_type == 'rate_of_change':
+            return _compile_rate_of_change(condition, windows)
+        if cond_type == 'expression':
+            return _compile_expression(condition, windows)
+    except Exception as e:
+        logger.error(f"Invalid {cond_type} condition in rule '{rule_id}': {e}")
+        return CompiledCondition(_never, time_based=cond_type in TIME_CONDITION_TYPES)
+
+    logger.warning(f"Unknown condition type: {cond_type}")
+    return CompiledCondition(_never)
+
+
+def compile_rule(
+    rule: Dict[str, Any],
+    cron_ledger: CronLedger,
+    windows: Optional[WindowStore] = None,
+) -> CompiledRule:
+    """Compile a rule's all_of (AND) and any_of (OR) conditions into one predicate."""
+    rule_id = rule.get('id', 'unknown')
+    conditions = rule.get('conditions', {})
+    all_of = [compile_condition(c, rule_id, cron_ledger, windows) for c in conditions.get('all_of', [])]
+    any_of = [compile_condition(c, rule_id, cron_ledger, windows) for c in conditions.get('any_of', [])]
+
+    all_predicates = [c.predicate for c in all_of]
+    compiled = all_of + any_of
+    resets = [c.reset for c in compiled if c.reset is not None]
+
+    def evaluate(readings: Readings, now: datetime) -> bool:
+        for check in all_predicates:
+            if not check(readings, now):
+                return False
+        if not any_of:
+            return True
+        matched = False
+        for condition in any_of:
+            # Conditions with hysteresis are evaluated even once another branch
+            # matched, so their state follows every reading
+            if matched and condition.reset is None:
+                continue
+            if condition.predicate(readings, now):
+                matched = True
+            elif condition.reset is not None:
+                condition.reset()
+        return matched
+
+    def predicate(readings: Readings, now: datetime) -> bool:
+        if evaluate(readings, now):
+            return True
+        # Short-circuited conditions kept stale state; a rule that stops
+        # matching must cross the entry threshold again to match
+        for reset in resets:
+            reset()
+        return False
+
+    return CompiledRule(
+        rule=rule,
+        predicate=predicate,
+        inputs=frozenset().union(*(c.inputs for c in compiled)),
+        time_based=any(c.time_based for c in compiled),
+        conditions=compiled,
+    )
+
+
+class RuleIndex:
+    """Compiled rules in priority order, indexed by the readings they depend on."""
+
+    def __init__(self, rules: Iterable[CompiledRule] = ()):
+        self.rules: List[CompiledRule] = sorted(rules, key=lambda r: r.priority, reverse=True)
+        self._order = {id(rule): position for position, rule in enumerate(self.rules)}
+        self.by_input: Dict[ReadingKey, List[CompiledRule]] = {}
+        self.time_rules: List[CompiledRule] = []
+        for rule in self.rules:
+            if not rule.enabled:
+                continue
+            for key in rule.inputs:
+                self.by_input.setdefault(key, []).append(rule)
+            if rule.time_based:
+                self.time_rules.append(rule)
+
+    @classmethod
+    def build(
+        cls,
+        rules: Iterable[Dict[str, Any]],
+        cron_ledger: CronLedger,
+        windows: Optional[WindowStore] = None,
+    ) -> 'RuleIndex':
+        index = cls(compile_rule(rule, cron_ledger, windows) for rule in rules)
+        if windows is not None:
+            windows.prune()
+        return index
+
+    def affected(
+        self,
+        changed: Iterable[ReadingKey],
+        scheduled: Iterable[CompiledRule] = (),
+    ) -> List[CompiledRule]:
+        """Enabled rules depending on any changed reading, plus ``scheduled`` ones, by priority."""
+        selected: Dict[int, CompiledRule] = {id(rule): rule for rule in scheduled if id(rule) in self._order}
+        for key in changed:
+            for rule in self.by_input.get(key, ()):
+                selected[id(rule)] = rule
+        return sorted(selected.values(), key=lambda r: self._order[id(r)])
@@ -2,55 +2,44 @@
 
 This module provides DRY functionality for managing automation rules,
 used by both the AI tools (with protection) and HTTP API (without protection).
+
+Rules live in the backend database (``/api/automation/rules``); the backend
+versions every change and announces it with a ``rules_changed`` event, which
+is how the AutomationEngine learns about edits made here.
 """
 
-import json
-import uuid
-from datetime import datetime
-from pathlib import Path
+import logging
 from typing import Any, Dict, List, Optional
 
+import httpx
 
-class RuleManager:
-    """Manages automation rules with file persistence."""
+from .hydro_client import HydroAPIClient
 
-    def __init__(self, rules_path: Path):
-        """Initialize the rule manager.
+logger = logging.getLogger(__name__)
 
-        Args:
-            rules_path: Path to automation_rules.json file
-        """
-        self.rules_path = rules_path
 
-    def load_rules_file(self) -> Dict[str, Any]:
-        """Load the automation rules JSON file.
+def _error_result(exc: httpx.HTTPStatusError) -> Dict[str, Any]:
+    """Turn a backend 4xx into the ``{"status": "error"}`` shape callers expect."""
+    try:
+        message = exc.response.json().get("detail")
+    except ValueError:
+        message = None
+    return {
+        "status": "error",
+        "message": message or f"Backend returned {exc.response.status_code}",
+    }
 
-        Returns:
-            Dictionary containing rules and metadata
-        """
-        if not self.rules_path.exists():
-            return {"version": "1.0", "rules": [], "metadata": {}}
 
-        with open(self.rules_path, 'r') as f:
-            return json.load(f)
+class RuleManager:
+    """Manages automation rules through the backend API."""
 
-    def save_rules_file(self, data: Dict[str, Any], modified_by: str = "api") -> None:
-        """Save the automation rules JSON file.
+    def __init__(self, client: HydroAPIClient):
+        """Initialize the rule manager.
 
         Args:
-            data: Rules data to save
-            modified_by: Identifier of who made the change (default: "api")
+            client: Backend API client used to read and write rules
         """
-        # Ensure parent directory exists
-        self.rules_path.parent.mkdir(parents=True, exist_ok=True)
-
-        # Update metadata
-        data.setdefault("metadata", {})
-        data["metadata"]["last_modified"] = datetime.now().isoformat()
-        data["metadata"]["modified_by"] = modified_by
-
-        with open(self.rules_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        self._client = client
 
     def find_rule_by_id(self, rules: List[Dict[str, Any]], rule_id: str) -> Optional[tuple[int, Dict[str, Any]]]:
         """Find a rule by ID in the rules list.
@@ -70,6 +59,9 @@ class RuleManager:
     def validate_rule(self, rule: Dict[str, Any]) -> tuple[bool, Optional[str]]:
         """Validate a rule dictionary.
 
+        The backend validates again on write; checking here first saves a
+        round trip and keeps the error messages identical.
+
         Args:
             rule: Rule dictionary to validate
 
@@ -96,24 +88,22 @@ class RuleManager:
 
         return (True, None)
 
-    def list_rules(self) -> Dict[str, Any]:
-        """List all automation rules.
+    async def list_rules(self, **filters: Any) -> Dict[str, Any]:
+        """List automation rules.
+
+        Args:
+            **filters: Optional ``enabled``, ``protected``, ``search``, ``limit``, ``offset``
 
         Returns:
-            Dictionary with rules and counts
+            Dictionary with rules, counts and the rule-set version
         """
-        data = self.load_rules_file()
-        rules = data.get("rules", [])
-
-        return {
-            "rules": rules,
-            "total_count": len(rules),
-            "enabled_count": sum(1 for r in rules if r.get("enabled", False)),
-            "protected_count": sum(1 for r in rules if r.get("protected", False)),
-            "metadata": data.get("metadata", {})
-        }
+        return await self._client.list_automation_rules(**filters)
 
-    def create_rule(
+    async def get_rule(self, rule_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch one rule by ID; None if it does not exist."""
+        return await self._client.get_automation_rule(rule_id)
+
+    async def create_rule(
         self,
         name: str,
         conditions: Dict[str, Any],
@@ -139,21 +129,14 @@ class RuleManager:
         Returns:
             Dictionary with status and created rule
         """
-        data = self.load_rules_file()
-
-        # Generate unique ID
-        rule_id = f"rule-{uuid.uuid4().hex[:8]}"
-
-        # Create new rule
         new_rule = {
-            "id": rule_id,
             "name": name,
             "description": description,
             "enabled": enabled,
             "protected": protected,
             "priority": priority,
             "conditions": conditions,
-            "actions": actions
+            "actions": actions,
         }
 
         # Validate
@@ -164,20 +147,12 @@ class RuleManager:
                 "message": error_msg
             }
 
-        # Add to rules list
-        data.setdefault("rules", [])
-        data["rules"].append(new_rule)
-
-        # Save file
-        self.save_rules_file(data, modified_by=modified_by)
+        try:
+            return await self._client.create_automation_rule({**new_rule, "modified_by": modified_by})
+        except httpx.HTTPStatusError as exc:
+            return _error_result(exc)
 
-        return {
-            "status": "success",
-            "rule_id": rule_id,
-            "rule": new_rule
-        }
-
-    def update_rule(
+    async def update_rule(
         self,
         rule_id: str,
         name: Optional[str] = None,
@@ -205,52 +180,26 @@ class RuleManager:
         Returns:
             Dictionary with status and updated rule
         """
-        data = self.load_rules_file()
-
-        # Find rule
-        result = self.find_rule_by_id(data.get("rules", []), rule_id)
-        if result is None:
-            return {
-                "status": "error",
-                "message": f"Rule with ID '{rule_id}' not found"
-            }
-
-        rule_index, rule = result
-
-        # Update rule fields
-        if name is not None:
-            rule["name"] = name
-        if description is not None:
-            rule["description"] = description
-        if enabled is not None:
-            rule["enabled"] = enabled
-        if protected is not None:
-            rule["protected"] = protected
-        if priority is not None:
-            rule["priority"] = priority
-        if conditions is not None:
-            rule["conditions"] = conditions
-        if actions is not None:
-            rule["actions"] = actions
-
-        # Validate updated rule
-        is_valid, error_msg = self.validate_rule(rule)
-        if not is_valid:
-            return {
-                "status": "error",
-                "message": error_msg
-            }
-
-        # Save file
-        self.save_rules_file(data, modified_by=modified_by)
-
-        return {
-            "status": "success",
-            "rule_id": rule_id,
-            "rule": rule
+        changes = {
+            key: value
+            for key, value in {
+                "name": name,
+                "description": description,
+                "enabled": enabled,
+                "protected": protected,
+                "priority": priority,
+                "conditions": conditions,
+                "actions": actions,
+            }.items()
+            if value is not None
         }
 
-    def delete_rule(self, rule_id: str, modified_by: str = "api") -> Dict[str, Any]:
+        try:
+            return await self._client.update_automation_rule(rule_id, {**changes, "modified_by": modified_by})
+        except httpx.HTTPStatusError as exc:
+            return _error_result(exc)
+
+    async def delete_rule(self, rule_id: str, modified_by: str = "api") -> Dict[str, Any]:
         """Delete an automation rule.
 
         Args:
@@ -260,28 +209,12 @@ class RuleManager:
         Returns:
             Dictionary with status
         """
-        data = self.load_rules_file()
-
-        # Find and remove rule
-        original_count = len(data.get("rules", []))
-        data["rules"] = [r for r in data.get("rules", []) if r.get("id") != rule_id]
-
-        if len(data["rules"]) == original_count:
-            return {
-                "status": "error",
-                "message": f"Rule with ID '{rule_id}' not found"
-            }
+        try:
+            return await self._client.delete_automation_rule(rule_id, modified_by=modified_by)
+        except httpx.HTTPStatusError as exc:
+            return _error_result(exc)
 
-        # Save file
-        self.save_rules_file(data, modified_by=modified_by)
-
-        return {
-            "status": "success",
-            "rule_id": rule_id,
-            "message": "Rule deleted successfully"
-        }
-
-    def toggle_rule(self, rule_id: str, enabled: bool, modified_by: str = "api") -> Dict[str, Any]:
+    async def toggle_rule(self, rule_id: str, enabled: bool, modified_by: str = "api") -> Dict[str, Any]:
         """Enable or disable an automation rule.
 
         Args:
@@ -292,27 +225,7 @@ class RuleManager:
         Returns:
             Dictionary with status
         """
-        data = self.load_rules_file()
-
-        # Find rule
-        result = self.find_rule_by_id(data.get("rules", []), rule_id)
-        if result is None:
-            return {
-                "status": "error",
-                "message": f"Rule with ID '{rule_id}' not found"
-            }
-
-        rule_index, rule = result
-
-        # Toggle rule
-        rule["enabled"] = enabled
-
-        # Save file
-        self.save_rules_file(data, modified_by=modified_by)
-
-        return {
-            "status": "success",
-            "rule_id": rule_id,
-            "enabled": enabled,
-            "message": f"Rule {'enabled' if enabled else 'disabled'} successfully"
-        }
+        try:
+            return await self._client.toggle_automation_rule(rule_id, enabled, modified_by=modified_by)
+        except httpx.HTTPStatusError as exc:
+            return _error_result(exc)
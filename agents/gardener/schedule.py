@@ -0,0 +1,120 @@
+"""Timeline of upcoming time-condition transitions and persisted cron bookkeeping.
+
+Each compiled time-based rule knows the next instant one of its conditions
+can change value (a time_range boundary, local midnight for days_of_week, the
+next cron occurrence). ``ScheduleTimeline`` keeps those instants in a heap so
+the engine sleeps until exactly the next boundary instead of ticking.
+
+``CronLedger`` records the last occurrence each cron rule fired for and
+persists it, so an occurrence fires exactly once even if the cycle that
+should have caught it ran late or the process restarted in between.
+"""
+
+import heapq
+import itertools
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .rule_compiler import CompiledRule
+
+logger = logging.getLogger(__name__)
+
+# Wake slightly after a boundary so the condition already reads its new value
+WAKE_MARGIN = timedelta(seconds=1)
+
+
+class CronLedger:
+    """Last fired occurrence per cron rule, optionally persisted to a JSON file."""
+
+    def __init__(self, path: Optional[Path] = None, catchup_seconds: float = 900.0):
+        self.path = path
+        self.catchup_seconds = catchup_seconds
+        self._last: Dict[str, datetime] = {}
+        self._dirty = False
+        self.load()
+
+    def load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self._last = {
+                rule_id: datetime.fromisoformat(ts)
+                for rule_id, ts in (data.get('cron_last_fired') or {}).items()
+            }
+        except Exception as e:
+            logger.error(f"Failed to load cron state from {self.path}: {e}")
+
+    def last(self, rule_id: str) -> Optional[datetime]:
+        return self._last.get(rule_id)
+
+    def mark(self, rule_id: str, occurrence: datetime) -> None:
+        self._last[rule_id] = occurrence
+        self._dirty = True
+
+    def prune(self, rule_ids: Iterable[str]) -> None:
+        """Forget rules that no longer exist."""
+        keep = set(rule_ids)
+        for rule_id in [r for r in self._last if r not in keep]:
+            del self._last[rule_id]
+            self._dirty = True
+
+    def save(self) -> None:
+        """Write the ledger if it changed (temp file + rename, so it is never truncated)."""
+        if not self._dirty or self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump({'cron_last_fired': {k: v.isoformat() for k, v in self._last.items()}}, f, indent=2)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except Exception as e:
+            logger.error(f"Failed to save cron state to {self.path}: {e}")
+
+
+class ScheduleTimeline:
+    """Min-heap of (next transition, rule) for time-based rules."""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, 'CompiledRule']] = []
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def _push(self, rule: 'CompiledRule', now: datetime) -> None:
+        at = rule.next_change(now)
+        if at is not None:
+            heapq.heappush(self._heap, ((at + WAKE_MARGIN).timestamp(), next(self._seq), rule))
+
+    def rebuild(self, rules: Iterable['CompiledRule'], now: datetime) -> None:
+        self._heap = []
+        for rule in rules:
+            self._push(rule, now)
+
+    def next_at(self) -> Optional[float]:
+        """POSIX timestamp of the next wake-up, if any."""
+        return self._heap[0][0] if self._heap else None
+
+    def seconds_until_next(self, now: datetime) -> Optional[float]:
+        at = self.next_at()
+        return None if at is None else max(0.0, at - now.timestamp())
+
+    def pop_due(self, now: datetime) -> List['CompiledRule']:
+        """Rules whose transition has passed, each rescheduled for its following transition."""
+        due: Dict[int, 'CompiledRule'] = {}
+        ts = now.timestamp()
+        while self._heap and self._heap[0][0] <= ts:
+            _, _, rule = heapq.heappop(self._heap)
+            due[id(rule)] = rule
+        for rule in due.values():
+            self._push(rule, now)
+        return list(due.values())
@@ -0,0 +1,523 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from agents.gardener.automation_runner import AutomationEngine
+from agents.gardener.backtest import run_backtest
+from agents.gardener.reconciler import ActuatorReconciler, DesiredState, claim_actuator
+from agents.gardener.rule_compiler import RuleIndex, compile_arithmetic, compile_rule
+from agents.gardener.schedule import CronLedger, ScheduleTimeline
+from agents.gardener.windows import RollingWindow
+
+
+class AutomationClient:
+    def __init__(self, rules=None) -> None:
+        self.rules = list(rules or [])
+        self.version = 1
+        self.controls = []
+        self.batches = 0
+        self.mode_requests = 0
+        self.executions = []
+
+    async def list_automation_rules(self, **filters):
+        return {"rules": self.rules, "version": self.version}
+
+    async def get_automation_rules_version(self):
+        return self.version
+
+    async def record_rule_executions(self, executions):
+        self.executions.extend(executions)
+
+    async def latest_values(self):
+        return {}
+
+    async def get_actuator_modes(self, device_keys=None):
+        self.mode_requests += 1
+        return {"pump-1": {"relay1": "auto", "relay2": "manual", "relay3": "auto"}}
+
+    async def control_actuators(self, commands, source="ai", force=False):
+        self.batches += 1
+        self.controls.extend((c["device_id"], c["actuator_key"], c["state"]) for c in commands)
+        return {"processed": len(commands), "details": commands}
+
+
+def _threshold_rule(rule_id, metric_key, value, state, actuator_key="relay1", priority=100):
+    return {
+        "id": rule_id,
+        "name": rule_id,
+        "enabled": True,
+        "priority": priority,
+        "conditions": {
+            "all_of": [
+                {
+                    "type": "sensor_threshold",
+                    "device_key": "env-1",
+                    "metric_key": metric_key,
+                    "operator": "less_than",
+                    "value": value,
+                }
+            ]
+        },
+        "actions": [
+            {"type": "set_actuator", "device_key": "pump-1", "actuator_key": actuator_key, "state": state}
+        ],
+    }
+
+
+@pytest.mark.asyncio
+async def test_stream_readings_only_reevaluate_dependent_rules(tmp_path):
+    client = AutomationClient([
+        _threshold_rule("reservoir-low", "level", 10, "off"),
+        _threshold_rule("too-cold", "temp", 15, "on"),
+    ])
+    engine = AutomationEngine(client, state_path=tmp_path / "automation_state.json")
+    await engine.load_rules()
+
+    await engine.handle_backend_event({"type": "reading", "device_id": "env-1", "sensors": {"level": 5}})
+    assert engine._changed == {("env-1", "level")}
+
+    rules = engine.index.affected(engine._changed)
+    assert [r.rule_id for r in rules] == ["reservoir-low"]
+
+    await engine._evaluate_rules(rules)
+    assert client.controls == [("pump-1", "relay1", "off")]
+
+    # An unchanged value does not wake the engine
+    engine._changed.clear()
+    engine._wakeup.clear()
+    await engine.handle_backend_event({"type": "reading", "device_id": "env-1", "sensors": {"level": 5}})
+    assert not engine._wakeup.is_set()
+
+
+@pytest.mark.asyncio
+async def test_cycle_sends_one_batch_with_highest_priority_state(tmp_path):
+    client = AutomationClient([
+        _threshold_rule("low-priority", "level", 10, "on", priority=10),
+        _threshold_rule("high-priority", "level", 10, "off", priority=90),
+        _threshold_rule("manual-relay", "level", 10, "on", actuator_key="relay2"),
+        _threshold_rule("already-on", "level", 10, "on", actuator_key="relay3"),
+    ])
+    engine = AutomationEngine(client, state_path=tmp_path / "automation_state.json")
+    await engine.load_rules()
+    engine._values = {("env-1", "level"): 5, ("pump-1", "relay3"): "on"}
+
+    await engine._evaluate_rules(engine.index.rules)
+
+    assert client.mode_requests == 1
+    assert client.batches == 1
+    assert client.controls == [("pump-1", "relay1", "off")]
+
+
+def test_compiled_rules_index_inputs_and_time_conditions():
+    night = {
+        "id": "night-pump",
+        "enabled": True,
+        "priority": 50,
+        "conditions": {
+            "all_of": [
+                {"type": "time_range", "start_time": "22:00", "end_time": "06:00", "timezone": "UTC"},
+                {"type": "sensor_threshold", "device_key": "env-1", "metric_key": "temp",
+                 "operator": "greater_than", "value": "20"},
+            ]
+        },
+        "actions": [],
+    }
+    compiled = compile_rule(night, CronLedger())
+    assert compiled.inputs == {("env-1", "temp")}
+    assert compiled.time_based
+
+    late = datetime(2024, 1, 1, 23, 30, tzinfo=timezone.utc)
+    noon = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+    assert compiled.predicate({("env-1", "temp"): 21.5}, late)
+    assert not compiled.predicate({("env-1", "temp"): 21.5}, noon)
+    assert not compiled.predicate({}, late)
+
+    index = RuleIndex([compiled, compile_rule(_threshold_rule("reservoir-low", "level", 10, "off"), CronLedger())])
+    assert [r.rule_id for r in index.rules] == ["reservoir-low", "night-pump"]
+    assert [r.rule_id for r in index.affected([("env-1", "temp")])] == ["night-pump"]
+    assert [r.rule_id for r in index.affected([], scheduled=[compiled])] == ["night-pump"]
+
+
+def test_timeline_wakes_at_time_range_boundaries():
+    rule = compile_rule({
+        "id": "lights",
+        "enabled": True,
+        "conditions": {"all_of": [
+            {"type": "time_range", "start_time": "06:00", "end_time": "18:00", "timezone": "UTC"},
+        ]},
+        "actions": [],
+    }, CronLedger())
+    now = datetime(2024, 1, 1, 5, 0, tzinfo=timezone.utc)
+
+    timeline = ScheduleTimeline()
+    timeline.rebuild([rule], now)
+    assert timeline.seconds_until_next(now) == 3601
+    assert timeline.pop_due(now) == []
+
+    # Popping reschedules the rule for its following boundary
+    after_start = now + timedelta(hours=1, seconds=1)
+    assert timeline.pop_due(after_start) == [rule]
+    assert timeline.next_at() == datetime(2024, 1, 1, 18, 0, 1, tzinfo=timezone.utc).timestamp()
+
+
+def test_cron_occurrence_fires_once_across_restarts(tmp_path):
+    state_path = tmp_path / "automation_state.json"
+    rule = {
+        "id": "flush",
+        "enabled": True,
+        "conditions": {"all_of": [{"type": "cron", "expression": "0 * * * *"}]},
+        "actions": [],
+    }
+    top_of_hour = datetime.now().astimezone().replace(minute=0, second=0, microsecond=0)
+    late = top_of_hour + timedelta(minutes=5)
+
+    ledger = CronLedger(state_path)
+    compiled = compile_rule(rule, ledger)
+    assert compiled.predicate({}, late)
+    assert not compiled.predicate({}, late + timedelta(seconds=30))
+    ledger.save()
+
+    # A restarted engine remembers the occurrence it already fired for
+    restarted = compile_rule(rule, CronLedger(state_path))
+    assert not restarted.predicate({}, late + timedelta(minutes=1))
+
+    # An occurrence missed by more than the catch-up window is skipped
+    stale = compile_rule(rule, CronLedger(catchup_seconds=60))
+    assert not stale.predicate({}, late)
+
+
+def test_reconciler_waits_for_confirmation_and_holds_min_on():
+    key = ("pump-1", "relay1")
+    reconciler = ActuatorReconciler(command_timeout=15, max_attempts=2)
+    reconciler.update({key: DesiredState("on", "fill", min_on_seconds=60)})
+
+    assert reconciler.due({key: "off"}, now=0) == [key]
+    reconciler.sent([key], now=0)
+    # In flight: not re-sent while the device is slow to report
+    assert reconciler.due({key: "off"}, now=10) == []
+    assert reconciler.seconds_until_due(now=10) == 5
+    # Unconfirmed after the timeout: re-sent once, then given up
+    assert reconciler.due({key: "off"}, now=16) == [key]
+    reconciler.sent([key], now=16)
+    assert reconciler.due({key: "off"}, now=32) == []
+    assert reconciler.desired == {}
+
+    reconciler.update({key: DesiredState("on", "fill", min_on_seconds=60)})
+    reconciler.sent([key], now=100)
+    reconciler.observe(key, "on", now=102)
+    assert reconciler.pending == {}
+
+    # Another rule cannot switch the pump off before min_on has passed
+    reconciler.update({key: DesiredState("off", "drain")})
+    assert reconciler.due({key: "on"}, now=120) == []
+    assert reconciler.seconds_until_due(now=120) == 42
+    assert reconciler.due({key: "on"}, now=163) == [key]
+
+
+def test_claims_are_normalized_like_the_backend():
+    plan = {}
+    rule = {'name': 'fill'}
+    claim_actuator(plan, {'device_key': 'pump-1', 'actuator_key': 'Relay 1', 'state': 'ON'}, rule)
+    # One bad state must not reach the backend and fail the whole batch
+    claim_actuator(plan, {'device_key': 'pump-1', 'actuator_key': 'relay2', 'state': 'toggle'}, rule)
+
+    assert list(plan) == [("pump-1", "relay1")]
+    assert plan[("pump-1", "relay1")].state == "on"
+
+
+@pytest.mark.asyncio
+async def test_engine_backs_off_while_the_backend_is_down(tmp_path):
+    class DownClient(AutomationClient):
+        async def get_actuator_modes(self, device_keys=None):
+            self.mode_requests += 1
+            raise ConnectionError("backend unavailable")
+
+    class Stream:
+        connected = True
+
+        def subscribe(self, handler):
+            pass
+
+    client = DownClient()
+    engine = AutomationEngine(client, state_path=tmp_path / "automation_state.json")
+    key = ("pump-1", "relay1")
+    engine.reconciler.update({key: DesiredState("on", "fill")})
+    # A command that timed out before the backend went away
+    engine.reconciler.sent([key], now=time.monotonic() - 60)
+
+    task = asyncio.create_task(engine.run_event_driven(Stream(), reconcile_interval=3600))
+    await asyncio.sleep(0.3)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert client.mode_requests == 1
+    assert engine.reconciler.seconds_until_due() > 10
+    assert engine.reconciler.due({}) == []
+
+
+def test_sensor_threshold_hysteresis_stops_chatter():
+    rule = _threshold_rule("heater", "temp", 20, "on")
+    rule["conditions"]["all_of"][0]["hysteresis"] = 1.5
+    compiled = compile_rule(rule, CronLedger())
+    now = datetime.now(timezone.utc)
+
+    results = [compiled.predicate({("env-1", "temp"): t}, now) for t in (20.2, 19.9, 20.1, 21.4, 21.5, 20.5)]
+    assert results == [False, True, True, True, False, False]
+
+
+def test_hysteresis_resets_when_an_earlier_condition_short_circuits():
+    def threshold(metric_key, operator, value, **extra):
+        return {"type": "sensor_threshold", "device_key": "env-1", "metric_key": metric_key,
+                "operator": operator, "value": value, **extra}
+
+    hot = threshold("temp", "greater_than", 30, hysteresis=2)
+    gated = compile_rule({"id": "gated", "conditions": {"all_of": [threshold("gate", "equals", 1), hot]}}, CronLedger())
+    either = compile_rule({"id": "either", "conditions": {"any_of": [threshold("gate", "equals", 1), hot]}}, CronLedger())
+    now = datetime.now(timezone.utc)
+
+    def run(compiled, readings):
+        return [compiled.predicate({("env-1", "gate"): g, ("env-1", "temp"): t}, now) for g, t in readings]
+
+    # 29 is inside the band, but the rule stopped matching in between
+    assert run(gated, [(1, 31), (0, 29), (1, 29)]) == [True, False, False]
+    assert run(gated, [(1, 31), (1, 29), (1, 27)]) == [True, True, False]
+
+    # The temperature drops out while the gate keeps the rule matching
+    assert run(either, [(0, 31), (1, 25), (0, 29)]) == [True, True, False]
+
+
+@pytest.mark.asyncio
+async def test_rules_changed_event_reloads_and_firings_are_logged_once(tmp_path):
+    client = AutomationClient([_threshold_rule("reservoir-low", "level", 10, "off")])
+    engine = AutomationEngine(client, state_path=tmp_path / "automation_state.json")
+    await engine.load_rules()
+    assert not await engine.reload_rules_if_changed(check_version=True)
+
+    # An event for the version already compiled is ignored
+    await engine.handle_backend_event({"type": "rules_changed", "version": 1, "rule_id": "reservoir-low"})
+    assert not engine._wakeup.is_set()
+
+    client.rules.append(_threshold_rule("too-cold", "temp", 15, "on", actuator_key="relay3"))
+    client.version = 2
+    await engine.handle_backend_event({"type": "rules_changed", "version": 2, "rule_id": "too-cold"})
+    assert engine._wakeup.is_set()
+    assert await engine.reload_rules_if_changed()
+    assert {r.rule_id for r in engine.index.rules} == {"reservoir-low", "too-cold"}
+
+    # A rule matching on consecutive cycles is one firing, until it stops matching
+    for level in (5, 4, 20, 3):
+        engine._values = {("env-1", "level"): level}
+        await engine._evaluate_rules(engine.index.rules)
+    assert [e["rule_id"] for e in client.executions] == ["reservoir-low", "reservoir-low"]
+    assert client.executions[0]["outcome"] == "success"
+    assert client.executions[0]["actions"][0]["state"] == "off"
+
+    # Edits missed while the stream was down are caught by the version check
+    client.rules = []
+    client.version = 3
+    assert await engine.reload_rules_if_changed(check_version=True)
+    assert engine.index.rules == []
+
+
+@pytest.mark.asyncio
+async def test_ai_actions_start_in_background_once_per_match(tmp_path):
+    class SlowAgent:
+        def __init__(self):
+            self.runs = 0
+            self.release = asyncio.Event()
+
+        async def run(self, messages, temperature):
+            self.runs += 1
+            await self.release.wait()
+            return {"final": "ok", "trace": []}
+
+    class Client(AutomationClient):
+        async def save_conversation_messages(self, messages):
+            pass
+
+    rule = _threshold_rule("check-plants", "level", 10, "on")
+    rule["actions"].append({"type": "run_ai_agent", "prompt": "Check the reservoir"})
+    agent = SlowAgent()
+    engine = AutomationEngine(Client([rule]), agent=agent, state_path=tmp_path / "automation_state.json")
+    await engine.load_rules()
+
+    async def cycle(level):
+        engine._values = {("env-1", "level"): level}
+        # Completes while the agent is still running
+        await asyncio.wait_for(engine._evaluate_rules(engine.index.rules), timeout=1)
+        await asyncio.sleep(0)
+
+    for level in (5, 4, 3):
+        await cycle(level)
+    assert agent.runs == 1
+
+    # Matching again while the first run is in progress does not stack runs
+    await cycle(20)
+    await cycle(5)
+    assert agent.runs == 1
+
+    agent.release.set()
+    await asyncio.sleep(0)
+    await cycle(20)
+    await cycle(5)
+    assert agent.runs == 2
+    await asyncio.gather(*engine._agent_runs.values())
+
+
+@pytest.mark.asyncio
+async def test_stopping_the_engine_cancels_agent_runs(tmp_path):
+    class StuckAgent:
+        cancelled = False
+
+        async def run(self, messages, temperature):
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                StuckAgent.cancelled = True
+                raise
+
+    class Client(AutomationClient):
+        async def latest_values(self):
+            return {("env-1", "level"): 5}
+
+    class Stream:
+        connected = True
+
+        def subscribe(self, handler):
+            pass
+
+    rule = _threshold_rule("check-plants", "level", 10, "on")
+    rule["actions"].append({"type": "run_ai_agent", "prompt": "Check the reservoir"})
+    engine = AutomationEngine(Client([rule]), agent=StuckAgent(), state_path=tmp_path / "automation_state.json")
+
+    task = asyncio.create_task(engine.run_event_driven(Stream(), reconcile_interval=3600))
+    await asyncio.sleep(0.1)
+    assert engine._agent_runs
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert StuckAgent.cancelled
+    assert engine._agent_runs == {}
+
+
+def test_backtest_replays_readings_on_a_virtual_clock():
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    end = start + timedelta(days=2)
+
+    def relay(actuator_key, state):
+        return [{"type": "set_actuator", "device_key": "pump-1", "actuator_key": actuator_key, "state": state}]
+
+    def window(start_time, end_time):
+        return {"all_of": [{"type": "time_range", "start_time": start_time, "end_time": end_time, "timezone": "UTC"}]}
+
+    low = _threshold_rule("reservoir-low", "level", 10, "on")
+    low["conditions"]["all_of"][0]["hysteresis"] = 2
+    ok = _threshold_rule("reservoir-ok", "level", 12, "off")
+    ok["conditions"]["all_of"][0]["operator"] = "greater_than"
+    rules = [
+        low,
+        ok,
+        {"id": "lights-on", "name": "lights-on", "conditions": window("06:00", "17:59"), "actions": relay("relay2", "on")},
+        {"id": "lights-off", "name": "lights-off", "conditions": window("18:00", "05:59"), "actions": relay("relay2", "off")},
+    ]
+    batches = [
+        # Stored actuator readings are replaced by the simulated state
+        (start + timedelta(hours=1), {("env-1", "level"): 11, ("pump-1", "relay1"): "on"}),
+        (start + timedelta(hours=2), {("env-1", "level"): 9}),
+        (start + timedelta(hours=3), {("env-1", "level"): 9.5}),
+        (start + timedelta(hours=4), {("env-1", "level"): 11}),
+        (start + timedelta(hours=5), {("env-1", "level"): 13}),
+    ]
+
+    report = run_backtest(rules, batches, start, end, initial={("pump-1", "relay1"): "off"})
+
+    assert report["readings_replayed"] == 5
+    counts = {rule["rule_id"]: rule["firings"] for rule in report["rules"]}
+    assert counts == {"reservoir-low": 1, "reservoir-ok": 1, "lights-on": 2, "lights-off": 3}
+
+    actuators = {a["actuator_key"]: a for a in report["actuators"]}
+    # Hysteresis keeps the pump on from 9 (2h) until the level clears 12 (5h)
+    assert [(t["at"], t["state"]) for t in actuators["relay1"]["timeline"]] == [
+        ((start + timedelta(hours=2)).isoformat(), "on"),
+        ((start + timedelta(hours=5)).isoformat(), "off"),
+    ]
+    assert actuators["relay1"]["duty_cycle"] == 0.0625
+    # Lights switch on each time boundary, one second after it (the timeline's wake margin)
+    assert actuators["relay2"]["switches"] == 5
+    assert actuators["relay2"]["on_seconds"] == 2 * 12 * 3600
+    assert actuators["relay2"]["duty_cycle"] == 0.5
+
+
+def test_rolling_window_aggregates_expire_old_samples():
+    window = RollingWindow(60)
+    for at, value in ((0, 5.0), (10, 9.0), (20, 1.0), (30, 4.0)):
+        window.add(at, value)
+    assert (window.avg(30), window.min(30), window.max(30)) == (4.75, 1.0, 9.0)
+    assert window.rate(30) == pytest.approx(-1 / 30)
+
+    # At 75s the samples from 0s and 10s have left the window
+    assert (window.count(75), window.avg(75), window.min(75), window.max(75)) == (2, 2.5, 1.0, 4.0)
+    assert window.count(200) == 0 and window.avg(200) is None
+
+
+def test_expression_conditions_only_allow_arithmetic():
+    vpd = compile_arithmetic("0.6108 * exp(17.27 * t / (t + 237.3)) * (1 - rh / 100)", ["t", "rh"])
+    assert vpd({"t": 25.0, "rh": 60.0}) == pytest.approx(1.267, abs=1e-3)
+
+    for unsafe in ("__import__('os')", "t.real", "open", "[t]", "'a'", "x + 1", "exp(t, base=2)"):
+        with pytest.raises(ValueError):
+            compile_arithmetic(unsafe, ["t"])
+    with pytest.raises(OverflowError):
+        compile_arithmetic("9 ** 9 ** 9", [])({})
+
+
+@pytest.mark.asyncio
+async def test_rolling_average_ignores_a_single_spike(tmp_path):
+    rule = _threshold_rule("hot", "temp", 30, "on")
+    rule["conditions"] = {"all_of": [{
+        "type": "rolling_window", "device_key": "env-1", "metric_key": "temp",
+        "aggregate": "avg", "window_minutes": 5, "min_samples": 3,
+        "operator": "greater_than", "value": 30,
+    }]}
+    vpd_rule = _threshold_rule("dry-air", "temp", 0, "on", actuator_key="relay3")
+    vpd_rule["conditions"] = {"all_of": [{
+        "type": "expression",
+        "expression": "0.6108 * exp(17.27 * t / (t + 237.3)) * (1 - rh / 100)",
+        "variables": {
+            "t": {"device_key": "env-1", "metric_key": "temp", "aggregate": "avg", "window_minutes": 5},
+            "rh": {"device_key": "env-1", "metric_key": "humidity"},
+        },
+        "operator": "greater_than", "value": 3.0,
+    }]}
+    client = AutomationClient([rule, vpd_rule])
+    engine = AutomationEngine(client, state_path=tmp_path / "automation_state.json")
+    await engine.load_rules()
+    assert len(engine.windows) == 1
+
+    start = datetime.now(timezone.utc) - timedelta(minutes=3)
+
+    async def reading(seconds, **sensors):
+        at = start + timedelta(seconds=seconds)
+        await engine.handle_backend_event({
+            "type": "reading", "device_id": "env-1", "timestamp": at.timestamp() * 1000, "sensors": sensors,
+        })
+        changed, engine._changed = engine._changed, set()
+        await engine._evaluate_rules(engine.index.affected(changed))
+
+    await reading(0, temp=25, humidity=60)
+    await reading(30, temp=45)
+    await reading(60, temp=20)
+    assert client.controls == []
+
+    # A repeated value still counts as a sample and moves the average
+    await reading(90, temp=40)
+    await reading(120, temp=40)
+    await reading(150, temp=40)
+    assert client.controls == [("pump-1", "relay1", "on")]
+
+    await reading(160, humidity=20)
+    assert client.controls[-1] == ("pump-1", "relay3", "on")
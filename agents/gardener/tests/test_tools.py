@@ -4,9 +4,12 @@ import json
 import pytest
 
 from agents.gardener.agent import GardenerAgent
+from agents.gardener.frame_analyzer import FrameAnalysisWorker, MockFrameAnalyzer, parse_analysis
 from agents.gardener.hydro_client import DeviceInfo, MetricReading
 from agents.gardener.llm_providers import ChatMessage, MockLLMProvider
+from agents.gardener.tool_cache import ToolResultCache
 from agents.gardener.tools import ToolRegistry
+from agents.gardener.vision import VisionAPIError, prepare_image
 
 
 class FakeClient:
@@ -80,3 +83,223 @@ async def test_agent_handles_tool_roundtrip():
     tool_trace = result["trace"][0]["tools"][0]
     assert tool_trace["tool"] == "get_sensor_snapshot"
     assert "env-1" in tool_trace["result"]["devices"]
+
+
+class CountingClient(FakeClient):
+    def __init__(self) -> None:
+        super().__init__()
+        self.snapshot_calls = 0
+        self.history_calls = 0
+
+    async def latest_readings(self, device_keys=None):
+        self.snapshot_calls += 1
+        await asyncio.sleep(0)
+        return await super().latest_readings(device_keys=device_keys)
+
+    async def get_historical_readings(self, **kwargs):
+        self.history_calls += 1
+        await asyncio.sleep(0)
+        return {"devices": {}, "statistics": {}}
+
+
+@pytest.mark.asyncio
+async def test_read_only_tool_results_are_memoized_and_coalesced():
+    client = CountingClient()
+    registry = ToolRegistry(client)
+    await registry.refresh()
+
+    history = registry.get("get_historical_readings")
+    await asyncio.gather(
+        history.handler({}),
+        history.handler({"hours": 24}),
+        history.handler({"include_stats": True}),
+    )
+    await history.handler({"hours": 48})
+
+    snapshot = registry.get("get_sensor_snapshot")
+    await snapshot.handler({"device_keys": ["env-1", "cam-1"]})
+    await snapshot.handler({"device_keys": ["cam-1", "env-1"]})
+
+    assert client.history_calls == 2
+    assert client.snapshot_calls == 1
+    stats = registry.cache_stats()["tools"]
+    assert stats["get_historical_readings"]["coalesced"] == 2
+    assert stats["get_sensor_snapshot"]["hits"] == 1
+    assert "control_actuators" not in stats
+
+
+@pytest.mark.asyncio
+async def test_cancelled_loader_hands_the_load_to_a_waiter():
+    cache = ToolResultCache()
+    started = []
+    release = asyncio.Event()
+
+    async def loader():
+        started.append(len(started))
+        await release.wait()
+        return {"run": started[-1]}
+
+    def call():
+        return asyncio.create_task(cache.get_or_call("get_historical_readings", "{}", 60, loader))
+
+    leader = call()
+    await asyncio.sleep(0)
+    waiters = [call(), call()]
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*waiters) == [{"run": 1}, {"run": 1}]
+    assert leader.cancelled()
+    assert started == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_registry_reuses_roster_until_device_membership_changes():
+    client = FakeClient()
+    calls = 0
+    list_devices = client.list_devices
+
+    async def counting_list_devices(**kwargs):
+        nonlocal calls
+        calls += 1
+        return await list_devices(**kwargs)
+
+    client.list_devices = counting_list_devices
+    registry = ToolRegistry(client)
+
+    await registry.ensure_fresh()
+    await registry.ensure_fresh()
+    assert calls == 1
+
+    # Readings from a known device re-publish its device event; not a roster change
+    await registry.handle_backend_event({"type": "device", "device_id": "env-1", "is_active": True})
+    await registry.ensure_fresh()
+    assert calls == 1
+
+    await registry.handle_backend_event({"type": "device", "device_id": "env-2", "is_active": True})
+    await registry.ensure_fresh()
+    assert calls == 2
+
+    # A membership change that arrives while the roster is being fetched is kept
+    async def fetch_during_event(**kwargs):
+        nonlocal calls
+        calls += 1
+        await registry.handle_backend_event({"type": "device", "device_id": "env-3", "is_active": True})
+        return await list_devices(**kwargs)
+
+    client.list_devices = fetch_during_event
+    registry.mark_stale()
+    await registry.ensure_fresh()
+    assert calls == 3
+    assert registry.is_stale()
+
+
+@pytest.mark.asyncio
+async def test_agent_reuses_stored_frame_description(monkeypatch):
+    client = FakeClient()
+    stored = {}
+    downloads = []
+
+    async def get_camera_frame(device_key, days_ago=0):
+        return {
+            "status": "success",
+            "content_type": "image/webp",
+            "frame_id": 7,
+            "content_hash": "abc123",
+            "image_url": "http://backend/api/cameras/frames/7/image",
+        }
+
+    async def get_frame_image(frame_id):
+        downloads.append(frame_id)
+        return {"content_type": "image/webp", "frame_id": frame_id, "image_bytes": b"\x00\x01"}
+
+    async def get_frame_analysis(frame_id, content_hash=None):
+        return stored.get(frame_id)
+
+    async def save_frame_analysis(frame_id, *, analysis_model, notes, **fields):
+        stored[frame_id] = {"id": frame_id, "analysis_model": analysis_model, "notes": notes}
+        return stored[frame_id]
+
+    client.get_camera_frame = get_camera_frame
+    client.get_frame_image = get_frame_image
+    client.get_frame_analysis = get_frame_analysis
+    client.save_frame_analysis = save_frame_analysis
+
+    registry = ToolRegistry(client)
+    await registry.refresh()
+
+    vision_calls = []
+
+    async def fake_describe(self, data, mime_type):
+        vision_calls.append(mime_type)
+        return "Lettuce looks healthy", "test-vision"
+
+    monkeypatch.setattr(GardenerAgent, "_describe_image", fake_describe)
+
+    message = ChatMessage(
+        role="user",
+        content=json.dumps({"tool": "get_camera_image", "arguments": {"device_key": "cam-1"}}),
+    )
+    first_agent = GardenerAgent(provider=MockLLMProvider(), registry=registry)
+    await first_agent.run(messages=[message])
+    # A fresh agent has an empty in-process cache and must hit the stored analysis
+    second_agent = GardenerAgent(provider=MockLLMProvider(), registry=registry)
+    result = await second_agent.run(messages=[message])
+
+    assert len(vision_calls) == 1
+    # Frame bytes are only downloaded for the one vision call
+    assert downloads == [7]
+    assert stored[7]["analysis_model"] == "test-vision"
+    assert "Lettuce looks healthy" in result["final"]
+
+
+class FrameQueueClient:
+    def __init__(self, frame_ids, failures=None):
+        self.pending = {frame_id: {"id": frame_id} for frame_id in frame_ids}
+        self.failures = dict(failures or {})
+        self.saved = {}
+
+    async def list_pending_frames(self, *, limit=20, max_age_hours=None):
+        return list(self.pending.values())[:limit]
+
+    async def get_frame_image(self, frame_id):
+        if self.failures.get(frame_id):
+            self.failures[frame_id] -= 1
+            raise VisionAPIError("Test", 503, "busy")
+        return {"content_type": "image/webp", "image_bytes": b"\x00\x00\x00", "frame_id": frame_id}
+
+    async def save_frame_analysis(self, frame_id, *, analysis_model, notes, **fields):
+        self.saved[frame_id] = {"analysis_model": analysis_model, "notes": notes, **fields}
+        self.pending.pop(frame_id, None)
+
+
+@pytest.mark.asyncio
+async def test_frame_analysis_worker_retries_transient_errors():
+    client = FrameQueueClient([1, 2, 3], failures={2: 1})
+    analyzer = MockFrameAnalyzer()
+    worker = FrameAnalysisWorker(client, analyzer, concurrency=2, max_retries=2, base_backoff_seconds=0)
+
+    counts = await worker.run_once()
+
+    assert counts["analyzed"] == 3
+    assert analyzer.calls == 3
+    assert client.saved[2]["plant_health_score"] == 90
+    assert (await worker.run_once())["pending"] == 0
+
+
+def test_parse_analysis_falls_back_to_raw_text():
+    parsed = parse_analysis('```json\n{"description": "Leaves yellowing", "plant_health_score": 140}\n```', "m")
+    assert parsed.notes == "Leaves yellowing"
+    assert parsed.plant_health_score == 100
+
+    raw = parse_analysis("Plants look fine.", "m")
+    assert raw.notes == "Plants look fine." and raw.plant_health_score is None
+
+
+def test_prepare_image_strips_base64_whitespace():
+    encoded, mime_type = prepare_image("AAEC\nAwQF\r\n", "image/webp")
+    assert encoded == "AAECAwQF"
+    assert mime_type == "image/webp"
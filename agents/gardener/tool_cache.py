@@ -0,0 +1,159 @@
+"""TTL cache for read-only tool results shared across agent runs."""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+CacheKey = Tuple[str, str]
+
+
+class _LoaderCancelled(Exception):
+    """Set on an in-flight future when the caller running its loader was cancelled."""
+
+
+@dataclass
+class ToolCacheStats:
+    """Hit/miss counters for a single tool."""
+
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    errors: int = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+        }
+
+
+@dataclass
+class _CacheEntry:
+    value: Dict[str, Any]
+    expires_at: float
+
+
+class ToolResultCache:
+    """Memoizes tool handler results keyed by tool name and canonical arguments.
+
+    Concurrent calls with the same key share a single in-flight request, so two
+    agent runs asking for the same 24h history only hit the backend once.
+    Cached results are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, *, max_entries: int = 256, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: Dict[CacheKey, _CacheEntry] = {}
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+        self._stats: Dict[str, ToolCacheStats] = {}
+        self._generation = 0
+
+    @staticmethod
+    def canonical_arguments(arguments: Dict[str, Any], defaults: Optional[Dict[str, Any]] = None) -> str:
+        """Serialise arguments so equivalent calls map to the same key.
+
+        Schema defaults are filled in and string lists (device/metric filters)
+        are sorted, so ``{}`` and ``{"hours": 24}`` share an entry.
+        """
+
+        merged: Dict[str, Any] = dict(defaults or {})
+        merged.update(arguments or {})
+        normalised: Dict[str, Any] = {}
+        for key, value in merged.items():
+            if isinstance(value, list) and all(isinstance(item, str) for item in value):
+                value = sorted(set(value))
+            normalised[key] = value
+        return json.dumps(normalised, sort_keys=True, separators=(",", ":"), default=str)
+
+    async def get_or_call(
+        self,
+        tool_name: str,
+        arguments_key: str,
+        ttl_seconds: float,
+        loader: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """Return a fresh cached result or run ``loader`` (once per key)."""
+
+        stats = self._stats.setdefault(tool_name, ToolCacheStats())
+        key: CacheKey = (tool_name, arguments_key)
+
+        while True:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > self._clock():
+                stats.hits += 1
+                return entry.value
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            stats.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except _LoaderCancelled:
+                # Only the caller running the load was cancelled: the first
+                # waiter to get here runs it again, the rest join that run
+                continue
+
+        stats.misses += 1
+        generation = self._generation
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.set_exception(_LoaderCancelled())
+            future.exception()
+            raise
+        except Exception as exc:
+            stats.errors += 1
+            future.set_exception(exc)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            # Results fetched across an invalidation may already be stale
+            if generation == self._generation:
+                self._store(key, value, ttl_seconds)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _store(self, key: CacheKey, value: Dict[str, Any], ttl_seconds: float) -> None:
+        now = self._clock()
+        if len(self._entries) >= self.max_entries:
+            for stale_key in [k for k, e in self._entries.items() if e.expires_at <= now]:
+                del self._entries[stale_key]
+        if len(self._entries) >= self.max_entries:
+            oldest = min(self._entries, key=lambda k: self._entries[k].expires_at)
+            del self._entries[oldest]
+        self._entries[key] = _CacheEntry(value=value, expires_at=now + ttl_seconds)
+
+    def invalidate(self, tool_name: Optional[str] = None) -> None:
+        """Drop cached entries for one tool, or everything when no name is given."""
+
+        self._generation += 1
+        if tool_name is None:
+            self._entries.clear()
+            return
+        for key in [k for k in self._entries if k[0] == tool_name]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        totals = ToolCacheStats()
+        for tool_stats in self._stats.values():
+            totals.hits += tool_stats.hits
+            totals.misses += tool_stats.misses
+            totals.coalesced += tool_stats.coalesced
+            totals.errors += tool_stats.errors
+        return {
+            "entries": len(self._entries),
+            "totals": totals.to_dict(),
+            "tools": {name: tool_stats.to_dict() for name, tool_stats in self._stats.items()},
+        }
@@ -2,12 +2,15 @@
 from __future__ import annotations
 
 import asyncio
+import time
 from dataclasses import dataclass
-from pathlib import Path
-from typing import Any, Awaitable, Callable, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 
+from .config import settings
 from .hydro_client import DeviceInfo, HydroAPIClient
 from .rule_manager import RuleManager
+from .tool_cache import ToolResultCache
 
 ToolHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
 
@@ -18,6 +21,8 @@ class ToolSpec:
     description: str
     input_schema: Dict[str, Any]
     handler: ToolHandler
+    # Seconds a result may be reused for identical arguments; None = never cache
+    cache_ttl_seconds: Optional[float] = None
 
 
 class ToolRegistry:
@@ -28,20 +33,104 @@ class ToolRegistry:
         self._tools: Dict[str, ToolSpec] = {}
         self._device_cache: List[DeviceInfo] = []
         self._lock = asyncio.Lock()
+        # Shared across agent runs; survives catalog rebuilds in refresh()
+        self._result_cache = ToolResultCache()
+        self._roster_signature: Optional[tuple] = None
+        self._refreshed_at: Optional[float] = None
+        self._roster_stale = True
 
-        # Use shared rule manager with AI protection layer
-        rules_path = Path(__file__).parent / 'data' / 'automation_rules.json'
-        self._rule_manager = RuleManager(rules_path)
+        # Rules live in the backend; this layer adds AI protection
+        self._rule_manager = RuleManager(client)
 
     @property
     def devices(self) -> List[DeviceInfo]:  # pragma: no cover - trivial
         return self._device_cache
 
+    @property
+    def client(self) -> HydroAPIClient:  # pragma: no cover - trivial
+        return self._client
+
+    async def resolve_image(self, item: Dict[str, Any]) -> Tuple[Union[bytes, str], str]:
+        """Return (image, mime type) for an image content item.
+
+        Inline items carry base64 ``data``; reference items only carry a
+        ``frame_id`` and the bytes are downloaded here, on first use.
+        """
+
+        mime_type = item.get("mimeType", "image/webp")
+        if item.get("data"):
+            return item["data"], mime_type
+        frame_id = item.get("frame_id")
+        if frame_id is None:
+            raise ValueError("Image content has neither data nor frame_id")
+        frame = await self._client.get_frame_image(frame_id)
+        return frame["image_bytes"], frame.get("content_type", mime_type)
+
+    def is_stale(self) -> bool:
+        """True when the roster was never loaded, invalidated, or exceeded its TTL."""
+
+        if self._roster_stale or self._refreshed_at is None:
+            return True
+        return (time.monotonic() - self._refreshed_at) >= settings.tool_refresh_interval_seconds
+
+    def mark_stale(self) -> None:
+        """Force the next ensure_fresh() call to re-fetch the device roster."""
+
+        self._roster_stale = True
+
+    async def ensure_fresh(self) -> None:
+        """Refresh the roster only if it is stale; otherwise reuse the cached catalog."""
+
+        if self.is_stale():
+            await self.refresh()
+
+    async def handle_backend_event(self, event: Dict[str, Any]) -> None:
+        """Invalidate the roster when a backend WebSocket event changes device membership.
+
+        ``device`` events are published on every reading, so only activations of
+        unknown devices and deactivations of listed ones count as changes.
+        """
+
+        event_type = event.get("type")
+        known = {device.device_key for device in self._device_cache}
+
+        if event_type == "device":
+            device_key = event.get("device_id")
+            if not device_key:
+                return
+            is_active = bool(event.get("is_active", True))
+            if is_active != (device_key in known):
+                self.mark_stale()
+        elif event_type == "snapshot":
+            # Sent on every (re)connect; we may have missed events in between
+            active = {
+                key for key, info in (event.get("devices") or {}).items()
+                if not isinstance(info, dict) or info.get("is_active", True)
+            }
+            if active != known:
+                self.mark_stale()
+
     async def refresh(self) -> None:
-        """Refresh the device cache and rebuild tool catalog."""
+        """Refresh the device cache and rebuild tool catalog if the roster changed."""
 
         async with self._lock:
-            self._device_cache = await self._client.list_devices(active_only=True)
+            # Cleared before fetching so a mark_stale() during the fetch still counts
+            self._roster_stale = False
+            try:
+                self._device_cache = await self._client.list_devices(active_only=True)
+            except Exception:
+                self._roster_stale = True
+                raise
+            self._refreshed_at = time.monotonic()
+
+            signature = tuple(
+                (device.device_key, device.name, device.device_type)
+                for device in self._device_cache
+            )
+            if self._tools and signature == self._roster_signature:
+                return
+            self._roster_signature = signature
+
             cameras = [d for d in self._device_cache if d.device_type == "camera"]
             sensors = [d for d in self._device_cache if d.device_type != "camera"]
 
@@ -75,6 +164,7 @@ class ToolRegistry:
                         "additionalProperties": False,
                     },
                     handler=self._handle_sensor_snapshot,
+                    cache_ttl_seconds=settings.snapshot_cache_ttl_seconds,
                 ),
                 "control_actuators": ToolSpec(
                     name="control_actuators",
@@ -137,6 +227,33 @@ class ToolRegistry:
                     },
                     handler=self._handle_get_camera_image,
                 ),
+                "compare_camera_frames": ToolSpec(
+                    name="compare_camera_frames",
+                    description=(
+                        "Find a camera's stored frames nearest several points in time in one call "
+                        "(e.g. days_ago [0, 7] to compare today with last week). Returns frame ids, "
+                        "timestamps and any stored vision notes/health scores, without image data."
+                    ),
+                    input_schema={
+                        "type": "object",
+                        "properties": {
+                            "device_key": {
+                                "type": "string",
+                                "description": "Camera device_key"
+                            },
+                            "days_ago": {
+                                "type": "array",
+                                "items": {"type": "number", "minimum": 0, "maximum": 30},
+                                "minItems": 1,
+                                "maxItems": 30,
+                                "description": "Points in time as days before now (fractions allowed)"
+                            }
+                        },
+                        "required": ["device_key", "days_ago"],
+                        "additionalProperties": False,
+                    },
+                    handler=self._handle_compare_camera_frames,
+                ),
                 "get_historical_readings": ToolSpec(
                     name="get_historical_readings",
                     description=(
@@ -188,6 +305,7 @@ class ToolRegistry:
                         "additionalProperties": False,
                     },
                     handler=self._handle_historical_readings,
+                    cache_ttl_seconds=settings.history_cache_ttl_seconds,
                 ),
                 "list_devices": ToolSpec(
                     name="list_devices",
@@ -205,6 +323,9 @@ class ToolRegistry:
                     name="create_automation_rule",
                     description=(
                         "Create a new automation rule. Rule can have time-based and/or sensor-based conditions. "
+                        "Condition types: time_range, days_of_week, cron, sensor_threshold, rolling_window "
+                        "(avg/min/max over window_minutes), rate_of_change (per second/minute/hour over "
+                        "window_minutes) and expression (arithmetic over named metric variables). "
                         "Supports 'all_of' (AND) and 'any_of' (OR) condition logic. "
                         "Actions can control actuators that are in AUTO mode."
                     ),
@@ -281,6 +402,36 @@ class ToolRegistry:
                     handler=self._handle_toggle_automation_rule,
                 ),
             }
+            for spec in self._tools.values():
+                self._apply_result_cache(spec)
+
+    def _apply_result_cache(self, spec: ToolSpec) -> None:
+        """Route a read-only tool's handler through the shared result cache."""
+
+        ttl = spec.cache_ttl_seconds
+        if not ttl:
+            return
+
+        raw_handler = spec.handler
+        defaults = {
+            name: prop["default"]
+            for name, prop in spec.input_schema.get("properties", {}).items()
+            if isinstance(prop, dict) and "default" in prop
+        }
+
+        async def cached_handler(args: Dict[str, Any]) -> Dict[str, Any]:
+            key = ToolResultCache.canonical_arguments(args, defaults)
+            return await self._result_cache.get_or_call(spec.name, key, ttl, lambda: raw_handler(args))
+
+        spec.handler = cached_handler
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for memoized tool results."""
+
+        return self._result_cache.stats()
+
+    def invalidate_cache(self, tool_name: Optional[str] = None) -> None:
+        self._result_cache.invalidate(tool_name)
 
     async def _handle_sensor_snapshot(self, args: Dict[str, Any]) -> Dict[str, Any]:
         device_keys = args.get("device_keys")
@@ -296,6 +447,8 @@ class ToolRegistry:
         """Handle control_actuators tool call with AI source."""
         commands = args.get("commands", [])
         result = await self._client.control_actuators(commands, source="ai")
+        # Actuator states are part of the snapshot; don't serve the pre-command view
+        self._result_cache.invalidate("get_sensor_snapshot")
         return result
 
     async def _handle_set_actuator_mode(self, args: Dict[str, Any]) -> Dict[str, Any]:
@@ -308,6 +461,24 @@ class ToolRegistry:
     async def _handle_get_camera_image(self, args: Dict[str, Any]) -> Dict[str, Any]:
         device_key = args["device_key"]
         days_ago = args.get("days_ago", 0)
+
+        if settings.camera_image_mode == "reference":
+            frame = await self._client.get_camera_frame(device_key, days_ago=days_ago)
+            # Bytes are fetched later by whoever renders or analyzes the image
+            return {
+                "content": [
+                    {
+                        "type": "image",
+                        "mimeType": frame.get("content_type", "image/webp"),
+                        "frame_id": frame["frame_id"],
+                        "content_hash": frame.get("content_hash"),
+                        "frame_timestamp": frame.get("frame_timestamp"),
+                        "uri": frame.get("image_url"),
+                    }
+                ],
+                "isError": False,
+            }
+
         result = await self._client.get_camera_image(device_key, days_ago=days_ago)
 
         # Return MCP-formatted content for image display
@@ -317,13 +488,36 @@ class ToolRegistry:
                     {
                         "type": "image",
                         "data": result["image_base64"],
-                        "mimeType": result.get("content_type", "image/webp")
+                        "mimeType": result.get("content_type", "image/webp"),
+                        # Lets the agent reuse stored vision descriptions
+                        "frame_id": result.get("frame_id"),
+                        "content_hash": result.get("content_hash"),
                     }
                 ],
                 "isError": False
             }
         return result
 
+    async def _handle_compare_camera_frames(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        device_key = args["device_key"]
+        now = datetime.now(timezone.utc)
+        times = [now - timedelta(days=float(days)) for days in args["days_ago"]]
+        matches = await self._client.get_nearest_frames(device_key, times, direction="closest")
+
+        frames = []
+        for days, match in zip(args["days_ago"], matches):
+            frame = match.get("frame") or {}
+            frames.append({
+                "days_ago": days,
+                "frame_id": frame.get("id"),
+                "timestamp": frame.get("timestamp"),
+                "offset_hours": round(match["offset_seconds"] / 3600, 2) if match.get("offset_seconds") is not None else None,
+                "notes": frame.get("notes"),
+                "plant_health_score": frame.get("plant_health_score"),
+                "anomaly_detected": frame.get("anomaly_detected"),
+            })
+        return {"device_key": device_key, "frames": frames}
+
     async def _handle_historical_readings(self, args: Dict[str, Any]) -> Dict[str, Any]:
         device_keys = args.get("device_keys")
         metric_keys = args.get("metric_keys")
@@ -358,12 +552,12 @@ class ToolRegistry:
 
     async def _handle_list_automation_rules(self, _: Dict[str, Any]) -> Dict[str, Any]:
         """List all automation rules."""
-        return self._rule_manager.list_rules()
+        return await self._rule_manager.list_rules()
 
     async def _handle_create_automation_rule(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new automation rule (AI cannot create protected rules)."""
         # AI-created rules are never protected
-        return self._rule_manager.create_rule(
+        return await self._rule_manager.create_rule(
             name=args["name"],
             conditions=args["conditions"],
             actions=args["actions"],
@@ -379,7 +573,7 @@ class ToolRegistry:
         rule_id = args["rule_id"]
 
         # Check if rule is accessible (exists and not protected)
-        error = self._check_protected_rule(rule_id, action="modif")
+        error = await self._check_protected_rule(rule_id, action="modif")
         if error:
             return error
 
@@ -391,7 +585,7 @@ class ToolRegistry:
             }
 
         # Use rule manager to update (without protected field)
-        return self._rule_manager.update_rule(
+        return await self._rule_manager.update_rule(
             rule_id=rule_id,
             name=args.get("name"),
             description=args.get("description"),
@@ -408,11 +602,11 @@ class ToolRegistry:
         rule_id = args["rule_id"]
 
         # Check if rule is accessible (exists and not protected)
-        error = self._check_protected_rule(rule_id, action="delete")
+        error = await self._check_protected_rule(rule_id, action="delete")
         if error:
             return error
 
-        return self._rule_manager.delete_rule(rule_id, modified_by="llm_tool")
+        return await self._rule_manager.delete_rule(rule_id, modified_by="llm_tool")
 
     async def _handle_toggle_automation_rule(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Enable or disable an automation rule (AI protection enforced)."""
@@ -420,28 +614,25 @@ class ToolRegistry:
         enabled = args["enabled"]
 
         # Check if rule is accessible (exists and not protected)
-        error = self._check_protected_rule(rule_id, action="toggle")
+        error = await self._check_protected_rule(rule_id, action="toggle")
         if error:
             return error
 
-        return self._rule_manager.toggle_rule(rule_id, enabled, modified_by="llm_tool")
+        return await self._rule_manager.toggle_rule(rule_id, enabled, modified_by="llm_tool")
 
-    def _check_protected_rule(self, rule_id: str, action: str = "modify") -> Optional[Dict[str, Any]]:
+    async def _check_protected_rule(self, rule_id: str, action: str = "modify") -> Optional[Dict[str, Any]]:
         """Check if a rule exists and is protected (for AI operations).
         
         Returns an error dict if the rule is not accessible, None if OK to proceed.
         """
-        data = self._rule_manager.load_rules_file()
-        result = self._rule_manager.find_rule_by_id(data.get("rules", []), rule_id)
-        
-        if result is None:
+        rule = await self._rule_manager.get_rule(rule_id)
+
+        if rule is None:
             return {
                 "status": "error",
                 "message": f"Rule with ID '{rule_id}' not found"
             }
         
-        _, rule = result
-        
         if rule.get("protected", False):
             return {
                 "status": "error",
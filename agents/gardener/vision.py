@@ -0,0 +1,221 @@
+"""Vision model calls shared by the agent loop and the background frame analyzer."""
+from __future__ import annotations
+
+import asyncio
+import base64
+import binascii
+import io
+import logging
+from typing import Any, Dict, Optional, Tuple, Union
+
+import httpx
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VISION_PROMPT = (
+    "Describe this hydroponics/garden camera image concisely. "
+    "Focus on: plant health, growth stage, any visible issues (pests, wilting, discoloration), "
+    "water levels if visible, lighting conditions. Be specific and actionable."
+)
+
+
+class VisionUnavailableError(RuntimeError):
+    """Raised when no vision-capable API key is configured."""
+
+
+class VisionAPIError(RuntimeError):
+    """Non-200 response from a vision API."""
+
+    def __init__(self, provider: str, status_code: int, body: str) -> None:
+        super().__init__(f"{provider} vision API error {status_code}: {body[:200]}")
+        self.provider = provider
+        self.status_code = status_code
+        self.body = body
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code == 429 or self.status_code >= 500
+
+
+# Formats the vision APIs accept without conversion
+_PASSTHROUGH_MIME_TYPES = {"image/jpeg", "image/png", "image/webp"}
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def vision_available() -> bool:
+    return bool(settings.openai_api_key or settings.grok_api_key)
+
+
+def _http2_supported() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for vision calls (HTTP/2 when ``h2`` is installed)."""
+
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=60.0,
+            http2=_http2_supported(),
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=4, keepalive_expiry=120.0),
+        )
+    return _http_client
+
+
+async def aclose_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def _shrink_image(
+    raw: Union[bytes, memoryview],
+    mime_type: str,
+    max_edge: int,
+    quality: int,
+) -> Tuple[Union[bytes, memoryview], str]:
+    try:
+        from PIL import Image
+    except ImportError:
+        return raw, mime_type
+
+    try:
+        with Image.open(io.BytesIO(raw)) as image:
+            if max(image.size) <= max_edge and mime_type in _PASSTHROUGH_MIME_TYPES:
+                return raw, mime_type
+            image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            image.convert("RGB").save(buffer, format="JPEG", quality=quality, optimize=True)
+    except Exception as exc:
+        logger.debug("Could not downscale image, sending original: %s", exc)
+        return raw, mime_type
+
+    shrunk = buffer.getvalue()
+    if len(shrunk) >= len(raw) and mime_type in _PASSTHROUGH_MIME_TYPES:
+        return raw, mime_type
+    return shrunk, "image/jpeg"
+
+
+def prepare_image(
+    image: Union[bytes, memoryview, str],
+    mime_type: str,
+    *,
+    max_edge: Optional[int] = None,
+    quality: Optional[int] = None,
+) -> Tuple[str, str]:
+    """Downscale/recompress an image and return (base64, mime_type).
+
+    Accepts raw bytes, a memoryview, or base64 text; base64 decoding already skips embedded
+    whitespace, so no separate cleaning pass is needed. Without Pillow the
+    image is passed through unchanged. CPU-bound: call via ``asyncio.to_thread``.
+    """
+
+    if isinstance(image, str):
+        try:
+            raw = base64.b64decode(image)
+        except (binascii.Error, ValueError):
+            raw = base64.b64decode("".join(image.split()))
+    else:
+        # bytes/memoryview are used as-is; no intermediate copy
+        raw = image
+
+    raw, mime_type = _shrink_image(
+        raw,
+        mime_type,
+        max_edge or settings.vision_max_image_edge,
+        quality or settings.vision_jpeg_quality,
+    )
+    return base64.b64encode(raw).decode("ascii"), mime_type
+
+
+def _image_message(prompt: str, data_url: str, detail: str) -> Dict[str, Any]:
+    return {
+        "role": "user",
+        "content": [
+            {"type": "text", "text": prompt},
+            {"type": "image_url", "image_url": {"url": data_url, "detail": detail}},
+        ],
+    }
+
+
+async def describe_image(
+    image: Union[bytes, memoryview, str],
+    mime_type: str,
+    *,
+    prompt: str = DEFAULT_VISION_PROMPT,
+) -> Tuple[str, str]:
+    """Describe an image with the first configured vision provider.
+
+    ``image`` is raw bytes or base64 text. Returns (description, model).
+    Raises VisionUnavailableError when no key is configured and
+    VisionAPIError / httpx errors when the call fails.
+    """
+
+    if not vision_available():
+        raise VisionUnavailableError(
+            "No vision API key is configured. Set GARDENER_OPENAI_API_KEY or GARDENER_GROK_API_KEY "
+            "to enable image analysis."
+        )
+
+    base64_data, mime_type = await asyncio.to_thread(prepare_image, image, mime_type)
+    data_url = f"data:{mime_type};base64,{base64_data}"
+    client = get_http_client()
+
+    # Try OpenAI first if key is available
+    if settings.openai_api_key:
+        logger.info("Using OpenAI vision API to describe camera image")
+        logger.debug("Image data URL length: %s", len(data_url))
+
+        response = await client.post(
+            "https://api.openai.com/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {settings.openai_api_key}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "model": "gpt-4o",  # Use full gpt-4o for reliable vision
+                "messages": [_image_message(prompt, data_url, "auto")],
+                "max_tokens": 500,
+            },
+        )
+
+        if response.status_code != 200:
+            logger.error(f"OpenAI vision API error {response.status_code}: {response.text}")
+            raise VisionAPIError("OpenAI", response.status_code, response.text)
+
+        description = response.json()["choices"][0]["message"]["content"]
+        logger.info(f"OpenAI vision description: {description[:100]}...")
+        return description, "gpt-4o"
+
+    # Grok vision if OpenAI not available
+    logger.info("Using Grok vision API to describe camera image")
+    response = await client.post(
+        "https://api.x.ai/v1/chat/completions",
+        headers={
+            "Authorization": f"Bearer {settings.grok_api_key}",
+            "Content-Type": "application/json",
+        },
+        json={
+            "model": "grok-vision-beta",
+            "messages": [_image_message(prompt, data_url, "low")],
+            "max_tokens": 300,
+        },
+        timeout=30.0,
+    )
+
+    if response.status_code != 200:
+        logger.error(f"Grok vision API error {response.status_code}: {response.text}")
+        raise VisionAPIError("Grok", response.status_code, response.text)
+
+    description = response.json()["choices"][0]["message"]["content"]
+    logger.info(f"Grok vision description: {description[:100]}...")
+    return description, "grok-vision-beta"
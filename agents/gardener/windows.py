@@ -0,0 +1,143 @@
+"""Rolling windows over live readings for windowed rule conditions.
+
+``rolling_window``, ``rate_of_change`` and windowed ``expression`` variables
+read aggregates over the last N minutes of a metric. Each (metric, window
+length) pair gets one ``RollingWindow`` fed from the reading stream: a
+time-ordered buffer with a running sum and monotonic min/max deques, so adding
+a sample, expiring old ones and reading avg/min/max/rate are all O(1)
+amortized and no history is queried while rules are evaluated.
+
+Windows start empty when the engine starts and fill as readings arrive;
+``min_samples`` on a condition keeps it false until enough have.
+"""
+
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+ReadingKey = Tuple[str, str]
+WindowKey = Tuple[ReadingKey, float]
+
+AGGREGATES = ('avg', 'min', 'max')
+
+
+class RollingWindow:
+    """Samples of one metric from the last ``seconds`` seconds."""
+
+    __slots__ = ('seconds', '_samples', '_sum', '_min', '_max')
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self._samples: Deque[Tuple[float, float]] = deque()
+        self._sum = 0.0
+        # Monotonic deques: candidates for the min (increasing) and max (decreasing)
+        self._min: Deque[Tuple[float, float]] = deque()
+        self._max: Deque[Tuple[float, float]] = deque()
+
+    def add(self, at: float, value: float) -> None:
+        """Append a sample taken at POSIX time ``at``; out-of-order samples are dropped."""
+        if self._samples and at < self._samples[-1][0]:
+            return
+        sample = (at, value)
+        self._samples.append(sample)
+        self._sum += value
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append(sample)
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append(sample)
+        self._expire(at)
+
+    def _expire(self, now: float) -> None:
+        cutoff = now - self.seconds
+        while self._samples and self._samples[0][0] < cutoff:
+            self._sum -= self._samples.popleft()[1]
+        while self._min and self._min[0][0] < cutoff:
+            self._min.popleft()
+        while self._max and self._max[0][0] < cutoff:
+            self._max.popleft()
+        if not self._samples:
+            # Drop accumulated float error whenever the window drains
+            self._sum = 0.0
+
+    def count(self, now: float) -> int:
+        self._expire(now)
+        return len(self._samples)
+
+    def avg(self, now: float) -> Optional[float]:
+        self._expire(now)
+        return self._sum / len(self._samples) if self._samples else None
+
+    def min(self, now: float) -> Optional[float]:
+        self._expire(now)
+        return self._min[0][1] if self._min else None
+
+    def max(self, now: float) -> Optional[float]:
+        self._expire(now)
+        return self._max[0][1] if self._max else None
+
+    def rate(self, now: float) -> Optional[float]:
+        """Change per second between the oldest and newest sample in the window."""
+        self._expire(now)
+        if len(self._samples) < 2:
+            return None
+        (first_at, first), (last_at, last) = self._samples[0], self._samples[-1]
+        if last_at <= first_at:
+            return None
+        return (last - first) / (last_at - first_at)
+
+    def aggregate(self, name: str, now: float) -> Optional[float]:
+        return getattr(self, name)(now)
+
+
+class WindowStore:
+    """Rolling windows by (metric, length), shared by every rule that uses them."""
+
+    def __init__(self):
+        self._windows: Dict[WindowKey, RollingWindow] = {}
+        self._by_key: Dict[ReadingKey, List[RollingWindow]] = {}
+        self._tracked: Set[WindowKey] = set()
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def track(self, key: ReadingKey, seconds: float) -> RollingWindow:
+        """Window of ``seconds`` over ``key``, created on first use (called while compiling rules)."""
+        window_key = (key, float(seconds))
+        self._tracked.add(window_key)
+        window = self._windows.get(window_key)
+        if window is None:
+            window = self._windows[window_key] = RollingWindow(float(seconds))
+            self._by_key.setdefault(key, []).append(window)
+        return window
+
+    def prune(self) -> None:
+        """Drop windows no rule tracked since the last prune (call after compiling a rule set)."""
+        for window_key in [k for k in self._windows if k not in self._tracked]:
+            window = self._windows.pop(window_key)
+            remaining = [w for w in self._by_key[window_key[0]] if w is not window]
+            if remaining:
+                self._by_key[window_key[0]] = remaining
+            else:
+                del self._by_key[window_key[0]]
+        self._tracked = set()
+
+    def add(self, key: ReadingKey, value: Any, at: float) -> bool:
+        """Record a sample in every window over ``key``.
+
+        Returns:
+            True if ``key`` has windows, i.e. even an unchanged value may move an aggregate
+        """
+        windows = self._by_key.get(key)
+        if not windows:
+            return False
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return True
+        for window in windows:
+            window.add(at, number)
+        return True
@@ -42,7 +42,14 @@ interface AutomationRule {
 }
 
 interface Condition {
-  type: "cron" | "time_range" | "days_of_week" | "sensor_threshold"
+  type:
+    | "cron"
+    | "time_range"
+    | "days_of_week"
+    | "sensor_threshold"
+    | "rolling_window"
+    | "rate_of_change"
+    | "expression"
   expression?: string
   description?: string
   start_time?: string
@@ -53,6 +60,12 @@ interface Condition {
   metric_key?: string
   operator?: "greater_than" | "less_than" | "equal_to" | "not_equal_to"
   value?: number
+  hysteresis?: number
+  aggregate?: "avg" | "min" | "max"
+  window_minutes?: number
+  min_samples?: number
+  per?: "second" | "minute" | "hour"
+  variables?: Record<string, { device_key: string; metric_key: string; aggregate?: "avg" | "min" | "max"; window_minutes?: number }>
 }
 
 interface Action {
@@ -63,6 +76,8 @@ interface Action {
   prompt?: string
   temperature?: number
   max_iterations?: number
+  min_on_seconds?: number
+  min_off_seconds?: number
 }
 
 interface AutomationRulesResponse {
@@ -159,6 +174,37 @@ function ConditionDisplay({ condition }: { condition: Condition }) {
           )}
         </div>
       )
+    case "rolling_window":
+    case "rate_of_change": {
+      const windowOp = OPERATORS.find(o => o.value === condition.operator)?.label || condition.operator
+      const subject = condition.type === "rolling_window"
+        ? `${condition.aggregate ?? "avg"}(${condition.metric_key})`
+        : `Δ${condition.metric_key}/${condition.per ?? "minute"}`
+      return (
+        <div className="flex items-center gap-2 text-sm">
+          <Thermometer className="h-4 w-4 text-orange-400" />
+          <span className="text-orange-200">{condition.window_minutes} min:</span>
+          <span className="text-orange-100">
+            {subject} {windowOp} {condition.value}
+          </span>
+          {condition.device_key && (
+            <span className="text-muted-foreground">on {condition.device_key}</span>
+          )}
+        </div>
+      )
+    }
+    case "expression": {
+      const exprOp = OPERATORS.find(o => o.value === condition.operator)?.label || condition.operator
+      return (
+        <div className="flex items-center gap-2 text-sm">
+          <Thermometer className="h-4 w-4 text-orange-400" />
+          <span className="text-orange-200">Expression:</span>
+          <span className="text-orange-100 font-mono">
+            {condition.expression} {exprOp} {condition.value}
+          </span>
+        </div>
+      )
+    }
     default:
       return <span className="text-muted-foreground text-sm">Unknown condition</span>
   }
@@ -1,15 +1,15 @@
 import asyncio
-import os
+import ipaddress
 from contextlib import suppress
 from datetime import datetime, timedelta
-from collections import defaultdict
+from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi import WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from sqlalchemy import func, select, tuple_
+from fastapi.responses import FileResponse, Response
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .config import settings
@@ -17,9 +17,9 @@ from .database import AsyncSessionLocal, get_db, init_db
 from .events import event_broker
 from .metrics import build_metric_meta
 from .models import (
-    ActuatorBatchControl, ActuatorCommand, ActuatorControl,
+    ActuatorBatchControl, AutomationBacktestRequest, AutomationRuleCreate, AutomationRuleToggle, AutomationRuleUpdate, RuleExecutionCreate,
     Device, DeviceResponse, Metric, Reading,
-    CameraFrame, CameraFrameResponse,
+    CameraFrame, CameraFrameAnalysis, CameraFrameResponse, NearestFrameResponse,
     ConversationMessageCreate, ConversationMessageResponse,
     LatestMetricSnapshot, LatestReadingsResponse,
     HistoricalReading, HistoricalReadingsResponse,
@@ -32,6 +32,10 @@ from .services.history import (
     _parse_history_filters,
     _summarize_metric_series,
 )
+from .services.actuators import control_actuators, get_actuator_modes as get_modes
+from .services import automation_rules
+from .services.backtest import run_backtest
+from .services.automation import embedded_automation
 from .services.persistence import delete_old_readings, mark_devices_inactive
 from .services.agent_history import (
     get_conversation_messages,
@@ -39,9 +43,15 @@ from .services.agent_history import (
     save_conversation_messages,
     to_conversation_response,
 )
-from .services.camera_sync import sync_cameras_to_db
-from .services.frame_capture import capture_all_cameras, cleanup_old_frames, capture_frame_for_camera
-from .utils.time import epoch_millis, utc_now
+from .services.camera_registry import camera_registry, sync_cameras_to_db
+from .services.frame_analysis import get_frame_analysis, list_unanalyzed_frames, save_frame_analysis
+from .services.capture_scheduler import capture_scheduler
+from .services.frame_capture import resolve_frame_file
+from .services.frame_retention import cleanup_progress, start_frame_cleanup, stop_frame_cleanup
+from .services.frame_index import frame_index
+from .services.timelapse import NoFramesError, TimelapseError, build_timelapse, timelapse_media_type
+from .services.frame_grabber import grabber_manager
+from .utils.time import ensure_utc, epoch_millis, utc_now
 
 app = FastAPI(title="Hydroponic System API", version="1.0.0")
 
@@ -58,6 +68,8 @@ app.add_middleware(
 async def startup_event():
     """Initialize database and MQTT client on startup"""
     await init_db()
+    # Rules used to live in the gardener's JSON file; import it into an empty table once
+    await automation_rules.import_rules_file(Path(settings.automation_rules_path))
     await mqtt_client.connect()
     # Populate cache from database before starting message processor
     await mqtt_client.populate_cache_from_db()
@@ -65,6 +77,9 @@ async def startup_event():
     await mqtt_client.start_message_processor()
 
     app.state.maintenance_task = asyncio.create_task(maintenance_loop())
+    grabber_manager.start()
+    capture_scheduler.start()
+    embedded_automation.start()
 
 
 @app.on_event("shutdown")
@@ -77,28 +92,30 @@ async def shutdown_event():
             await task
         app.state.maintenance_task = None
 
+    await embedded_automation.stop()
+    await stop_frame_cleanup()
+    await capture_scheduler.stop()
+    await grabber_manager.stop()
+    await camera_registry.aclose()
     await mqtt_client.disconnect()
 
 
 async def maintenance_loop():
-    """Background task handling device heartbeat checks, data retention, camera sync, and frame capture."""
+    """Background task handling device heartbeat checks, data retention and camera sync.
+
+    Frame capture runs separately in the capture scheduler.
+    """
     last_cleanup = utc_now()
-    last_frame_capture = utc_now()
     cleanup_interval = timedelta(hours=24)
-    frame_capture_interval = timedelta(minutes=settings.frame_capture_interval_minutes)
 
     while True:
         try:
             now = utc_now()
 
-            # Sync cameras from MediaMTX to database
+            # Write camera changes to the database; MediaMTX is re-polled only when
+            # the registry is due (readiness hooks keep it current in between)
             await sync_cameras_to_db()
 
-            # Capture frames from all cameras if enabled and interval has passed
-            if settings.frame_capture_enabled and (now - last_frame_capture) >= frame_capture_interval:
-                await capture_all_cameras()
-                last_frame_capture = now
-
             # Mark inactive devices (both MQTT and cameras)
             cutoff_time = utc_now() - timedelta(seconds=settings.sensor_discovery_timeout)
             await mqtt_client.mark_inactive_devices()  # MQTT devices
@@ -109,9 +126,10 @@ async def maintenance_loop():
                 if settings.data_retention_days > 0:
                     cutoff = now - timedelta(days=settings.data_retention_days)
                     await delete_old_readings(cutoff)
+                    await automation_rules.delete_old_executions(cutoff)
 
-                # Cleanup old frames
-                await cleanup_old_frames()
+                # Cleanup old frames in the background so heartbeats keep running
+                start_frame_cleanup()
                 last_cleanup = now
 
             await asyncio.sleep(settings.sensor_heartbeat_interval)
@@ -505,123 +523,10 @@ async def control_actuators_batch(
     This means AUTO is the normal operating mode where the system runs itself,
     and MANUAL is the emergency override mode for human intervention.
     """
-    if not batch.commands:
-        return {"processed": 0, "skipped": 0, "missing": [], "blocked": []}
-
-    source = batch.source.lower()
-    if source not in {"user", "ai", "automation"}:
-        source = "user"
-
-    deduped: Dict[tuple[str, str], ActuatorCommand] = {}
-    for command in batch.commands:
-        device_id = command.device_id.strip()
-        # Normalize key: lowercase and remove spaces (e.g. "Relay 1" -> "relay1")
-        normalized_key = command.actuator_key.lower().replace(" ", "")
-        
-        if not device_id or not normalized_key:
-            raise HTTPException(status_code=400, detail="Each command requires device_id and actuator_key")
-        state = command.state.lower()
-        if state not in {"on", "off"}:
-            raise HTTPException(status_code=400, detail=f"Invalid state '{command.state}' for actuator '{command.actuator_key}'")
-        deduped[(device_id, normalized_key)] = ActuatorCommand(
-            device_id=device_id,
-            actuator_key=normalized_key,
-            state=state,
-        )
-
-    if not deduped:
-        return {"processed": 0, "skipped": 0, "missing": [], "blocked": []}
-
-    pairs = list(deduped.keys())
-
-    # Check which actuators exist and their control mode
-    result = await db.execute(
-        select(Device.device_key, Metric.metric_key, Metric.control_mode)
-        .join(Metric, Metric.device_id == Device.id)
-        .where(tuple_(Device.device_key, Metric.metric_key).in_(pairs))
-        .where(Metric.metric_type == 'actuator')
-    )
-
-    valid_pairs = {}
-    for device_key, metric_key, control_mode in result.all():
-        valid_pairs[(device_key, metric_key)] = control_mode or 'manual'
-
-    missing = []
-    blocked = []
-
-    # Check permissions based on mode and source
-    def is_allowed(mode: str, source: str, force: bool) -> tuple[bool, str]:
-        """Check if source is allowed to control actuator in given mode.
-        
-        AUTO mode = normal operation (AI + automation control)
-        MANUAL mode = emergency override (user control only)
-        """
-        if mode == 'auto':
-            # AUTO mode: AI and automation allowed, user blocked unless force
-            if source in ('ai', 'automation'):
-                return True, ""
-            elif source == 'user' and force:
-                return True, ""  # Emergency override
-            else:
-                return False, "Actuator is in AUTO mode (use force=true for emergency override)"
-        else:  # manual mode
-            # MANUAL mode: User allowed, AI and automation blocked
-            if source == 'user':
-                return True, ""
-            else:
-                return False, "Actuator is in MANUAL mode (user emergency override active)"
-
-    # Categorize commands
-    for device_id, actuator_key in pairs:
-        if (device_id, actuator_key) not in valid_pairs:
-            missing.append({"device_id": device_id, "actuator_key": actuator_key})
-        else:
-            mode = valid_pairs[(device_id, actuator_key)]
-            allowed, reason = is_allowed(mode, source, batch.force)
-            if not allowed:
-                blocked.append({
-                    "device_id": device_id,
-                    "actuator_key": actuator_key,
-                    "reason": reason,
-                    "mode": mode,
-                    "source": source
-                })
-
-    # Process allowed commands
-    device_commands: Dict[str, List[ActuatorControl]] = defaultdict(list)
-    processed_details: List[Dict[str, Any]] = []
-
-    for device_id, actuator_key in pairs:
-        if (device_id, actuator_key) not in valid_pairs:
-            continue
-        
-        mode = valid_pairs[(device_id, actuator_key)]
-        allowed, _ = is_allowed(mode, source, batch.force)
-        if not allowed:
-            continue
-
-        command = deduped[(device_id, actuator_key)]
-        control = ActuatorControl(actuator_key=command.actuator_key, state=command.state)
-        device_commands[device_id].append(control)
-        processed_details.append({
-            "device_id": device_id,
-            "actuator_key": actuator_key,
-            "state": command.state,
-            "mode": mode,
-        })
-
-    # Publish to MQTT
-    for device_id, controls in device_commands.items():
-        await mqtt_client.publish_actuator_batch(device_id, controls)
-
-    return {
-        "processed": len(processed_details),
-        "skipped": len(deduped) - len(processed_details),
-        "missing": missing,
-        "blocked": blocked,
-        "details": processed_details,
-        "source": source,
-    }
+    try:
+        return await control_actuators(db, batch.commands, source=batch.source, force=batch.force)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 
 @app.get("/api/actuators/modes")
@@ -630,26 +535,8 @@ async def get_actuator_modes(
     db: AsyncSession = Depends(get_db),
 ):
     """Get control modes for all actuators."""
-
-    query = (
-        select(Device.device_key, Metric.metric_key, Metric.control_mode)
-        .join(Metric, Metric.device_id == Device.id)
-        .where(Metric.metric_type == 'actuator')
-    )
-
-    if device_keys:
-        keys = [key.strip() for key in device_keys.split(",")]
-        query = query.where(Device.device_key.in_(keys))
-
-    result = await db.execute(query)
-
-    modes = {}
-    for device_key, metric_key, control_mode in result.all():
-        if device_key not in modes:
-            modes[device_key] = {}
-        modes[device_key][metric_key] = control_mode or 'manual'
-
-    return {"modes": modes}
+    keys = [key.strip() for key in device_keys.split(",")] if device_keys else None
+    return {"modes": await get_modes(db, keys)}
 
 
 @app.post("/api/actuators/mode/global")
@@ -808,45 +695,247 @@ async def conversation_highlights(limit: int = Query(5, ge=1, le=20)):
 
 # ---------------- Camera Frame Endpoints ---------------- #
 
+def _frame_headers(frame: CameraFrame) -> Dict[str, str]:
+    """Identify the served frame so clients can key cached analysis on it."""
+    headers = {
+        "X-Frame-Id": str(frame.id),
+        "X-Frame-Timestamp": frame.timestamp.isoformat(),
+    }
+    if frame.content_hash:
+        headers["X-Frame-Hash"] = frame.content_hash
+    return headers
+
+
+async def _frame_file_response(
+    frame: CameraFrame,
+    size: str,
+    request: Request,
+    *,
+    immutable: bool,
+    filename: Optional[str] = None,
+) -> Response:
+    """Serve the requested size of a frame with ETag revalidation.
+
+    Frames never change once written, so responses addressed by frame id are
+    cacheable forever; "latest" URLs are revalidated via the ETag instead.
+    Missing derivatives fall back to the next larger size.
+    """
+    resolved = await resolve_frame_file(frame.file_path, size)
+    if resolved is None:
+        raise HTTPException(status_code=404, detail="Frame file not found on disk")
+    path, candidate = resolved
+
+    headers = _frame_headers(frame)
+    headers["ETag"] = f'"{frame.content_hash or frame.id}-{candidate}"'
+    headers["Cache-Control"] = "public, max-age=31536000, immutable" if immutable else "no-cache"
+    headers["X-Frame-Size"] = candidate
+
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type="image/webp", filename=filename, headers=headers)
+
+
+async def _find_camera_frame(db: AsyncSession, device_key: str, days_ago: int) -> CameraFrame:
+    """Latest frame at or before ``days_ago`` days back; 404 when the camera has none."""
+    # Calculate target timestamp
+    target_time = utc_now() - timedelta(days=days_ago)
+
+    # Bisect the in-memory index, then load the row by primary key
+    frame = None
+    for _ in range(2):
+        frame_id = (await frame_index.nearest_ids(device_key, [target_time], "before"))[0]
+        frame = await db.get(CameraFrame, frame_id) if frame_id is not None else None
+        if frame_id is None or frame is not None:
+            break
+        # Row deleted behind the index's back: reload it and look again
+        frame_index.invalidate(device_key)
+
+    if not frame:
+        raise HTTPException(status_code=404, detail=f"No frame found for camera {device_key}")
+    return frame
+
+
 # Simplified Camera Image Endpoints
 @app.get("/api/cameras/{device_key}/image")
 async def get_camera_image(
     device_key: str,
+    request: Request,
     days_ago: int = Query(0, ge=0, le=30, description="Get image from N days ago (0 = latest)"),
+    size: str = Query("full", pattern="^(thumb|medium|full)$", description="thumb, medium or full resolution"),
     db: AsyncSession = Depends(get_db),
 ):
     """Get camera image - latest by default, or historical by days_ago parameter."""
-    # Calculate target timestamp
-    target_time = utc_now() - timedelta(days=days_ago)
-
-    # Find frame closest to target time
-    query = (
-        select(CameraFrame)
-        .where(CameraFrame.device_key == device_key)
-        .where(CameraFrame.timestamp <= target_time)
-        .order_by(CameraFrame.timestamp.desc())
-        .limit(1)
+    frame = await _find_camera_frame(db, device_key, days_ago)
+    return await _frame_file_response(
+        frame,
+        size,
+        request,
+        immutable=False,
+        filename=f"{device_key}_{frame.timestamp.strftime('%Y%m%d_%H%M%S')}.webp",
     )
 
-    result = await db.execute(query)
-    frame = result.scalar_one_or_none()
 
-    if not frame:
-        raise HTTPException(status_code=404, detail=f"No frame found for camera {device_key}")
+@app.get("/api/cameras/{device_key}/frame", response_model=CameraFrameResponse)
+async def get_camera_frame_reference(
+    device_key: str,
+    days_ago: int = Query(0, ge=0, le=30, description="Get frame from N days ago (0 = latest)"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Frame metadata only; fetch bytes from /api/cameras/frames/{id}/image when needed."""
+    return await _find_camera_frame(db, device_key, days_ago)
 
-    # Build full file path
-    full_path = os.path.join("/app", frame.file_path)
 
-    if not os.path.exists(full_path):
-        raise HTTPException(status_code=404, detail="Frame file not found on disk")
+@app.get("/api/cameras/{device_key}/frames/nearest", response_model=List[NearestFrameResponse])
+async def get_nearest_camera_frames(
+    device_key: str,
+    at: List[datetime] = Query(..., description="One or more target times (repeat the parameter for a batch)"),
+    direction: str = Query("closest", pattern="^(before|after|closest)$"),
+):
+    """Frames nearest each requested time, e.g. now vs. one week ago in a single call."""
+    if len(at) > 100:
+        raise HTTPException(status_code=400, detail="At most 100 target times per request")
+
+    targets = [ensure_utc(t) for t in at]
+    frames = await frame_index.nearest_frames(device_key, targets, direction)
+    return [
+        NearestFrameResponse(
+            requested_at=target,
+            frame=frame,
+            offset_seconds=(ensure_utc(frame.timestamp) - target).total_seconds() if frame else None,
+        )
+        for target, frame in zip(targets, frames)
+    ]
+
+
+@app.get("/api/cameras/{device_key}/timelapse")
+async def get_camera_timelapse(
+    device_key: str,
+    start: Optional[datetime] = Query(None, description="Range start (default: end - 7 days)"),
+    end: Optional[datetime] = Query(None, description="Range end (default: now)"),
+    fps: int = Query(24, ge=1, le=60),
+    format: str = Query("mp4", pattern="^(mp4|webm)$"),
+    size: str = Query("medium", pattern="^(thumb|medium|full)$"),
+):
+    """Encode (or serve the cached) timelapse of a camera over a time range."""
+    now = utc_now()
+    # A range that ends in the past can no longer change, so its clip is cacheable forever
+    fixed_range = end is not None and ensure_utc(end) <= now
+    end = ensure_utc(end) if end else now
+    start = ensure_utc(start) if start else end - timedelta(days=7)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    try:
+        path = await build_timelapse(device_key, start, end, fps=fps, fmt=format, size=size)
+    except NoFramesError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except TimelapseError as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
     return FileResponse(
-        full_path,
-        media_type="image/webp",
-        filename=f"{device_key}_{frame.timestamp.strftime('%Y%m%d_%H%M%S')}.webp"
+        path,
+        media_type=timelapse_media_type(format),
+        filename=f"{device_key}_{start:%Y%m%d}-{end:%Y%m%d}.{format}",
+        headers={"Cache-Control": "public, max-age=31536000, immutable" if fixed_range else "no-cache"},
     )
 
 
+@app.get("/api/cameras/frames/pending", response_model=List[CameraFrameResponse])
+async def list_pending_camera_frames(
+    limit: int = Query(20, ge=1, le=200),
+    max_age_hours: Optional[int] = Query(None, ge=1, le=720, description="Ignore frames older than this"),
+):
+    """Frames with no stored vision analysis yet (consumed by the gardener's analysis worker)."""
+    since = utc_now() - timedelta(hours=max_age_hours) if max_age_hours else None
+    return await list_unanalyzed_frames(limit=limit, since=since)
+
+
+@app.get("/api/cameras/frames/{frame_id}/image")
+async def get_camera_frame_image(
+    frame_id: int,
+    request: Request,
+    size: str = Query("full", pattern="^(thumb|medium|full)$", description="thumb, medium or full resolution"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Serve a specific stored frame by id."""
+    frame = await db.get(CameraFrame, frame_id)
+    if not frame:
+        raise HTTPException(status_code=404, detail=f"Frame {frame_id} not found")
+    return await _frame_file_response(frame, size, request, immutable=True)
+
+
+@app.get("/api/cameras/frames/{frame_id}/analysis", response_model=CameraFrameResponse)
+async def get_camera_frame_analysis(
+    frame_id: int,
+    content_hash: Optional[str] = Query(None, description="Also match analyzed frames with identical content"),
+):
+    """Return stored vision analysis for a frame (or an identical frame)."""
+    frame = await get_frame_analysis(frame_id, content_hash=content_hash)
+    if not frame:
+        raise HTTPException(status_code=404, detail=f"No analysis stored for frame {frame_id}")
+    return frame
+
+
+@app.put("/api/cameras/frames/{frame_id}/analysis", response_model=CameraFrameResponse)
+async def put_camera_frame_analysis(frame_id: int, analysis: CameraFrameAnalysis):
+    """Persist a vision description so repeat questions about this frame skip the vision API."""
+    frame = await save_frame_analysis(frame_id, analysis)
+    if not frame:
+        raise HTTPException(status_code=404, detail=f"Frame {frame_id} not found")
+    return frame
+
+
+@app.get("/api/cameras/grabbers")
+async def list_frame_grabbers():
+    """Health of the persistent per-camera FFmpeg grabbers."""
+    return {"enabled": grabber_manager.enabled, "grabbers": grabber_manager.status()}
+
+
+@app.get("/api/cameras/capture-stats")
+async def get_capture_stats():
+    """Capture latency histograms and per-camera backoff state."""
+    return capture_scheduler.status()
+
+
+def _is_loopback(request: Request) -> bool:
+    try:
+        return request.client is not None and ipaddress.ip_address(request.client.host).is_loopback
+    except ValueError:
+        return False
+
+
+@app.post("/api/cameras/hooks/{event}")
+async def mediamtx_readiness_hook(
+    event: str,
+    request: Request,
+    path: str = Query(..., description="MediaMTX path name ($MTX_PATH)"),
+    token: Optional[str] = Query(None),
+):
+    """Receiver for MediaMTX runOnReady/runOnNotReady hooks (see mediamtx.yml).
+
+    Callers must pass ``MEDIAMTX_HOOK_TOKEN`` when it is set; without it only
+    MediaMTX on the same host (loopback) is accepted.
+    """
+    if event not in ("ready", "not-ready"):
+        raise HTTPException(status_code=404, detail=f"Unknown hook event {event}")
+    if settings.mediamtx_hook_token:
+        if token != settings.mediamtx_hook_token:
+            raise HTTPException(status_code=403, detail="Invalid hook token")
+    elif not _is_loopback(request):
+        raise HTTPException(status_code=403, detail="Set MEDIAMTX_HOOK_TOKEN to accept hooks from other hosts")
+
+    camera = await camera_registry.apply_hook(path, ready=event == "ready")
+    if camera is not None and grabber_manager.enabled:
+        await grabber_manager.sync(camera_registry.ready_paths())
+    return {"camera": path, "ready": event == "ready", "tracked": camera is not None}
+
+
+@app.get("/api/cameras/cleanup-status")
+async def get_frame_cleanup_status():
+    """Progress of the current (or last) frame retention cleanup."""
+    return cleanup_progress.to_dict()
+
+
 @app.post("/api/cameras/{device_key}/capture")
 async def capture_camera_frame(
     device_key: str,
@@ -868,8 +957,8 @@ async def capture_camera_frame(
             detail=f"Camera {device_key} not found or not active"
         )
 
-    # Capture frame
-    frame = await capture_frame_for_camera(device_key)
+    # Capture frame (shares the scheduler's worker limit and latency stats)
+    frame = await capture_scheduler.capture_now(device_key)
 
     if not frame:
         raise HTTPException(
@@ -881,118 +970,146 @@ async def capture_camera_frame(
 
 
 @app.get("/api/automation/rules")
-async def get_automation_rules():
-    """Get all automation rules (proxied from gardener agent)."""
-    import httpx
+async def get_automation_rules(
+    enabled: Optional[bool] = Query(default=None),
+    protected: Optional[bool] = Query(default=None),
+    q: Optional[str] = Query(default=None, description="Case-insensitive match on the rule name"),
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    offset: int = Query(default=0, ge=0),
+    db: AsyncSession = Depends(get_db),
+):
+    """List automation rules in priority order, with optional filters and paging."""
+    return await automation_rules.list_rules(
+        db, enabled=enabled, protected=protected, search=q, limit=limit, offset=offset
+    )
 
-    gardener_url = os.getenv("GARDENER_API_URL", "http://localhost:8600")
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{gardener_url}/automation/rules", timeout=10.0)
-            response.raise_for_status()
-            return response.json()
-    except httpx.HTTPError as e:
-        raise HTTPException(
-            status_code=503,
-            detail=f"Failed to connect to gardener service: {str(e)}"
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to fetch automation rules: {str(e)}"
-        )
+@app.get("/api/automation/rules/version")
+async def get_automation_rules_version(db: AsyncSession = Depends(get_db)):
+    """Current rule-set version; it changes whenever any rule is created, edited or deleted."""
+    return {"version": await automation_rules.current_version(db)}
 
 
-@app.post("/api/automation/rules")
-async def create_automation_rule(rule: Dict[str, Any]):
-    """Create a new automation rule (proxied to gardener agent)."""
-    import httpx
+@app.get("/api/automation/rules/{rule_id}")
+async def get_automation_rule(rule_id: str, db: AsyncSession = Depends(get_db)):
+    rule = await automation_rules.get_rule(db, rule_id)
+    if rule is None:
+        raise HTTPException(status_code=404, detail=f"Rule with ID '{rule_id}' not found")
+    return automation_rules.rule_to_dict(rule)
 
-    gardener_url = os.getenv("GARDENER_API_URL", "http://localhost:8600")
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{gardener_url}/automation/rules",
-                json=rule,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-    except httpx.HTTPError as e:
-        raise HTTPException(
-            status_code=e.response.status_code if hasattr(e, 'response') else 503,
-            detail=f"Gardener service error: {str(e)}"
-        )
+@app.get("/api/automation/rules/{rule_id}/versions")
+async def get_automation_rule_versions(
+    rule_id: str,
+    limit: int = Query(default=50, ge=1, le=1000),
+    offset: int = Query(default=0, ge=0),
+    db: AsyncSession = Depends(get_db),
+):
+    """Earlier versions of a rule, newest first; each create, edit and delete is one version."""
+    history = await automation_rules.list_rule_versions(db, rule_id, limit=limit, offset=offset)
+    if history["total_count"] == 0 and await automation_rules.get_rule(db, rule_id) is None:
+        raise HTTPException(status_code=404, detail=f"Rule with ID '{rule_id}' not found")
+    return history
 
 
-@app.patch("/api/automation/rules/{rule_id}")
-async def update_automation_rule(rule_id: str, rule: Dict[str, Any]):
-    """Update an automation rule (proxied to gardener agent)."""
-    import httpx
+@app.post("/api/automation/rules")
+async def create_automation_rule(rule: AutomationRuleCreate, db: AsyncSession = Depends(get_db)):
+    """Create a new automation rule."""
+    try:
+        created = await automation_rules.create_rule(db, rule)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"status": "success", "rule_id": created.id, "rule": automation_rules.rule_to_dict(created)}
 
-    gardener_url = os.getenv("GARDENER_API_URL", "http://localhost:8600")
 
+@app.patch("/api/automation/rules/{rule_id}")
+async def update_automation_rule(rule_id: str, rule: AutomationRuleUpdate, db: AsyncSession = Depends(get_db)):
+    """Update an automation rule."""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.patch(
-                f"{gardener_url}/automation/rules/{rule_id}",
-                json=rule,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-    except httpx.HTTPError as e:
-        raise HTTPException(
-            status_code=e.response.status_code if hasattr(e, 'response') else 503,
-            detail=f"Gardener service error: {str(e)}"
-        )
+        updated = await automation_rules.update_rule(db, rule_id, rule)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if updated is None:
+        raise HTTPException(status_code=404, detail=f"Rule with ID '{rule_id}' not found")
+    return {"status": "success", "rule_id": rule_id, "rule": automation_rules.rule_to_dict(updated)}
 
 
 @app.delete("/api/automation/rules/{rule_id}")
-async def delete_automation_rule(rule_id: str):
-    """Delete an automation rule (proxied to gardener agent)."""
-    import httpx
+async def delete_automation_rule(
+    rule_id: str,
+    modified_by: str = Query(default="api"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Delete an automation rule."""
+    if not await automation_rules.delete_rule(db, rule_id, modified_by):
+        raise HTTPException(status_code=404, detail=f"Rule with ID '{rule_id}' not found")
+    return {"status": "success", "rule_id": rule_id, "message": "Rule deleted successfully"}
 
-    gardener_url = os.getenv("GARDENER_API_URL", "http://localhost:8600")
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(
-                f"{gardener_url}/automation/rules/{rule_id}",
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-    except httpx.HTTPError as e:
+@app.post("/api/automation/rules/{rule_id}/toggle")
+async def toggle_automation_rule(rule_id: str, toggle: AutomationRuleToggle, db: AsyncSession = Depends(get_db)):
+    """Enable or disable an automation rule."""
+    updated = await automation_rules.update_rule(
+        db, rule_id, AutomationRuleUpdate(enabled=toggle.enabled, modified_by=toggle.modified_by)
+    )
+    if updated is None:
+        raise HTTPException(status_code=404, detail=f"Rule with ID '{rule_id}' not found")
+    return {
+        "status": "success",
+        "rule_id": rule_id,
+        "enabled": toggle.enabled,
+        "message": f"Rule {'enabled' if toggle.enabled else 'disabled'} successfully",
+    }
+
+
+@app.post("/api/automation/backtest")
+async def backtest_automation_rules(request: AutomationBacktestRequest, db: AsyncSession = Depends(get_db)):
+    """Replay stored readings through rules and report firings, actuator switches and duty cycles."""
+    end = ensure_utc(request.end) if request.end else utc_now()
+    start = ensure_utc(request.start)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if end - start > timedelta(days=settings.automation_backtest_max_days):
         raise HTTPException(
-            status_code=e.response.status_code if hasattr(e, 'response') else 503,
-            detail=f"Gardener service error: {str(e)}"
+            status_code=400,
+            detail=f"Backtest range is limited to {settings.automation_backtest_max_days} days",
         )
 
+    rules = list(request.rules)
+    for rule_id in request.rule_ids:
+        rule = await automation_rules.get_rule(db, rule_id)
+        if rule is None:
+            raise HTTPException(status_code=404, detail=f"Rule with ID '{rule_id}' not found")
+        rules.append(automation_rules.rule_to_dict(rule))
+    if not rules:
+        raise HTTPException(status_code=400, detail="Provide rule_ids or rules to backtest")
 
-@app.post("/api/automation/rules/{rule_id}/toggle")
-async def toggle_automation_rule(rule_id: str, toggle: Dict[str, bool]):
-    """Toggle an automation rule (proxied to gardener agent)."""
-    import httpx
+    try:
+        return await run_backtest(db, rules, start, end)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+
+
+@app.get("/api/automation/executions")
+async def get_rule_executions(
+    rule_id: Optional[str] = Query(default=None),
+    outcome: Optional[str] = Query(default=None),
+    since: Optional[datetime] = Query(default=None),
+    until: Optional[datetime] = Query(default=None),
+    limit: int = Query(default=50, ge=1, le=1000),
+    offset: int = Query(default=0, ge=0),
+    db: AsyncSession = Depends(get_db),
+):
+    """Rule execution log, newest first."""
+    return await automation_rules.list_executions(
+        db, rule_id=rule_id, outcome=outcome, since=since, until=until, limit=limit, offset=offset
+    )
 
-    gardener_url = os.getenv("GARDENER_API_URL", "http://localhost:8600")
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{gardener_url}/automation/rules/{rule_id}/toggle",
-                json=toggle,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-    except httpx.HTTPError as e:
-        raise HTTPException(
-            status_code=e.response.status_code if hasattr(e, 'response') else 503,
-            detail=f"Gardener service error: {str(e)}"
-        )
+@app.post("/api/automation/executions")
+async def record_rule_executions(executions: List[RuleExecutionCreate], db: AsyncSession = Depends(get_db)):
+    """Record rule firings reported by the automation engine."""
+    return {"recorded": await automation_rules.record_executions(db, executions)}
 
 
 if __name__ == "__main__":
@@ -30,6 +30,8 @@ class Settings(BaseSettings):
     mediamtx_host: str = "localhost"
     mediamtx_api_port: int = 9997
     mediamtx_webrtc_port: int = 8889
+    mediamtx_hook_token: Optional[str] = None  # If set, runOnReady/runOnNotReady hook calls must pass ?token=; unset accepts loopback callers only
+    camera_reconcile_interval_seconds: int = 300  # MediaMTX poll interval once readiness hooks are arriving
 
     # Frontend Configuration
     frontend_port: int = 3001
@@ -45,6 +47,13 @@ class Settings(BaseSettings):
     # Approximate total points per metric over last 24h
     history_snapshot_target_points: int = 600
 
+    # Automation
+    automation_rules_path: str = "agents/gardener/data/automation_rules.json"  # Legacy rules file, imported once into an empty rules table
+    automation_embedded: bool = False  # Run the gardener's rule engine in this process
+    automation_state_path: str = "agents/gardener/data/automation_state.json"  # Embedded engine's cron bookkeeping
+    automation_reconcile_interval_seconds: int = 300  # Full re-evaluation interval from the values cache
+    automation_backtest_max_days: int = 90  # Longest range /api/automation/backtest will replay
+
     # Logging
     log_level: str = "INFO"
 
@@ -55,6 +64,28 @@ class Settings(BaseSettings):
     frame_max_width: int = -1  # Max width (-1 = no scaling, preserve original resolution)
     frame_storage_path: str = "/app/data/camera_frames"
     frame_retention_days: int = 30  # How long to keep frames (0 = forever)
+    frame_cleanup_batch_size: int = 500  # Expired frame rows deleted per committed batch during cleanup
+    frame_dedupe_enabled: bool = True  # Link near-identical captures to the previous stored image
+    frame_dedupe_max_distance: int = 4  # Max differing bits (of 64) in the perceptual hash to count as identical
+    frame_thumbnail_width: int = 320  # Width of the "thumb" derivative written at capture time
+    frame_medium_width: int = 960  # Width of the "medium" derivative written at capture time
+    frame_derivative_quality: int = 80  # WebP quality for derivatives
+    timelapse_cache_path: str = "/app/data/timelapses"
+    timelapse_cache_max_mb: int = 2048  # Oldest cached clips are deleted beyond this
+    timelapse_max_frames: int = 3000  # Longer ranges are evenly sampled down to this many frames
+    timelapse_timeout_seconds: int = 600
+    frame_capture_max_workers: int = 2  # Captures allowed to run at the same time
+    frame_capture_stagger_fraction: float = 0.8  # Share of the interval cameras are spread across (0 = all at once)
+    frame_capture_timeout_seconds: int = 30  # Per-camera capture budget; above grabber startup wait + ffmpeg fallback (10s + 10s)
+    frame_capture_max_backoff_minutes: int = 60  # Cap on the retry delay for a failing camera
+
+    # Persistent per-camera FFmpeg grabbers (fallback: one ffmpeg per capture)
+    frame_grabber_enabled: bool = True
+    frame_grabber_fps: float = 0.2  # Frames encoded per second by each grabber (0.2 = one every 5s)
+    frame_grabber_max_frame_age_seconds: int = 30  # Older grabbed frames are not used for captures
+    frame_grabber_startup_wait_seconds: int = 10  # How long a capture waits for a just-started grabber
+    frame_grabber_stall_seconds: int = 60  # Restart a grabber that produced no frame for this long
+    frame_grabber_max_backoff_seconds: int = 60
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,43 @@
+"""camera_frame_content_hash
+
+Revision ID: c3f8e21b9d47
+Revises: a54c9792aafd
+Create Date: 2025-11-02 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f8e21b9d47'
+down_revision = 'a54c9792aafd'
+branch_labels = None
+depends_on = None
+
+
+def _has_column(table_name: str, column_name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    if table_name not in inspector.get_table_names():
+        return False
+    return column_name in {col['name'] for col in inspector.get_columns(table_name)}
+
+
+def upgrade() -> None:
+    # camera_frames is created by init_db(); only extend it when it already exists
+    inspector = sa.inspect(op.get_bind())
+    if 'camera_frames' not in inspector.get_table_names() or _has_column('camera_frames', 'content_hash'):
+        return
+
+    with op.batch_alter_table('camera_frames', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_camera_frames_content_hash', ['content_hash'])
+
+
+def downgrade() -> None:
+    if not _has_column('camera_frames', 'content_hash'):
+        return
+
+    with op.batch_alter_table('camera_frames', schema=None) as batch_op:
+        batch_op.drop_index('ix_camera_frames_content_hash')
+        batch_op.drop_column('content_hash')
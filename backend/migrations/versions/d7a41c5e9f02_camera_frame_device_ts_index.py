@@ -0,0 +1,39 @@
+"""camera_frame_device_ts_index
+
+Revision ID: d7a41c5e9f02
+Revises: c3f8e21b9d47
+Create Date: 2025-11-04 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a41c5e9f02'
+down_revision = 'c3f8e21b9d47'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'ix_camera_frames_device_ts'
+
+
+def _has_index(table_name: str, index_name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    if table_name not in inspector.get_table_names():
+        return False
+    return index_name in {idx['name'] for idx in inspector.get_indexes(table_name)}
+
+
+def upgrade() -> None:
+    # camera_frames is created by init_db(); only extend it when it already exists
+    inspector = sa.inspect(op.get_bind())
+    if 'camera_frames' not in inspector.get_table_names() or _has_index('camera_frames', INDEX_NAME):
+        return
+
+    op.create_index(INDEX_NAME, 'camera_frames', ['device_key', 'timestamp'])
+
+
+def downgrade() -> None:
+    if _has_index('camera_frames', INDEX_NAME):
+        op.drop_index(INDEX_NAME, table_name='camera_frames')
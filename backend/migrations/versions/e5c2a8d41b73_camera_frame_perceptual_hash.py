@@ -0,0 +1,44 @@
+"""camera_frame_perceptual_hash_and_file_path_index
+
+Revision ID: e5c2a8d41b73
+Revises: d7a41c5e9f02
+Create Date: 2025-11-05 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c2a8d41b73'
+down_revision = 'd7a41c5e9f02'
+branch_labels = None
+depends_on = None
+
+
+def _has_column(table_name: str, column_name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    if table_name not in inspector.get_table_names():
+        return False
+    return column_name in {col['name'] for col in inspector.get_columns(table_name)}
+
+
+def upgrade() -> None:
+    # camera_frames is created by init_db(); only extend it when it already exists
+    inspector = sa.inspect(op.get_bind())
+    if 'camera_frames' not in inspector.get_table_names() or _has_column('camera_frames', 'perceptual_hash'):
+        return
+
+    with op.batch_alter_table('camera_frames', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('perceptual_hash', sa.String(length=16), nullable=True))
+        # Cleanup reference-counts blobs by file_path
+        batch_op.create_index('ix_camera_frames_file_path', ['file_path'])
+
+
+def downgrade() -> None:
+    if not _has_column('camera_frames', 'perceptual_hash'):
+        return
+
+    with op.batch_alter_table('camera_frames', schema=None) as batch_op:
+        batch_op.drop_index('ix_camera_frames_file_path')
+        batch_op.drop_column('perceptual_hash')
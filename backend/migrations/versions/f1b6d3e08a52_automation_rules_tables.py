@@ -0,0 +1,98 @@
+"""automation_rules_versions_and_executions
+
+Revision ID: f1b6d3e08a52
+Revises: e5c2a8d41b73
+Create Date: 2025-11-12 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1b6d3e08a52'
+down_revision = 'e5c2a8d41b73'
+branch_labels = None
+depends_on = None
+
+
+def _table_names() -> set:
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade() -> None:
+    # init_db() may already have created these tables; only add what is missing
+    tables = _table_names()
+
+    if 'automation_rules' not in tables:
+        op.create_table(
+            'automation_rules',
+            sa.Column('id', sa.String(length=100), primary_key=True),
+            sa.Column('name', sa.String(length=200), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('enabled', sa.Boolean(), nullable=False),
+            sa.Column('protected', sa.Boolean(), nullable=False),
+            sa.Column('priority', sa.Integer(), nullable=False),
+            sa.Column('conditions', sa.JSON(), nullable=False),
+            sa.Column('actions', sa.JSON(), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.Column('deleted', sa.Boolean(), nullable=False),
+            sa.Column('modified_by', sa.String(length=50), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        )
+        op.create_index('ix_automation_rules_version', 'automation_rules', ['version'])
+        op.create_index('ix_automation_rules_deleted_priority', 'automation_rules', ['deleted', 'priority'])
+
+    if 'automation_rule_versions' not in tables:
+        op.create_table(
+            'automation_rule_versions',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('rule_id', sa.String(length=100), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=200), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('enabled', sa.Boolean(), nullable=False),
+            sa.Column('protected', sa.Boolean(), nullable=False),
+            sa.Column('priority', sa.Integer(), nullable=False),
+            sa.Column('conditions', sa.JSON(), nullable=False),
+            sa.Column('actions', sa.JSON(), nullable=False),
+            sa.Column('deleted', sa.Boolean(), nullable=False),
+            sa.Column('modified_by', sa.String(length=50), nullable=True),
+            sa.Column('changed_at', sa.DateTime(timezone=True), nullable=False),
+        )
+        op.create_index('ix_automation_rule_versions_id', 'automation_rule_versions', ['id'])
+        op.create_index(
+            'ix_automation_rule_versions_rule_version', 'automation_rule_versions', ['rule_id', 'version']
+        )
+        # Rules stored before history was kept start with their current version
+        op.execute(
+            "INSERT INTO automation_rule_versions "
+            "(rule_id, version, name, description, enabled, protected, priority, conditions, actions, "
+            "deleted, modified_by, changed_at) "
+            "SELECT id, version, name, description, enabled, protected, priority, conditions, actions, "
+            "deleted, modified_by, updated_at FROM automation_rules"
+        )
+
+    if 'rule_executions' not in tables:
+        op.create_table(
+            'rule_executions',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('rule_id', sa.String(length=100), nullable=False),
+            sa.Column('rule_name', sa.String(length=200), nullable=True),
+            sa.Column('fired_at', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('duration_ms', sa.Integer(), nullable=True),
+            sa.Column('actions', sa.JSON(), nullable=True),
+            sa.Column('outcome', sa.String(length=20), nullable=False),
+            sa.Column('error', sa.Text(), nullable=True),
+        )
+        op.create_index('ix_rule_executions_id', 'rule_executions', ['id'])
+        op.create_index('ix_rule_executions_fired_at', 'rule_executions', ['fired_at'])
+        op.create_index('ix_rule_executions_rule_fired', 'rule_executions', ['rule_id', 'fired_at'])
+
+
+def downgrade() -> None:
+    tables = _table_names()
+    for table in ('rule_executions', 'automation_rule_versions', 'automation_rules'):
+        if table in tables:
+            op.drop_table(table)
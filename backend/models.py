@@ -118,6 +118,70 @@ class ConversationMessage(Base):
     )
 
 
+class AutomationRule(Base):
+    __tablename__ = "automation_rules"
+
+    id = Column(String(100), primary_key=True)
+    name = Column(String(200), nullable=False)
+    description = Column(Text, nullable=True)
+    enabled = Column(Boolean, default=False, nullable=False)
+    protected = Column(Boolean, default=False, nullable=False)
+    priority = Column(Integer, default=100, nullable=False)
+    conditions = Column(JSON, nullable=False)
+    actions = Column(JSON, nullable=False)
+    # Rule-set revision of this rule's last change (shared counter across all rules)
+    version = Column(Integer, nullable=False, index=True)
+    deleted = Column(Boolean, default=False, nullable=False)  # Kept so deletions also carry a version
+    modified_by = Column(String(50), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=utc_now, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=utc_now, nullable=False)
+
+    __table_args__ = (
+        Index("ix_automation_rules_deleted_priority", "deleted", "priority"),
+    )
+
+
+class AutomationRuleVersion(Base):
+    """A rule as it was after one change; every create, edit and delete adds a row."""
+
+    __tablename__ = "automation_rule_versions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    rule_id = Column(String(100), nullable=False)
+    version = Column(Integer, nullable=False)
+    name = Column(String(200), nullable=False)
+    description = Column(Text, nullable=True)
+    enabled = Column(Boolean, nullable=False)
+    protected = Column(Boolean, nullable=False)
+    priority = Column(Integer, nullable=False)
+    conditions = Column(JSON, nullable=False)
+    actions = Column(JSON, nullable=False)
+    deleted = Column(Boolean, default=False, nullable=False)
+    modified_by = Column(String(50), nullable=True)
+    changed_at = Column(DateTime(timezone=True), default=utc_now, nullable=False)
+
+    __table_args__ = (
+        Index("ix_automation_rule_versions_rule_version", "rule_id", "version"),
+    )
+
+
+class RuleExecution(Base):
+    __tablename__ = "rule_executions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    rule_id = Column(String(100), nullable=False)
+    rule_name = Column(String(200), nullable=True)
+    fired_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    duration_ms = Column(Integer, nullable=True)
+    actions = Column(JSON, nullable=True)  # Actions the rule sent when it fired
+    outcome = Column(String(20), nullable=False)  # 'success' or 'error'
+    error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("ix_rule_executions_rule_fired", "rule_id", "fired_at"),
+    )
+
+
 JsonPrimitive = Union[str, int, float, bool, None]
 JsonValue = Union[JsonPrimitive, Dict[str, Any], List[Any]]
 
@@ -211,10 +275,12 @@ class CameraFrame(Base):
     id = Column(Integer, primary_key=True, index=True)
     device_key = Column(String(100), nullable=False, index=True)
     timestamp = Column(DateTime(timezone=True), default=utc_now, nullable=False, index=True)
-    file_path = Column(String(500), nullable=False)
+    file_path = Column(String(500), nullable=False, index=True)  # shared by deduplicated frames
     file_size = Column(Integer, nullable=True)
     width = Column(Integer, nullable=True)
     height = Column(Integer, nullable=True)
+    content_hash = Column(String(64), nullable=True, index=True)  # sha256 of the stored image bytes
+    perceptual_hash = Column(String(16), nullable=True)  # 64-bit dHash used for near-duplicate detection
     analyzed_at = Column(DateTime(timezone=True), nullable=True, index=True)
     analysis_model = Column(String(100), nullable=True)
     detected_objects = Column(JSON, nullable=True)
@@ -222,6 +288,10 @@ class CameraFrame(Base):
     anomaly_detected = Column(Boolean, nullable=True)
     notes = Column(Text, nullable=True)
 
+    __table_args__ = (
+        Index("ix_camera_frames_device_ts", "device_key", "timestamp"),
+    )
+
 
 class CameraFrameResponse(BaseModel):
     id: int
@@ -231,6 +301,8 @@ class CameraFrameResponse(BaseModel):
     file_size: Optional[int] = None
     width: Optional[int] = None
     height: Optional[int] = None
+    content_hash: Optional[str] = None
+    perceptual_hash: Optional[str] = None
     analyzed_at: Optional[datetime] = None
     analysis_model: Optional[str] = None
     detected_objects: Optional[Dict[str, Any]] = None
@@ -242,6 +314,12 @@ class CameraFrameResponse(BaseModel):
         from_attributes = True
 
 
+class NearestFrameResponse(BaseModel):
+    requested_at: datetime
+    frame: Optional[CameraFrameResponse] = None
+    offset_seconds: Optional[float] = None  # frame.timestamp - requested_at
+
+
 class CameraFrameCreate(BaseModel):
     device_key: str
     file_path: str
@@ -250,6 +328,15 @@ class CameraFrameCreate(BaseModel):
     height: Optional[int] = None
 
 
+class CameraFrameAnalysis(BaseModel):
+    """Vision analysis result to persist on a stored frame."""
+    analysis_model: str
+    notes: str
+    detected_objects: Optional[Dict[str, Any]] = None
+    plant_health_score: Optional[int] = Field(default=None, ge=0, le=100)
+    anomaly_detected: Optional[bool] = None
+
+
 class LatestMetricSnapshot(BaseModel):
     metric_key: str
     value: JsonValue
@@ -296,6 +383,51 @@ class HistoricalReadingsResponse(BaseModel):
     statistics: Optional[Dict[str, List[MetricStatistics]]] = None
 
 
+class AutomationRuleCreate(BaseModel):
+    id: Optional[str] = None  # Generated when omitted
+    name: str
+    description: str = ""
+    enabled: bool = False
+    protected: bool = False
+    priority: int = 100
+    conditions: Dict[str, Any]
+    actions: List[Dict[str, Any]]
+    modified_by: str = "api"
+
+
+class AutomationRuleUpdate(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    enabled: Optional[bool] = None
+    protected: Optional[bool] = None
+    priority: Optional[int] = None
+    conditions: Optional[Dict[str, Any]] = None
+    actions: Optional[List[Dict[str, Any]]] = None
+    modified_by: str = "api"
+
+
+class AutomationRuleToggle(BaseModel):
+    enabled: bool
+    modified_by: str = "api"
+
+
+class RuleExecutionCreate(BaseModel):
+    rule_id: str
+    rule_name: Optional[str] = None
+    fired_at: datetime
+    duration_ms: Optional[int] = None
+    actions: Optional[List[Dict[str, Any]]] = None
+    outcome: Literal["success", "error"] = "success"
+    error: Optional[str] = None
+
+
+class AutomationBacktestRequest(BaseModel):
+    rule_ids: List[str] = []  # Stored rules, replayed whether enabled or not
+    rules: List[Dict[str, Any]] = []  # Unsaved rule definitions
+    start: datetime
+    end: Optional[datetime] = None  # Defaults to now
+
+
 class ConversationMessageBase(BaseModel):
     source: Literal[ConversationSource.AUTOMATED.value, ConversationSource.MANUAL.value]
     role: Literal[ConversationRole.USER.value, ConversationRole.ASSISTANT.value]
@@ -0,0 +1,166 @@
+"""Actuator control with mode-based permissions, shared by the API and embedded automation."""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import ActuatorCommand, ActuatorControl, Device, Metric
+from ..mqtt_client import mqtt_client
+
+
+def is_allowed(mode: str, source: str, force: bool) -> tuple[bool, str]:
+    """Check if source is allowed to control actuator in given mode.
+
+    AUTO mode = normal operation (AI + automation control)
+    MANUAL mode = emergency override (user control only)
+    """
+    if mode == 'auto':
+        # AUTO mode: AI and automation allowed, user blocked unless force
+        if source in ('ai', 'automation'):
+            return True, ""
+        elif source == 'user' and force:
+            return True, ""  # Emergency override
+        else:
+            return False, "Actuator is in AUTO mode (use force=true for emergency override)"
+    else:  # manual mode
+        # MANUAL mode: User allowed, AI and automation blocked
+        if source == 'user':
+            return True, ""
+        else:
+            return False, "Actuator is in MANUAL mode (user emergency override active)"
+
+
+async def get_actuator_modes(
+    db: AsyncSession,
+    device_keys: Optional[Iterable[str]] = None,
+) -> Dict[str, Dict[str, str]]:
+    """Control mode per device and actuator key."""
+    query = (
+        select(Device.device_key, Metric.metric_key, Metric.control_mode)
+        .join(Metric, Metric.device_id == Device.id)
+        .where(Metric.metric_type == 'actuator')
+    )
+
+    if device_keys:
+        query = query.where(Device.device_key.in_(list(device_keys)))
+
+    result = await db.execute(query)
+
+    modes: Dict[str, Dict[str, str]] = {}
+    for device_key, metric_key, control_mode in result.all():
+        if device_key not in modes:
+            modes[device_key] = {}
+        modes[device_key][metric_key] = control_mode or 'manual'
+    return modes
+
+
+async def control_actuators(
+    db: AsyncSession,
+    commands: Sequence[ActuatorCommand],
+    source: str = "user",
+    force: bool = False,
+) -> Dict[str, Any]:
+    """Apply a batch of actuator commands, publishing one MQTT payload per device.
+
+    Raises:
+        ValueError: A command is missing its device/actuator or has an invalid state
+    """
+    if not commands:
+        return {"processed": 0, "skipped": 0, "missing": [], "blocked": []}
+
+    source = source.lower()
+    if source not in {"user", "ai", "automation"}:
+        source = "user"
+
+    deduped: Dict[tuple[str, str], ActuatorCommand] = {}
+    for command in commands:
+        device_id = command.device_id.strip()
+        # Normalize key: lowercase and remove spaces (e.g. "Relay 1" -> "relay1")
+        normalized_key = command.actuator_key.lower().replace(" ", "")
+
+        if not device_id or not normalized_key:
+            raise ValueError("Each command requires device_id and actuator_key")
+        state = command.state.lower()
+        if state not in {"on", "off"}:
+            raise ValueError(f"Invalid state '{command.state}' for actuator '{command.actuator_key}'")
+        deduped[(device_id, normalized_key)] = ActuatorCommand(
+            device_id=device_id,
+            actuator_key=normalized_key,
+            state=state,
+        )
+
+    if not deduped:
+        return {"processed": 0, "skipped": 0, "missing": [], "blocked": []}
+
+    pairs = list(deduped.keys())
+
+    # Check which actuators exist and their control mode
+    result = await db.execute(
+        select(Device.device_key, Metric.metric_key, Metric.control_mode)
+        .join(Metric, Metric.device_id == Device.id)
+        .where(tuple_(Device.device_key, Metric.metric_key).in_(pairs))
+        .where(Metric.metric_type == 'actuator')
+    )
+
+    valid_pairs = {}
+    for device_key, metric_key, control_mode in result.all():
+        valid_pairs[(device_key, metric_key)] = control_mode or 'manual'
+
+    missing = []
+    blocked = []
+
+    # Categorize commands
+    for device_id, actuator_key in pairs:
+        if (device_id, actuator_key) not in valid_pairs:
+            missing.append({"device_id": device_id, "actuator_key": actuator_key})
+        else:
+            mode = valid_pairs[(device_id, actuator_key)]
+            allowed, reason = is_allowed(mode, source, force)
+            if not allowed:
+                blocked.append({
+                    "device_id": device_id,
+                    "actuator_key": actuator_key,
+                    "reason": reason,
+                    "mode": mode,
+                    "source": source
+                })
+
+    # Process allowed commands
+    device_commands: Dict[str, List[ActuatorControl]] = defaultdict(list)
+    processed_details: List[Dict[str, Any]] = []
+
+    for device_id, actuator_key in pairs:
+        if (device_id, actuator_key) not in valid_pairs:
+            continue
+
+        mode = valid_pairs[(device_id, actuator_key)]
+        allowed, _ = is_allowed(mode, source, force)
+        if not allowed:
+            continue
+
+        command = deduped[(device_id, actuator_key)]
+        control = ActuatorControl(actuator_key=command.actuator_key, state=command.state)
+        device_commands[device_id].append(control)
+        processed_details.append({
+            "device_id": device_id,
+            "actuator_key": actuator_key,
+            "state": command.state,
+            "mode": mode,
+        })
+
+    # Publish to MQTT
+    for device_id, controls in device_commands.items():
+        await mqtt_client.publish_actuator_batch(device_id, controls)
+
+    return {
+        "processed": len(processed_details),
+        "skipped": len(deduped) - len(processed_details),
+        "missing": missing,
+        "blocked": blocked,
+        "details": processed_details,
+        "source": source,
+    }
@@ -0,0 +1,155 @@
+"""Embedded automation: run the gardener's rule engine inside the backend process.
+
+On a single box the gardener's ``AutomationEngine`` otherwise reaches the
+backend over HTTP for every evaluation (latest readings, actuator modes,
+commands, rules) and over the ``/ws/sensors`` socket for live readings.
+Embedded, it reads the MQTT values cache and the rules table directly, takes
+events straight from the in-process event broker, and publishes commands
+through the same batch control path as ``/api/actuators/batch-control``.
+
+Enabled with ``AUTOMATION_EMBEDDED=true``; the gardener container should then
+run with ``GARDENER_AUTOMATION_ENABLED=false`` so rules are not applied twice.
+There is no AI agent in the backend, so ``run_ai_agent`` actions are skipped.
+The remote (HTTP) mode stays the default.
+"""
+
+import asyncio
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..events import event_broker
+from ..models import ActuatorCommand, RuleExecutionCreate
+from ..mqtt_client import mqtt_client
+from . import automation_rules
+from .actuators import control_actuators, get_actuator_modes
+
+EventHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class EmbeddedHydroClient:
+    """The parts of the gardener's ``HydroAPIClient`` the automation engine uses, in-process."""
+
+    async def latest_values(self) -> Dict[Tuple[str, str], Any]:
+        return {
+            (device_key, metric_key): value
+            for device_key, device_values in mqtt_client.values_cache.items()
+            for metric_key, value in device_values.items()
+        }
+
+    async def get_actuator_modes(self, *, device_keys: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, str]]:
+        async with AsyncSessionLocal() as db:
+            return await get_actuator_modes(db, device_keys)
+
+    async def control_actuators(
+        self,
+        commands: List[Dict[str, Any]],
+        *,
+        source: str = "automation",
+        force: bool = False,
+    ) -> Dict[str, Any]:
+        async with AsyncSessionLocal() as db:
+            return await control_actuators(
+                db,
+                [ActuatorCommand(**command) for command in commands],
+                source=source,
+                force=force,
+            )
+
+    async def list_automation_rules(self, **filters: Any) -> Dict[str, Any]:
+        async with AsyncSessionLocal() as db:
+            return await automation_rules.list_rules(db, **filters)
+
+    async def get_automation_rules_version(self) -> int:
+        async with AsyncSessionLocal() as db:
+            return await automation_rules.current_version(db)
+
+    async def record_rule_executions(self, executions: List[Dict[str, Any]]) -> None:
+        async with AsyncSessionLocal() as db:
+            await automation_rules.record_executions(
+                db, [RuleExecutionCreate(**execution) for execution in executions]
+            )
+
+
+class BrokerEventStream:
+    """Feeds event broker events to handlers, standing in for the gardener's WebSocket stream."""
+
+    def __init__(self) -> None:
+        self._handlers: List[EventHandler] = []
+        self._task: Optional[asyncio.Task] = None
+        self.connected = False
+
+    def subscribe(self, handler: EventHandler) -> None:
+        self._handlers.append(handler)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        queue = await event_broker.subscribe()
+        self.connected = True
+        try:
+            while True:
+                event = await queue.get()
+                for handler in list(self._handlers):
+                    try:
+                        await handler(event)
+                    except Exception as exc:
+                        logger.warning(f"Automation event handler failed: {exc}")
+        finally:
+            self.connected = False
+            event_broker.unsubscribe(queue)
+
+
+class EmbeddedAutomation:
+    """Owns the embedded engine task and its event stream."""
+
+    def __init__(self) -> None:
+        self.engine = None
+        self.stream = BrokerEventStream()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if not settings.automation_embedded or (self._task is not None and not self._task.done()):
+            return
+        try:
+            from agents.gardener.automation_runner import AutomationEngine
+        except ImportError as exc:
+            logger.error(f"Embedded automation enabled but the gardener package is not importable: {exc}")
+            return
+
+        self.engine = AutomationEngine(EmbeddedHydroClient(), state_path=Path(settings.automation_state_path))
+        self.stream.start()
+        self._task = asyncio.create_task(
+            self.engine.run_event_driven(
+                self.stream,
+                reconcile_interval=settings.automation_reconcile_interval_seconds,
+            )
+        )
+        logger.info("Embedded automation engine started")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.stream.aclose()
+
+
+embedded_automation = EmbeddedAutomation()
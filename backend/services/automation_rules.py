@@ -0,0 +1,354 @@
+"""Automation rules and their execution history, stored in the backend database.
+
+Every change to a rule, deletion included (rules are soft-deleted), takes the
+next value of one rule-set version counter, so "did anything change since
+version N" is a single indexed MAX query. A copy of the rule as it was after
+each change is kept in ``automation_rule_versions``. Changes are announced as
+``rules_changed`` events on the event broker, which the automation engine
+(remote or embedded) listens for.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+from loguru import logger
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import AsyncSessionLocal
+from ..events import event_broker
+from ..models import (
+    AutomationRule,
+    AutomationRuleCreate,
+    AutomationRuleUpdate,
+    AutomationRuleVersion,
+    RuleExecution,
+    RuleExecutionCreate,
+)
+from ..utils.time import ensure_utc, utc_now
+
+# Serialises version allocation between concurrent writers in this process
+_write_lock = asyncio.Lock()
+
+
+def validate_rule(rule: Dict[str, Any]) -> Optional[str]:
+    """Return an error message if the rule is invalid, else None."""
+    if not rule.get("name"):
+        return "Rule name is required"
+
+    conditions = rule.get("conditions") or {}
+    if not conditions:
+        return "Rule conditions are required"
+    if not conditions.get("all_of") and not conditions.get("any_of"):
+        return "Rule must have either 'all_of' or 'any_of' conditions"
+
+    actions = rule.get("actions")
+    if not isinstance(actions, list) or len(actions) == 0:
+        return "Rule must have at least one action"
+
+    return None
+
+
+def rule_to_dict(rule: AutomationRule) -> Dict[str, Any]:
+    return {
+        "id": rule.id,
+        "name": rule.name,
+        "description": rule.description or "",
+        "enabled": rule.enabled,
+        "protected": rule.protected,
+        "priority": rule.priority,
+        "conditions": rule.conditions,
+        "actions": rule.actions,
+        "version": rule.version,
+        "modified_by": rule.modified_by,
+        "updated_at": ensure_utc(rule.updated_at).isoformat() if rule.updated_at else None,
+    }
+
+
+def _snapshot(rule: AutomationRule) -> AutomationRuleVersion:
+    return AutomationRuleVersion(
+        rule_id=rule.id,
+        version=rule.version,
+        name=rule.name,
+        description=rule.description,
+        enabled=rule.enabled,
+        protected=rule.protected,
+        priority=rule.priority,
+        conditions=rule.conditions,
+        actions=rule.actions,
+        deleted=rule.deleted,
+        modified_by=rule.modified_by,
+        changed_at=rule.updated_at,
+    )
+
+
+def version_to_dict(entry: AutomationRuleVersion) -> Dict[str, Any]:
+    return {
+        "rule_id": entry.rule_id,
+        "version": entry.version,
+        "name": entry.name,
+        "description": entry.description or "",
+        "enabled": entry.enabled,
+        "protected": entry.protected,
+        "priority": entry.priority,
+        "conditions": entry.conditions,
+        "actions": entry.actions,
+        "deleted": entry.deleted,
+        "modified_by": entry.modified_by,
+        "changed_at": ensure_utc(entry.changed_at).isoformat(),
+    }
+
+
+def execution_to_dict(execution: RuleExecution) -> Dict[str, Any]:
+    return {
+        "id": execution.id,
+        "rule_id": execution.rule_id,
+        "rule_name": execution.rule_name,
+        "fired_at": ensure_utc(execution.fired_at).isoformat(),
+        "duration_ms": execution.duration_ms,
+        "actions": execution.actions,
+        "outcome": execution.outcome,
+        "error": execution.error,
+    }
+
+
+async def current_version(db: AsyncSession) -> int:
+    """Latest rule-set version (0 when no rule was ever stored)."""
+    result = await db.execute(select(func.max(AutomationRule.version)))
+    return result.scalar() or 0
+
+
+async def list_rules(
+    db: AsyncSession,
+    *,
+    enabled: Optional[bool] = None,
+    protected: Optional[bool] = None,
+    search: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> Dict[str, Any]:
+    """Rules in priority order, optionally filtered and paged, with counts over the filtered set."""
+    filters = [AutomationRule.deleted.is_(False)]
+    if enabled is not None:
+        filters.append(AutomationRule.enabled.is_(enabled))
+    if protected is not None:
+        filters.append(AutomationRule.protected.is_(protected))
+    if search:
+        filters.append(AutomationRule.name.ilike(f"%{search}%"))
+
+    counts = (await db.execute(
+        select(
+            func.count(),
+            func.sum(case((AutomationRule.enabled.is_(True), 1), else_=0)),
+            func.sum(case((AutomationRule.protected.is_(True), 1), else_=0)),
+        ).where(*filters)
+    )).one()
+
+    query = (
+        select(AutomationRule)
+        .where(*filters)
+        .order_by(AutomationRule.priority.desc(), AutomationRule.id)
+        .offset(offset)
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    rules = (await db.execute(query)).scalars().all()
+
+    return {
+        "rules": [rule_to_dict(rule) for rule in rules],
+        "total_count": counts[0],
+        "enabled_count": counts[1] or 0,
+        "protected_count": counts[2] or 0,
+        "version": await current_version(db),
+    }
+
+
+async def get_rule(db: AsyncSession, rule_id: str) -> Optional[AutomationRule]:
+    rule = await db.get(AutomationRule, rule_id)
+    if rule is None or rule.deleted:
+        return None
+    return rule
+
+
+async def _commit_change(db: AsyncSession, rule: AutomationRule, modified_by: str) -> int:
+    """Stamp ``rule`` with the next version, commit and announce the change."""
+    async with _write_lock:
+        # Don't flush the pending row (version still unset) just to read the counter
+        with db.no_autoflush:
+            version = await current_version(db) + 1
+        rule.version = version
+        rule.modified_by = modified_by
+        rule.updated_at = utc_now()
+        db.add(_snapshot(rule))
+        await db.commit()
+
+    try:
+        await event_broker.publish({"type": "rules_changed", "version": version, "rule_id": rule.id})
+    except Exception as exc:
+        logger.debug(f"Failed to publish rules_changed event: {exc}")
+    return version
+
+
+async def create_rule(db: AsyncSession, payload: AutomationRuleCreate) -> AutomationRule:
+    """Create a rule.
+
+    Raises:
+        ValueError: The rule is invalid or its id is already in use
+    """
+    data = payload.model_dump(exclude={"modified_by"})
+    error = validate_rule(data)
+    if error:
+        raise ValueError(error)
+
+    rule_id = data.pop("id") or f"rule-{uuid.uuid4().hex[:8]}"
+    rule = await db.get(AutomationRule, rule_id)
+    if rule is not None and not rule.deleted:
+        raise ValueError(f"Rule with ID '{rule_id}' already exists")
+
+    if rule is None:
+        rule = AutomationRule(id=rule_id, created_at=utc_now())
+        db.add(rule)
+    for key, value in data.items():
+        setattr(rule, key, value)
+    rule.deleted = False
+
+    await _commit_change(db, rule, payload.modified_by)
+    return rule
+
+
+async def update_rule(db: AsyncSession, rule_id: str, payload: AutomationRuleUpdate) -> Optional[AutomationRule]:
+    """Apply the fields set in ``payload``; None if the rule does not exist.
+
+    Raises:
+        ValueError: The updated rule is invalid
+    """
+    rule = await get_rule(db, rule_id)
+    if rule is None:
+        return None
+
+    changes = payload.model_dump(exclude={"modified_by"}, exclude_none=True)
+    error = validate_rule({**rule_to_dict(rule), **changes})
+    if error:
+        raise ValueError(error)
+
+    for key, value in changes.items():
+        setattr(rule, key, value)
+    await _commit_change(db, rule, payload.modified_by)
+    return rule
+
+
+async def delete_rule(db: AsyncSession, rule_id: str, modified_by: str = "api") -> bool:
+    rule = await get_rule(db, rule_id)
+    if rule is None:
+        return False
+    rule.deleted = True
+    await _commit_change(db, rule, modified_by)
+    return True
+
+
+async def list_rule_versions(db: AsyncSession, rule_id: str, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+    """Stored versions of one rule, newest first (deleted rules included)."""
+    filters = [AutomationRuleVersion.rule_id == rule_id]
+    total = (await db.execute(select(func.count()).select_from(AutomationRuleVersion).where(*filters))).scalar()
+    rows = (await db.execute(
+        select(AutomationRuleVersion)
+        .where(*filters)
+        .order_by(AutomationRuleVersion.version.desc())
+        .offset(offset)
+        .limit(limit)
+    )).scalars().all()
+    return {"versions": [version_to_dict(row) for row in rows], "total_count": total}
+
+
+async def import_rules_file(path: Path) -> int:
+    """Seed the rules table from a legacy ``automation_rules.json`` when it is empty.
+
+    Returns:
+        Number of rules imported
+    """
+    if not path.exists():
+        return 0
+
+    async with AsyncSessionLocal() as db:
+        existing = await db.execute(select(func.count()).select_from(AutomationRule))
+        if existing.scalar():
+            return 0
+
+        with open(path, "r") as f:
+            data = json.load(f)
+
+        rules = data.get("rules", [])
+        for version, item in enumerate(rules, start=1):
+            rule = AutomationRule(
+                id=item.get("id") or f"rule-{uuid.uuid4().hex[:8]}",
+                name=item.get("name") or item.get("id") or "Unnamed rule",
+                description=item.get("description", ""),
+                enabled=bool(item.get("enabled", False)),
+                protected=bool(item.get("protected", False)),
+                priority=item.get("priority", 100),
+                conditions=item.get("conditions", {}),
+                actions=item.get("actions", []),
+                version=version,
+                modified_by="import",
+                updated_at=utc_now(),
+            )
+            db.add(rule)
+            db.add(_snapshot(rule))
+        await db.commit()
+
+    logger.info(f"Imported {len(rules)} automation rules from {path}")
+    return len(rules)
+
+
+async def record_executions(db: AsyncSession, executions: Sequence[RuleExecutionCreate]) -> int:
+    for item in executions:
+        data = item.model_dump()
+        data["fired_at"] = ensure_utc(data["fired_at"])
+        db.add(RuleExecution(**data))
+    await db.commit()
+    return len(executions)
+
+
+async def list_executions(
+    db: AsyncSession,
+    *,
+    rule_id: Optional[str] = None,
+    outcome: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> Dict[str, Any]:
+    """Execution log, newest first, filtered and paged."""
+    filters = []
+    if rule_id:
+        filters.append(RuleExecution.rule_id == rule_id)
+    if outcome:
+        filters.append(RuleExecution.outcome == outcome)
+    if since:
+        filters.append(RuleExecution.fired_at >= ensure_utc(since))
+    if until:
+        filters.append(RuleExecution.fired_at < ensure_utc(until))
+
+    total = (await db.execute(select(func.count()).select_from(RuleExecution).where(*filters))).scalar()
+    rows = (await db.execute(
+        select(RuleExecution)
+        .where(*filters)
+        .order_by(RuleExecution.fired_at.desc(), RuleExecution.id.desc())
+        .offset(offset)
+        .limit(limit)
+    )).scalars().all()
+
+    return {"executions": [execution_to_dict(row) for row in rows], "total_count": total}
+
+
+async def delete_old_executions(before: datetime) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(RuleExecution).where(RuleExecution.fired_at < before))
+        await db.commit()
@@ -0,0 +1,295 @@
+"""Cached registry of MediaMTX camera paths, synced to the devices table.
+
+One pooled HTTP client talks to the MediaMTX API and the API version that
+answered (v3 or v2) is remembered, so a poll is a single request. The path
+list is diffed against the previous poll and only cameras whose state changed
+are written (one upsert each, which also publishes the ``device`` event).
+Unchanged ready cameras just get ``last_seen`` refreshed in one bulk UPDATE,
+and only often enough to stay ahead of ``sensor_discovery_timeout``.
+
+Frame capture and the grabbers read the same cached list via ``active_paths``
+instead of querying MediaMTX themselves.
+
+MediaMTX ``runOnReady``/``runOnNotReady`` hooks (see ``mediamtx.yml``) call
+``apply_hook`` through the API, so cameras appear and drop out immediately.
+Once a hook has been received, polling slows to
+``camera_reconcile_interval_seconds`` and only reconciles missed events.
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import httpx
+from loguru import logger
+from sqlalchemy import update
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..models import Device
+from ..utils.time import utc_now
+from .persistence import deactivate_device, upsert_device
+
+API_VERSIONS = ("v3", "v2")
+
+
+def get_mediamtx_api_url() -> str:
+    """Get the MediaMTX API URL from settings."""
+    return f"http://{settings.mediamtx_host}:{settings.mediamtx_api_port}"
+
+
+def get_mediamtx_whep_url(path_name: str) -> str:
+    """Get the MediaMTX WHEP URL for a given path."""
+    return f"http://{settings.mediamtx_host}:{settings.mediamtx_webrtc_port}/{path_name}/whep"
+
+
+@dataclass(frozen=True)
+class CameraPath:
+    """One MediaMTX path as reported by the paths API."""
+
+    name: str
+    display_name: str
+    ready: bool
+    source_ready: bool = False
+    tracks: Tuple[str, ...] = ()
+    readers: int = 0
+    # Grows on every poll; stored but not treated as a change
+    bytes_sent: int = field(default=0, compare=False)
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> Optional["CameraPath"]:
+        """Parse a paths-list item; None for system paths (leading underscore)."""
+        path_name = item.get("path") or item.get("name") or ""
+        if not path_name or path_name.startswith("_"):
+            return None
+        readers = item.get("readers", 0)
+        return cls(
+            name=path_name,
+            display_name=item.get("name") or path_name,
+            ready=bool(item.get("ready", False)),
+            source_ready=bool(item.get("sourceReady", False)),
+            tracks=tuple(str(t) for t in item.get("tracks") or ()),
+            readers=len(readers) if isinstance(readers, list) else int(readers or 0),
+            bytes_sent=int(item.get("bytesSent", 0) or 0),
+        )
+
+    def metadata(self) -> str:
+        return json.dumps({
+            "ready": self.ready,
+            "source_ready": self.source_ready,
+            "tracks": list(self.tracks),
+            "readers": self.readers,
+            "bytes_sent": self.bytes_sent,
+            "whep_url": get_mediamtx_whep_url(self.name),
+            "last_sync": utc_now().isoformat(),
+        })
+
+
+class CameraRegistry:
+    """MediaMTX path list cache with change-only database sync."""
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._api_version: Optional[str] = None
+        self._cameras: Dict[str, CameraPath] = {}
+        self._fetched_at: Optional[float] = None
+        self._touched_at: Dict[str, float] = {}
+        # Cameras whose change has not been written yet (refresh may run from capture too)
+        self._unsynced: Set[str] = set()
+        self._hook_seen = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def api_version(self) -> Optional[str]:
+        return self._api_version
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=get_mediamtx_api_url(),
+                timeout=5.0,
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=2),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _fetch_items(self) -> List[Dict[str, Any]]:
+        client = self._get_client()
+        # Try the remembered version first; probe the others only on 404
+        versions = [self._api_version] if self._api_version else []
+        versions += [v for v in API_VERSIONS if v not in versions]
+        for version in versions:
+            response = await client.get(f"/{version}/paths/list")
+            if response.status_code == 404:
+                continue
+            if response.status_code != 200:
+                raise RuntimeError(f"MediaMTX API returned status {response.status_code}")
+            if version != self._api_version:
+                logger.info(f"Using MediaMTX API {version}")
+                self._api_version = version
+            data = response.json()
+            return data.get("items", []) if isinstance(data, dict) else data
+        self._api_version = None
+        raise RuntimeError("MediaMTX API returned status 404")
+
+    async def refresh(self) -> Tuple[List[CameraPath], List[str]]:
+        """Poll MediaMTX and update the cache. Returns (changed or new cameras, removed names)."""
+        async with self._lock:
+            items = await self._fetch_items()
+            cameras: Dict[str, CameraPath] = {}
+            for item in items:
+                camera = CameraPath.from_item(item)
+                if camera is not None:
+                    cameras[camera.name] = camera
+
+            changed = [c for name, c in cameras.items() if self._cameras.get(name) != c]
+            removed = [name for name in self._cameras if name not in cameras]
+            self._cameras = cameras
+            self._fetched_at = time.monotonic()
+            self._unsynced.update(c.name for c in changed)
+            self._unsynced.difference_update(removed)
+            return changed, removed
+
+    def cameras(self) -> List[CameraPath]:
+        return list(self._cameras.values())
+
+    def ready_paths(self) -> List[str]:
+        return [name for name, camera in self._cameras.items() if camera.ready]
+
+    @property
+    def poll_interval(self) -> float:
+        """How stale the cached list may get: slow once MediaMTX hooks are known to be arriving."""
+        if self._hook_seen:
+            return settings.camera_reconcile_interval_seconds
+        return settings.sensor_heartbeat_interval
+
+    async def active_paths(self, max_age_seconds: Optional[float] = None) -> List[str]:
+        """Names of ready cameras, polling MediaMTX only if the cache is older than ``max_age_seconds``."""
+        max_age = self.poll_interval if max_age_seconds is None else max_age_seconds
+        if self._fetched_at is None or time.monotonic() - self._fetched_at > max_age:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Failed to get camera paths from MediaMTX: {e}")
+        return self.ready_paths()
+
+    async def _write_camera(self, camera: CameraPath) -> None:
+        if camera.ready:
+            await upsert_device(
+                device_key=camera.name,
+                name=camera.display_name,
+                description="Camera stream via MediaMTX",
+                metadata=camera.metadata(),
+                last_seen=utc_now(),
+                device_type='camera',
+            )
+        elif await deactivate_device(camera.name, camera.metadata()) is None:
+            # Unknown camera that is not ready yet: record it; it expires after the discovery timeout
+            await upsert_device(
+                device_key=camera.name,
+                name=camera.display_name,
+                description="Camera stream via MediaMTX",
+                metadata=camera.metadata(),
+                device_type='camera',
+            )
+        self._touched_at[camera.name] = time.monotonic()
+        self._unsynced.discard(camera.name)
+
+    async def apply_hook(self, path_name: str, ready: bool) -> Optional[CameraPath]:
+        """Apply a MediaMTX runOnReady/runOnNotReady notification without polling."""
+        self._hook_seen = True
+        if not path_name or path_name.startswith("_"):
+            return None
+        async with self._lock:
+            current = self._cameras.get(path_name)
+            camera = replace(current, ready=ready) if current else CameraPath(
+                name=path_name, display_name=path_name, ready=ready, source_ready=ready
+            )
+            self._cameras[path_name] = camera
+        await self._write_camera(camera)
+        logger.info(f"Camera {path_name} is {'ready' if ready else 'not ready'} (MediaMTX hook)")
+        return camera
+
+    async def touch_ready(self) -> int:
+        """Refresh ``last_seen`` for ready cameras in one UPDATE, only as often as the discovery timeout needs."""
+        now = time.monotonic()
+        for name in [n for n in self._touched_at if n not in self._cameras]:
+            del self._touched_at[name]
+
+        touch_after = settings.sensor_discovery_timeout / 3
+        stale = [
+            name for name in self.ready_paths()
+            if now - self._touched_at.get(name, 0.0) >= touch_after
+        ]
+        if stale:
+            async with AsyncSessionLocal() as session:
+                await session.execute(
+                    update(Device)
+                    .where(Device.device_key.in_(stale))
+                    .values(last_seen=utc_now(), is_active=True)
+                )
+                await session.commit()
+            for name in stale:
+                self._touched_at[name] = now
+        return len(stale)
+
+    async def sync_to_db(self, force_poll: bool = False) -> Dict[str, Any]:
+        """
+        Write changed cameras to the devices table, polling MediaMTX when the cache is due.
+
+        Returns a summary of the sync operation with counts and any errors.
+        """
+        summary: Dict[str, Any] = {"synced": 0, "unchanged": 0, "healthy": 0, "unhealthy": 0, "errors": []}
+
+        if force_poll or self._fetched_at is None or time.monotonic() - self._fetched_at >= self.poll_interval:
+            try:
+                await self.refresh()
+            except httpx.RequestError as e:
+                error_msg = f"Failed to connect to MediaMTX API: {str(e)}"
+                logger.warning(error_msg)
+                summary["errors"].append(error_msg)
+                return summary
+            except Exception as e:
+                error_msg = f"Camera sync failed: {str(e)}"
+                logger.warning(error_msg)
+                summary["errors"].append(error_msg)
+                return summary
+
+        for name in sorted(self._unsynced):
+            camera = self._cameras[name]
+            try:
+                await self._write_camera(camera)
+                summary["synced"] += 1
+                logger.debug(f"Synced camera {camera.name} (healthy: {camera.ready})")
+            except Exception as e:
+                error_msg = f"Failed to sync camera {camera.name}: {str(e)}"
+                logger.error(error_msg)
+                summary["errors"].append(error_msg)
+
+        # Keep unchanged ready cameras alive without rewriting their rows
+        await self.touch_ready()
+
+        for camera in self._cameras.values():
+            summary["healthy" if camera.ready else "unhealthy"] += 1
+        summary["unchanged"] = len(self._cameras) - summary["synced"]
+
+        if summary["synced"] > 0:
+            logger.info(
+                f"Camera sync complete: {summary['synced']} cameras changed "
+                f"({summary['healthy']} healthy, {summary['unhealthy']} unhealthy)"
+            )
+        return summary
+
+
+camera_registry = CameraRegistry()
+
+
+async def sync_cameras_to_db() -> Dict[str, Any]:
+    """Query MediaMTX and sync changed cameras to the devices table."""
+    return await camera_registry.sync_to_db()
@@ -0,0 +1,209 @@
+"""Paced frame capture: bounded concurrency, staggered start times, per-camera backoff.
+
+Firing every camera at once makes capture load bursty (one ffmpeg per camera
+on the fallback path) and starves MQTT ingestion on small hosts. The
+scheduler spreads cameras evenly across the capture interval, caps how many
+captures run at once, and backs off cameras that keep failing.
+"""
+
+import asyncio
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from loguru import logger
+
+from ..config import settings
+from ..models import CameraFrame
+from .frame_capture import capture_frame_for_camera, get_active_camera_paths
+
+# Upper bounds (seconds) of the capture latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BACKOFF_BASE_SECONDS = 30.0
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (Prometheus-style cumulative output)."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets: Dict[str, int] = {}
+        for bound, count in zip([*map(str, self.buckets), "+Inf"], self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "avg": round(self.total / self.count, 3) if self.count else None,
+            "buckets": buckets,
+        }
+
+
+@dataclass
+class CameraCaptureState:
+    """Timeout/backoff bookkeeping for one camera."""
+
+    consecutive_failures: int = 0
+    next_attempt_at: float = 0.0
+    last_success_at: Optional[float] = None
+    last_error: Optional[str] = None
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    def record_success(self, seconds: float) -> None:
+        self.latency.observe(seconds)
+        self.consecutive_failures = 0
+        self.next_attempt_at = 0.0
+        self.last_success_at = time.monotonic()
+        self.last_error = None
+
+    def record_failure(self, error: str) -> None:
+        self.consecutive_failures += 1
+        self.last_error = error
+        delay = min(
+            settings.frame_capture_max_backoff_minutes * 60,
+            BACKOFF_BASE_SECONDS * 2 ** (self.consecutive_failures - 1),
+        )
+        self.next_attempt_at = time.monotonic() + delay
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "consecutive_failures": self.consecutive_failures,
+            "backoff_remaining_seconds": round(max(0.0, self.next_attempt_at - now), 1),
+            "seconds_since_success": round(now - self.last_success_at, 1) if self.last_success_at else None,
+            "last_error": self.last_error,
+            "latency": self.latency.to_dict(),
+        }
+
+
+class CaptureScheduler:
+    """Runs capture cycles with a worker limit and evenly staggered cameras."""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or settings.frame_capture_max_workers
+        self._semaphore = asyncio.Semaphore(self.max_workers)
+        self._states: Dict[str, CameraCaptureState] = {}
+        self._latency = LatencyHistogram()
+        self._task: Optional[asyncio.Task] = None
+
+    def _state(self, camera_name: str) -> CameraCaptureState:
+        return self._states.setdefault(camera_name, CameraCaptureState())
+
+    async def capture_now(self, camera_name: str) -> Optional[CameraFrame]:
+        """Capture one camera within the worker limit and timeout, recording latency."""
+        state = self._state(camera_name)
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                frame = await asyncio.wait_for(
+                    capture_frame_for_camera(camera_name),
+                    timeout=settings.frame_capture_timeout_seconds,
+                )
+            except asyncio.TimeoutError:
+                frame, error = None, f"timed out after {settings.frame_capture_timeout_seconds}s"
+            except Exception as e:
+                frame, error = None, str(e)
+            else:
+                error = None if frame is not None else "capture failed"
+            elapsed = time.perf_counter() - started
+
+        if frame is None:
+            state.record_failure(error)
+            logger.warning(
+                f"Capture for {camera_name} failed ({error}); "
+                f"{state.consecutive_failures} consecutive failure(s)"
+            )
+        else:
+            state.record_success(elapsed)
+            self._latency.observe(elapsed)
+        return frame
+
+    async def run_cycle(self, camera_paths: List[str], spread_seconds: float = 0.0) -> Dict[str, Any]:
+        """Capture every camera once, starting them ``spread_seconds / n`` apart.
+
+        Cameras still in backoff are skipped for this cycle.
+        """
+        summary: Dict[str, Any] = {"captured": 0, "failed": 0, "skipped": 0, "cameras": []}
+        cameras = sorted(camera_paths)
+        if not cameras:
+            return summary
+
+        # Forget cameras that disappeared so their state does not linger
+        for name in [n for n in self._states if n not in cameras]:
+            del self._states[name]
+
+        now = time.monotonic()
+        due = [c for c in cameras if self._state(c).next_attempt_at <= now]
+        summary["skipped"] = len(cameras) - len(due)
+        step = spread_seconds / len(due) if due else 0.0
+
+        async def _staggered(index: int, camera_name: str) -> Optional[CameraFrame]:
+            if index and step:
+                await asyncio.sleep(index * step)
+            return await self.capture_now(camera_name)
+
+        results = await asyncio.gather(*(_staggered(i, c) for i, c in enumerate(due)))
+        for camera_name, frame in zip(due, results):
+            if frame is not None:
+                summary["captured"] += 1
+                summary["cameras"].append(camera_name)
+            else:
+                summary["failed"] += 1
+        return summary
+
+    def start(self) -> None:
+        if settings.frame_capture_enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_loop(self) -> None:
+        interval = settings.frame_capture_interval_minutes * 60
+        while True:
+            cycle_started = time.monotonic()
+            try:
+                camera_paths = await get_active_camera_paths()
+                spread = interval * settings.frame_capture_stagger_fraction
+                summary = await self.run_cycle(camera_paths, spread_seconds=spread)
+                if camera_paths:
+                    logger.info(
+                        f"Frame capture cycle: {summary['captured']} captured, "
+                        f"{summary['failed']} failed, {summary['skipped']} in backoff"
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in capture scheduler: {e}")
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - cycle_started)))
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.frame_capture_enabled,
+            "max_workers": self.max_workers,
+            "interval_minutes": settings.frame_capture_interval_minutes,
+            "latency": self._latency.to_dict(),
+            "cameras": {name: state.to_dict() for name, state in sorted(self._states.items())},
+        }
+
+
+capture_scheduler = CaptureScheduler()
+
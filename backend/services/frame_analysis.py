@@ -0,0 +1,83 @@
+"""Persistence helpers for vision analysis of stored camera frames."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import List, Optional
+
+from loguru import logger
+from sqlalchemy import select
+
+from ..database import AsyncSessionLocal
+from ..models import CameraFrame, CameraFrameAnalysis
+from ..utils.time import utc_now
+
+
+async def list_unanalyzed_frames(
+    limit: int = 20,
+    since: Optional[datetime] = None,
+) -> List[CameraFrame]:
+    """Return frames still waiting for vision analysis, newest first."""
+    query = select(CameraFrame).where(CameraFrame.analyzed_at.is_(None))
+    if since is not None:
+        query = query.where(CameraFrame.timestamp >= since)
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            query.order_by(CameraFrame.timestamp.desc()).limit(limit)
+        )
+        return list(result.scalars().all())
+
+
+async def get_frame_analysis(
+    frame_id: int,
+    content_hash: Optional[str] = None,
+) -> Optional[CameraFrame]:
+    """Return an analyzed frame matching the id, or any frame with identical content.
+
+    Identical bytes (e.g. a static night-time camera) produce identical
+    descriptions, so a hash match on another frame is reused as-is.
+    """
+    async with AsyncSessionLocal() as db:
+        frame = await db.get(CameraFrame, frame_id)
+        if frame is not None and frame.analyzed_at is not None:
+            return frame
+
+        lookup_hash = content_hash or (frame.content_hash if frame is not None else None)
+        if not lookup_hash:
+            return None
+
+        result = await db.execute(
+            select(CameraFrame)
+            .where(CameraFrame.content_hash == lookup_hash)
+            .where(CameraFrame.analyzed_at.is_not(None))
+            .order_by(CameraFrame.analyzed_at.desc())
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+
+
+async def save_frame_analysis(
+    frame_id: int,
+    analysis: CameraFrameAnalysis,
+) -> Optional[CameraFrame]:
+    """Store a vision description on a frame. Returns None if the frame is gone."""
+    async with AsyncSessionLocal() as db:
+        frame = await db.get(CameraFrame, frame_id)
+        if frame is None:
+            return None
+
+        frame.analyzed_at = utc_now()
+        frame.analysis_model = analysis.analysis_model
+        frame.notes = analysis.notes
+        if analysis.detected_objects is not None:
+            frame.detected_objects = analysis.detected_objects
+        if analysis.plant_health_score is not None:
+            frame.plant_health_score = analysis.plant_health_score
+        if analysis.anomaly_detected is not None:
+            frame.anomaly_detected = analysis.anomaly_detected
+
+        await db.commit()
+        await db.refresh(frame)
+        logger.debug(f"Stored {analysis.analysis_model} analysis for frame {frame_id}")
+        return frame
@@ -1,18 +1,22 @@
 """Frame capture service for capturing and storing images from MediaMTX streams."""
 
 import asyncio
+import io
 import os
-from datetime import timedelta
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
 
-import httpx
 from loguru import logger
-from sqlalchemy import delete, select
 
 from ..config import settings
 from ..database import AsyncSessionLocal
 from ..models import CameraFrame
 from ..utils.time import utc_now
+from .camera_registry import camera_registry
+from .frame_grabber import grabber_manager
+from .frame_index import frame_index
+from .frame_store import StoredFrame, blob_relative_path, frame_store, hash_frame, write_blob
 
 
 def get_mediamtx_rtsp_url(path_name: str) -> str:
@@ -23,38 +27,10 @@ def get_mediamtx_rtsp_url(path_name: str) -> str:
 
 async def get_active_camera_paths() -> List[str]:
     """
-    Get list of active camera paths from MediaMTX API.
+    Get list of ready camera paths from the camera registry's cached MediaMTX list.
     Returns list of path names (e.g. ['camera_1', 'camera_2']).
     """
-    camera_paths = []
-    try:
-        mediamtx_api_url = f"http://{settings.mediamtx_host}:{settings.mediamtx_api_port}"
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            # Try v3 API first, fall back to v2
-            response = await client.get(f"{mediamtx_api_url}/v3/paths/list")
-
-            if response.status_code == 404:
-                response = await client.get(f"{mediamtx_api_url}/v2/paths/list")
-
-            if response.status_code != 200:
-                logger.warning(f"MediaMTX API returned status {response.status_code}")
-                return camera_paths
-
-            data = response.json()
-            items = data.get("items", []) if isinstance(data, dict) else data
-
-            for item in items:
-                path_name = item.get("name") or item.get("path") or ""
-                is_ready = item.get("ready", False)
-
-                # Skip system paths and non-ready cameras
-                if path_name and not path_name.startswith("_") and is_ready:
-                    camera_paths.append(path_name)
-
-    except Exception as e:
-        logger.error(f"Failed to get camera paths from MediaMTX: {e}")
-
-    return camera_paths
+    return await camera_registry.active_paths()
 
 
 async def capture_single_frame(
@@ -101,6 +77,7 @@ async def capture_single_frame(
         output_path
     ])
 
+    process = None
     try:
         # Execute FFmpeg with timeout
         process = await asyncio.create_subprocess_exec(
@@ -156,14 +133,96 @@ async def capture_single_frame(
 
     except asyncio.TimeoutError:
         logger.error(f"Timeout capturing frame for {camera_name}")
-        try:
-            process.kill()
-        except Exception:
-            pass
         return None
     except Exception as e:
         logger.error(f"Error capturing frame for {camera_name}: {e}")
         return None
+    finally:
+        # Also on cancellation (e.g. the scheduler's own timeout), so ffmpeg is never orphaned
+        if process is not None and process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+
+
+# Image sizes served by the camera image endpoints, smallest first
+FRAME_SIZES = ("thumb", "medium", "full")
+
+
+def derivative_path(path: str, size: str) -> str:
+    """Path of a frame's resized copy, e.g. ``cam_12-00-00.thumb.webp``."""
+    if size == "full":
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{size}{ext}"
+
+
+# (stored path, requested size) -> (file served, its size). Frame files never
+# change once written, so only a deleted blob makes an entry stale.
+_resolved_files: "OrderedDict[Tuple[str, str], Tuple[str, str]]" = OrderedDict()
+RESOLVED_FILES_MAX = 4096
+
+
+def _first_existing(relative_path: str, size: str) -> Optional[Tuple[str, str]]:
+    full_path = os.path.join("/app", relative_path)
+    for candidate in FRAME_SIZES[FRAME_SIZES.index(size):]:
+        path = derivative_path(full_path, candidate)
+        if os.path.exists(path):
+            return path, candidate
+    return None
+
+
+async def resolve_frame_file(relative_path: str, size: str) -> Optional[Tuple[str, str]]:
+    """(path, size) of the file to serve for ``size``, falling back to the next larger one.
+
+    The disk is checked (off the event loop) the first time a frame and size
+    are requested; later requests are answered from memory.
+    """
+    key = (relative_path, size)
+    resolved = _resolved_files.get(key)
+    if resolved is not None:
+        _resolved_files.move_to_end(key)
+        return resolved
+    resolved = await asyncio.to_thread(_first_existing, relative_path, size)
+    if resolved is not None:
+        _resolved_files[key] = resolved
+        if len(_resolved_files) > RESOLVED_FILES_MAX:
+            _resolved_files.popitem(last=False)
+    return resolved
+
+
+def forget_resolved_files(relative_path: str) -> None:
+    """Drop cached lookups for a blob that cleanup deleted."""
+    for size in FRAME_SIZES:
+        _resolved_files.pop((relative_path, size), None)
+
+
+def generate_frame_derivatives(full_path: str, data: Optional[bytes] = None) -> List[str]:
+    """Write medium and thumbnail WebP copies next to a captured frame.
+
+    Sizes at or above the original width are skipped; the endpoints fall back
+    to the next larger file. Runs in a worker thread. Returns written sizes.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return []
+
+    written: List[str] = []
+    with Image.open(io.BytesIO(data) if data is not None else full_path) as original:
+        image = original.copy()
+
+    # Largest first so each step downsamples the previous (cheaper) result
+    for size, width in (("medium", settings.frame_medium_width), ("thumb", settings.frame_thumbnail_width)):
+        if width <= 0 or image.width <= width:
+            continue
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.Resampling.LANCZOS)
+        image.save(derivative_path(full_path, size), format="WEBP", quality=settings.frame_derivative_quality)
+        written.append(size)
+    return written
 
 
 async def save_frame_to_db(
@@ -172,6 +231,8 @@ async def save_frame_to_db(
     file_size: Optional[int] = None,
     width: Optional[int] = None,
     height: Optional[int] = None,
+    content_hash: Optional[str] = None,
+    perceptual_hash: Optional[str] = None,
 ) -> Optional[CameraFrame]:
     """Save frame metadata to database."""
     try:
@@ -183,10 +244,13 @@ async def save_frame_to_db(
                 file_size=file_size,
                 width=width,
                 height=height,
+                content_hash=content_hash,
+                perceptual_hash=perceptual_hash,
             )
             db.add(frame)
             await db.commit()
             await db.refresh(frame)
+            frame_index.add(device_key, frame.timestamp, frame.id)
             logger.info(f"Saved frame metadata for {device_key}: {file_path}")
             return frame
     except Exception as e:
@@ -194,6 +258,49 @@ async def save_frame_to_db(
         return None
 
 
+async def store_frame(
+    camera_name: str,
+    data: bytes,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+) -> StoredFrame:
+    """Put frame bytes in the content-addressed store, or link to a near-duplicate."""
+    content_hash, phash = await asyncio.to_thread(hash_frame, data)
+
+    previous = await frame_store.match_previous(camera_name, phash)
+    if previous is not None:
+        logger.debug(f"Frame for {camera_name} matches previous image; linking instead of writing")
+        return replace(previous, deduplicated=True, new_blob=False)
+
+    relative_path = blob_relative_path(content_hash)
+    written = await asyncio.to_thread(write_blob, data, relative_path)
+    if written:
+        full_path = os.path.join("/app", relative_path)
+        try:
+            await asyncio.to_thread(generate_frame_derivatives, full_path, data)
+        except Exception as e:
+            logger.warning(f"Failed to create resized copies of {full_path}: {e}")
+
+    stored = StoredFrame(
+        relative_path=relative_path,
+        content_hash=content_hash,
+        perceptual_hash=phash,
+        file_size=len(data),
+        width=width,
+        height=height,
+        new_blob=written,
+    )
+    frame_store.remember(camera_name, stored)
+    return stored
+
+
+def _read_and_remove(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        data = f.read()
+    os.remove(path)
+    return data
+
+
 async def capture_frame_for_camera(camera_name: str) -> Optional[CameraFrame]:
     """
     Capture a single frame for a camera and save to database.
@@ -204,131 +311,41 @@ async def capture_frame_for_camera(camera_name: str) -> Optional[CameraFrame]:
     Returns:
         CameraFrame record or None on failure
     """
-    # Generate output path with timestamp
-    now = utc_now()
-    date_dir = now.strftime("%Y-%m-%d")
-    timestamp_str = now.strftime("%H-%M-%S")
-
-    # Use relative path for storage (relative to app root)
-    relative_path = f"data/camera_frames/{date_dir}/{camera_name}_{timestamp_str}.webp"
-
-    # Full filesystem path
-    full_path = os.path.join("/app", relative_path)
-
-    # Capture the frame
-    capture_info = await capture_single_frame(camera_name, full_path)
+    # Prefer the persistent grabber's in-memory frame over spawning ffmpeg
+    grabbed = await grabber_manager.grab(camera_name)
+    if grabbed is not None:
+        data, width, height = grabbed.data, grabbed.width, grabbed.height
+    else:
+        now = utc_now()
+        temp_path = os.path.join(
+            settings.frame_storage_path, "tmp", f"{camera_name}_{now.strftime('%Y%m%d%H%M%S%f')}.webp"
+        )
+        capture_info = await capture_single_frame(camera_name, temp_path)
+        if capture_info is None:
+            return None
+        try:
+            data = await asyncio.to_thread(_read_and_remove, temp_path)
+        except OSError as e:
+            logger.error(f"Failed to read captured frame {temp_path}: {e}")
+            return None
+        width, height = capture_info.get('width'), capture_info.get('height')
 
-    if capture_info is None:
+    try:
+        stored = await store_frame(camera_name, data, width, height)
+    except OSError as e:
+        logger.error(f"Failed to store frame for {camera_name}: {e}")
         return None
 
     # Save to database
     frame = await save_frame_to_db(
         device_key=camera_name,
-        file_path=relative_path,
-        file_size=capture_info.get('file_size'),
-        width=capture_info.get('width'),
-        height=capture_info.get('height'),
+        file_path=stored.relative_path,
+        file_size=stored.file_size,
+        width=stored.width,
+        height=stored.height,
+        content_hash=stored.content_hash,
+        perceptual_hash=stored.perceptual_hash,
     )
 
     return frame
 
-
-async def capture_all_cameras() -> Dict[str, any]:
-    """
-    Capture frames from all active cameras.
-
-    Returns:
-        Summary dict with capture statistics
-    """
-    if not settings.frame_capture_enabled:
-        logger.debug("Frame capture is disabled")
-        return {"captured": 0, "failed": 0, "skipped": 0}
-
-    summary = {
-        "captured": 0,
-        "failed": 0,
-        "cameras": [],
-    }
-
-    try:
-        # Get active cameras from MediaMTX
-        camera_paths = await get_active_camera_paths()
-
-        if not camera_paths:
-            logger.debug("No active cameras found")
-            return summary
-
-        logger.info(f"Capturing frames for {len(camera_paths)} cameras")
-
-        # Capture frames concurrently
-        tasks = [capture_frame_for_camera(camera) for camera in camera_paths]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        for camera_name, result in zip(camera_paths, results):
-            if isinstance(result, Exception):
-                logger.error(f"Exception capturing {camera_name}: {result}")
-                summary["failed"] += 1
-            elif result is not None:
-                summary["captured"] += 1
-                summary["cameras"].append(camera_name)
-            else:
-                summary["failed"] += 1
-
-        logger.info(
-            f"Frame capture complete: {summary['captured']} captured, "
-            f"{summary['failed']} failed"
-        )
-
-    except Exception as e:
-        logger.error(f"Error in capture_all_cameras: {e}")
-
-    return summary
-
-
-async def cleanup_old_frames():
-    """
-    Delete old frames based on retention policy.
-    Removes both database records and files from disk.
-    """
-    if settings.frame_retention_days <= 0:
-        return  # Retention disabled
-
-    try:
-        cutoff = utc_now() - timedelta(days=settings.frame_retention_days)
-
-        async with AsyncSessionLocal() as db:
-            # Get old frames to delete
-            result = await db.execute(
-                select(CameraFrame).where(CameraFrame.timestamp < cutoff)
-            )
-            old_frames = result.scalars().all()
-
-            if not old_frames:
-                return
-
-            logger.info(f"Cleaning up {len(old_frames)} old frames")
-
-            # Delete files from disk
-            deleted_files = 0
-            for frame in old_frames:
-                try:
-                    full_path = os.path.join("/app", frame.file_path)
-                    if os.path.exists(full_path):
-                        os.remove(full_path)
-                        deleted_files += 1
-                except Exception as e:
-                    logger.warning(f"Failed to delete file {frame.file_path}: {e}")
-
-            # Delete from database
-            await db.execute(
-                delete(CameraFrame).where(CameraFrame.timestamp < cutoff)
-            )
-            await db.commit()
-
-            logger.info(
-                f"Cleanup complete: {deleted_files} files deleted, "
-                f"{len(old_frames)} database records removed"
-            )
-
-    except Exception as e:
-        logger.error(f"Error cleaning up old frames: {e}")
@@ -0,0 +1,297 @@
+"""Long-lived FFmpeg frame grabbers, one per active MediaMTX camera.
+
+Spawning ``ffmpeg`` per capture pays a full RTSP handshake and a keyframe
+wait every time. Instead each camera keeps one FFmpeg process open that
+decodes keyframes only and emits a WebP image on stdout at a low rate.
+The newest image is held in memory so a capture is just a file write.
+
+A supervisor task keeps the set of grabbers in line with the cameras
+MediaMTX reports and restarts grabbers whose process exits or stalls.
+
+Requires FFmpeg 5.1 or newer (``-fps_mode``; older builds only know the
+deprecated ``-vsync``).
+"""
+
+import asyncio
+import struct
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from ..config import settings
+from ..utils.time import utc_now
+
+# RIFF header: b"RIFF" + little-endian chunk size + b"WEBP"
+_RIFF_HEADER = struct.Struct("<4sI")
+
+
+@dataclass
+class GrabbedFrame:
+    """Most recent image emitted by a grabber."""
+
+    data: bytes
+    captured_at: datetime
+    monotonic_at: float
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+    @property
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.monotonic_at
+
+
+def webp_dimensions(data: bytes) -> Tuple[Optional[int], Optional[int]]:
+    """Read width/height from a WebP header without decoding the image."""
+    if len(data) < 30 or data[:4] != b"RIFF" or data[8:12] != b"WEBP":
+        return None, None
+
+    chunk = data[12:16]
+    if chunk == b"VP8X":
+        width = 1 + int.from_bytes(data[24:27], "little")
+        height = 1 + int.from_bytes(data[27:30], "little")
+        return width, height
+    if chunk == b"VP8L":
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8 ":
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    return None, None
+
+
+class FrameGrabber:
+    """Keeps one FFmpeg process reading a camera and remembers its latest frame."""
+
+    def __init__(self, camera_name: str, rtsp_url: str):
+        self.camera_name = camera_name
+        self.rtsp_url = rtsp_url
+        self.restarts = 0
+        self.frames_received = 0
+        self.last_error: Optional[str] = None
+        self._latest: Optional[GrabbedFrame] = None
+        self._frame_event = asyncio.Event()
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stderr_tail: Deque[str] = deque(maxlen=20)
+
+    def build_command(self) -> List[str]:
+        """FFmpeg command decoding keyframes only and emitting WebP images to stdout."""
+        filters = [f"fps={settings.frame_grabber_fps}"]
+        if settings.frame_max_width > 0:
+            filters.append(f"scale={settings.frame_max_width}:-1")
+
+        return [
+            'ffmpeg',
+            '-loglevel', 'error',
+            '-rtsp_transport', 'tcp',
+            '-skip_frame', 'nokey',  # Skip decoding of non-keyframes entirely
+            '-i', self.rtsp_url,
+            '-an',
+            '-vf', ','.join(filters),
+            '-fps_mode', 'vfr',
+            '-q:v', str(settings.frame_quality),
+            '-c:v', 'libwebp',
+            '-f', 'image2pipe',
+            'pipe:1',
+        ]
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def latest(self, max_age_seconds: Optional[float] = None) -> Optional[GrabbedFrame]:
+        frame = self._latest
+        if frame is None:
+            return None
+        if max_age_seconds is not None and frame.age_seconds > max_age_seconds:
+            return None
+        return frame
+
+    async def wait_for_frame(self, timeout: float) -> Optional[GrabbedFrame]:
+        """Wait up to ``timeout`` seconds for the next frame."""
+        self._frame_event.clear()
+        try:
+            await asyncio.wait_for(self._frame_event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self._latest
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.create_task(self._supervise())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._kill()
+
+    async def _supervise(self) -> None:
+        backoff = 1.0
+        while True:
+            started = time.monotonic()
+            try:
+                await self._run_process()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+
+            # A grabber that ran for a while earns a fresh backoff
+            if time.monotonic() - started > settings.frame_grabber_stall_seconds:
+                backoff = 1.0
+            self.restarts += 1
+            tail = " | ".join(self._stderr_tail) or self.last_error or "process exited"
+            logger.warning(f"Frame grabber for {self.camera_name} stopped ({tail}); restarting in {backoff:.0f}s")
+            await asyncio.sleep(backoff)
+            backoff = min(settings.frame_grabber_max_backoff_seconds, backoff * 2)
+
+    async def _run_process(self) -> None:
+        self._stderr_tail.clear()
+        self._process = await asyncio.create_subprocess_exec(
+            *self.build_command(),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stderr_task = asyncio.create_task(self._drain_stderr(self._process.stderr))
+        logger.info(f"Started frame grabber for {self.camera_name} (pid {self._process.pid})")
+
+        try:
+            await self._read_frames(self._process.stdout)
+        except asyncio.TimeoutError:
+            self.last_error = f"no frame for {settings.frame_grabber_stall_seconds}s"
+        except asyncio.IncompleteReadError:
+            self.last_error = "stream ended"
+        finally:
+            await self._kill()
+            stderr_task.cancel()
+
+    async def _read_frames(self, stdout: asyncio.StreamReader) -> None:
+        stall = settings.frame_grabber_stall_seconds
+        while True:
+            header = await asyncio.wait_for(stdout.readexactly(_RIFF_HEADER.size), timeout=stall)
+            magic, size = _RIFF_HEADER.unpack(header)
+            if magic != b"RIFF":
+                raise RuntimeError("unexpected data on ffmpeg stdout")
+            body = await asyncio.wait_for(stdout.readexactly(size), timeout=stall)
+            data = header + body
+            width, height = webp_dimensions(data)
+            self._latest = GrabbedFrame(
+                data=data,
+                captured_at=utc_now(),
+                monotonic_at=time.monotonic(),
+                width=width,
+                height=height,
+            )
+            self.frames_received += 1
+            self.last_error = None
+            self._frame_event.set()
+
+    async def _drain_stderr(self, stderr: asyncio.StreamReader) -> None:
+        while True:
+            line = await stderr.readline()
+            if not line:
+                return
+            self._stderr_tail.append(line.decode(errors="replace").strip())
+
+    async def _kill(self) -> None:
+        process, self._process = self._process, None
+        if process is None or process.returncode is not None:
+            return
+        try:
+            process.kill()
+        except ProcessLookupError:
+            return
+        await process.wait()
+
+    def status(self) -> Dict[str, Any]:
+        frame = self._latest
+        return {
+            "camera": self.camera_name,
+            "running": self.running,
+            "restarts": self.restarts,
+            "frames_received": self.frames_received,
+            "last_frame_at": frame.captured_at.isoformat() if frame else None,
+            "last_frame_age_seconds": round(frame.age_seconds, 1) if frame else None,
+            "last_error": self.last_error,
+        }
+
+
+class FrameGrabberManager:
+    """Starts/stops grabbers to match the active camera list."""
+
+    def __init__(self):
+        self._grabbers: Dict[str, FrameGrabber] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.frame_capture_enabled and settings.frame_grabber_enabled
+
+    def get(self, camera_name: str) -> Optional[FrameGrabber]:
+        return self._grabbers.get(camera_name)
+
+    async def sync(self, camera_paths: Iterable[str]) -> None:
+        """Start grabbers for new cameras and stop those no longer published."""
+        from .frame_capture import get_mediamtx_rtsp_url
+
+        wanted = set(camera_paths)
+        for name in [n for n in self._grabbers if n not in wanted]:
+            logger.info(f"Stopping frame grabber for {name}")
+            await self._grabbers.pop(name).stop()
+        for name in wanted:
+            grabber = self._grabbers.get(name)
+            if grabber is None:
+                grabber = self._grabbers[name] = FrameGrabber(name, get_mediamtx_rtsp_url(name))
+            grabber.start()
+
+    async def grab(self, camera_name: str) -> Optional[GrabbedFrame]:
+        """Latest fresh frame for a camera, waiting briefly for a just-started grabber."""
+        grabber = self._grabbers.get(camera_name)
+        if grabber is None:
+            return None
+        frame = grabber.latest(max_age_seconds=settings.frame_grabber_max_frame_age_seconds)
+        if frame is None and grabber.running and grabber.frames_received == 0:
+            frame = await grabber.wait_for_frame(timeout=settings.frame_grabber_startup_wait_seconds)
+        return frame
+
+    def start(self) -> None:
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._supervise())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.sync([])
+
+    async def _supervise(self) -> None:
+        from .frame_capture import get_active_camera_paths
+
+        while True:
+            try:
+                await self.sync(await get_active_camera_paths())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Frame grabber supervisor error: {e}")
+            await asyncio.sleep(settings.sensor_heartbeat_interval)
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [grabber.status() for grabber in self._grabbers.values()]
+
+
+grabber_manager = FrameGrabberManager()
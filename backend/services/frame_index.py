@@ -0,0 +1,163 @@
+"""In-memory per-camera index of frame timestamps for nearest-frame lookups.
+
+Each camera's frames are loaded once (id + timestamp only) into sorted lists;
+lookups are then a bisect instead of an ORDER BY ... LIMIT 1 query. Frames
+saved by this process are added as they are captured and retention cleanup
+trims the index, so it stays in step with the table without re-querying.
+"""
+
+import asyncio
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+
+from ..database import AsyncSessionLocal
+from ..models import CameraFrame
+from ..utils.time import ensure_utc
+
+DIRECTIONS = ("before", "after", "closest")
+
+
+class _CameraFrames:
+    __slots__ = ("timestamps", "ids")
+
+    def __init__(self, rows: Sequence[Tuple[float, int]] = ()):
+        self.timestamps: List[float] = [ts for ts, _ in rows]
+        self.ids: List[int] = [frame_id for _, frame_id in rows]
+
+    def add(self, ts: float, frame_id: int) -> None:
+        if not self.timestamps or ts >= self.timestamps[-1]:
+            # Captures arrive in time order, so this is the common path
+            self.timestamps.append(ts)
+            self.ids.append(frame_id)
+            return
+        position = bisect_right(self.timestamps, ts)
+        self.timestamps.insert(position, ts)
+        self.ids.insert(position, frame_id)
+
+    def trim_before(self, ts: float) -> None:
+        cut = bisect_left(self.timestamps, ts)
+        if cut:
+            del self.timestamps[:cut]
+            del self.ids[:cut]
+
+    def nearest(self, ts: float, direction: str) -> Optional[int]:
+        """Position of the frame nearest ``ts`` in the given direction, or None."""
+        if not self.timestamps:
+            return None
+        if direction == "before":
+            position = bisect_right(self.timestamps, ts) - 1
+            return position if position >= 0 else None
+        if direction == "after":
+            position = bisect_left(self.timestamps, ts)
+            return position if position < len(self.timestamps) else None
+
+        position = bisect_left(self.timestamps, ts)
+        if position == 0:
+            return 0
+        if position == len(self.timestamps):
+            return position - 1
+        before, after = self.timestamps[position - 1], self.timestamps[position]
+        return position - 1 if ts - before <= after - ts else position
+
+
+class FrameIndex:
+    """Lazily loaded, per-camera sorted frame index."""
+
+    def __init__(self):
+        self._cameras: Dict[str, _CameraFrames] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Frames saved while a camera's initial SELECT is in flight; the
+        # query may or may not have seen them, so they are merged afterwards
+        self._pending: Dict[str, List[Tuple[float, int]]] = {}
+
+    async def _load(self, device_key: str) -> _CameraFrames:
+        frames = self._cameras.get(device_key)
+        if frames is not None:
+            return frames
+
+        lock = self._locks.setdefault(device_key, asyncio.Lock())
+        async with lock:
+            frames = self._cameras.get(device_key)
+            if frames is None:
+                pending = self._pending[device_key] = []
+                try:
+                    async with AsyncSessionLocal() as db:
+                        result = await db.execute(
+                            select(CameraFrame.timestamp, CameraFrame.id)
+                            .where(CameraFrame.device_key == device_key)
+                            .order_by(CameraFrame.timestamp.asc())
+                        )
+                        rows = [(ensure_utc(ts).timestamp(), frame_id) for ts, frame_id in result.all()]
+                finally:
+                    del self._pending[device_key]
+                frames = _CameraFrames(rows)
+                loaded = set(frames.ids)
+                for ts, frame_id in pending:
+                    if frame_id not in loaded:
+                        frames.add(ts, frame_id)
+                self._cameras[device_key] = frames
+        return frames
+
+    def add(self, device_key: str, timestamp: datetime, frame_id: int) -> None:
+        """Record a newly saved frame (no-op until the camera's index is first used)."""
+        ts = ensure_utc(timestamp).timestamp()
+        frames = self._cameras.get(device_key)
+        if frames is not None:
+            frames.add(ts, frame_id)
+        elif device_key in self._pending:
+            self._pending[device_key].append((ts, frame_id))
+
+    def trim_before(self, cutoff: datetime) -> None:
+        """Drop frames older than ``cutoff`` from every loaded camera."""
+        ts = ensure_utc(cutoff).timestamp()
+        for frames in self._cameras.values():
+            frames.trim_before(ts)
+
+    def invalidate(self, device_key: Optional[str] = None) -> None:
+        if device_key is None:
+            self._cameras.clear()
+        else:
+            self._cameras.pop(device_key, None)
+
+    async def nearest_ids(
+        self,
+        device_key: str,
+        targets: Sequence[datetime],
+        direction: str = "before",
+    ) -> List[Optional[int]]:
+        """Frame id nearest each target time (None where no frame qualifies)."""
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {DIRECTIONS}")
+        frames = await self._load(device_key)
+        ids: List[Optional[int]] = []
+        for target in targets:
+            position = frames.nearest(ensure_utc(target).timestamp(), direction)
+            ids.append(frames.ids[position] if position is not None else None)
+        return ids
+
+    async def nearest_frames(
+        self,
+        device_key: str,
+        targets: Sequence[datetime],
+        direction: str = "before",
+    ) -> List[Optional[CameraFrame]]:
+        """Like ``nearest_ids`` but loads the rows with one primary-key query."""
+        ids = await self.nearest_ids(device_key, targets, direction)
+        wanted = {frame_id for frame_id in ids if frame_id is not None}
+        if not wanted:
+            return [None] * len(ids)
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(CameraFrame).where(CameraFrame.id.in_(wanted)))
+            rows = {frame.id: frame for frame in result.scalars().all()}
+
+        if len(rows) < len(wanted):
+            # Rows deleted behind our back (e.g. by another process); reload next time
+            self.invalidate(device_key)
+        return [rows.get(frame_id) if frame_id is not None else None for frame_id in ids]
+
+
+frame_index = FrameIndex()
@@ -0,0 +1,203 @@
+"""Chunked frame retention cleanup that runs in the background.
+
+Expired rows are paged through by id, ``frame_cleanup_batch_size`` at a time.
+Each batch is deleted and committed on its own, then the files no other row
+references are removed in a worker thread, so a large backlog never holds a
+long transaction or blocks the event loop. Legacy per-day directories
+(``data/camera_frames/YYYY-MM-DD``) that are entirely past the cutoff are
+removed with one ``rmtree`` each instead of file by file.
+"""
+
+import asyncio
+import os
+import re
+import shutil
+from contextlib import suppress
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from loguru import logger
+from sqlalchemy import delete, select
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..models import CameraFrame
+from ..utils.time import utc_now
+from .frame_capture import derivative_path, forget_resolved_files
+from .frame_index import frame_index
+from .frame_store import frame_store
+
+_DATE_DIR = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+@dataclass
+class CleanupProgress:
+    """State of the current (or last) cleanup run."""
+
+    running: bool = False
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    cutoff: Optional[datetime] = None
+    batches: int = 0
+    rows_deleted: int = 0
+    files_deleted: int = 0
+    directories_deleted: int = 0
+    last_error: Optional[str] = None
+
+    def reset(self, cutoff: datetime) -> None:
+        self.__dict__.update(asdict(CleanupProgress()))
+        self.running, self.started_at, self.cutoff = True, utc_now(), cutoff
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        for key in ("started_at", "finished_at", "cutoff"):
+            if data[key] is not None:
+                data[key] = data[key].isoformat()
+        return data
+
+
+cleanup_progress = CleanupProgress()
+_cleanup_task: Optional[asyncio.Task] = None
+
+
+def _expired_date_dir(relative_path: str, cutoff_date: date) -> bool:
+    """True if the path lives in a legacy day directory older than the cutoff day."""
+    parts = relative_path.split("/")
+    if len(parts) < 2 or not _DATE_DIR.match(parts[-2]):
+        return False
+    try:
+        return date.fromisoformat(parts[-2]) < cutoff_date
+    except ValueError:
+        return False
+
+
+def _delete_frame_files(relative_paths: Iterable[str]) -> int:
+    """Remove frames and their resized copies; runs in a worker thread."""
+    deleted = 0
+    for relative_path in relative_paths:
+        full_path = os.path.join("/app", relative_path)
+        try:
+            os.remove(full_path)
+            deleted += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to delete file {relative_path}: {e}")
+        for size in ("thumb", "medium"):
+            with suppress(OSError):
+                os.remove(derivative_path(full_path, size))
+    return deleted
+
+
+def _remove_expired_date_dirs(cutoff_date: date) -> int:
+    """Remove whole legacy day directories older than the cutoff day."""
+    try:
+        names = os.listdir(settings.frame_storage_path)
+    except FileNotFoundError:
+        return 0
+
+    removed = 0
+    for name in names:
+        if not _DATE_DIR.match(name):
+            continue
+        try:
+            expired = date.fromisoformat(name) < cutoff_date
+        except ValueError:
+            continue
+        if expired:
+            shutil.rmtree(os.path.join(settings.frame_storage_path, name), ignore_errors=True)
+            removed += 1
+    return removed
+
+
+async def _delete_batch(cutoff: datetime, batch_size: int) -> Optional[List[str]]:
+    """Delete one page of expired rows; returns files no longer referenced, or None when done."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(CameraFrame.id, CameraFrame.file_path)
+            .where(CameraFrame.timestamp < cutoff)
+            .order_by(CameraFrame.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            return None
+
+        ids = [frame_id for frame_id, _ in rows]
+        candidate_paths = {file_path for _, file_path in rows}
+        await db.execute(delete(CameraFrame).where(CameraFrame.id.in_(ids)))
+        await db.commit()
+
+        # Deduplicated frames share one file; keep files newer rows still use
+        result = await db.execute(
+            select(CameraFrame.file_path).where(CameraFrame.file_path.in_(candidate_paths)).distinct()
+        )
+        orphaned = candidate_paths - set(result.scalars().all())
+
+    cleanup_progress.rows_deleted += len(ids)
+    return sorted(orphaned)
+
+
+async def cleanup_old_frames(batch_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Delete frames older than the retention period, one committed batch at a time.
+    Removes both database records and files from disk. Returns the final progress.
+    """
+    if settings.frame_retention_days <= 0:
+        return cleanup_progress.to_dict()  # Retention disabled
+
+    batch_size = batch_size or settings.frame_cleanup_batch_size
+    cutoff = utc_now() - timedelta(days=settings.frame_retention_days)
+    cutoff_date = cutoff.date()
+
+    cleanup_progress.reset(cutoff)
+    try:
+        while True:
+            orphaned = await _delete_batch(cutoff, batch_size)
+            if orphaned is None:
+                break
+            frame_index.trim_before(cutoff)
+            for file_path in orphaned:
+                frame_store.forget(file_path)
+                forget_resolved_files(file_path)
+
+            # Files in expired day directories go with the directory at the end
+            to_remove = [p for p in orphaned if not _expired_date_dir(p, cutoff_date)]
+            if to_remove:
+                cleanup_progress.files_deleted += await asyncio.to_thread(_delete_frame_files, to_remove)
+            cleanup_progress.batches += 1
+            await asyncio.sleep(0)  # Let API requests and MQTT ingestion run between batches
+
+        cleanup_progress.directories_deleted = await asyncio.to_thread(_remove_expired_date_dirs, cutoff_date)
+        if cleanup_progress.rows_deleted or cleanup_progress.directories_deleted:
+            logger.info(
+                f"Cleanup complete: {cleanup_progress.rows_deleted} database records removed in "
+                f"{cleanup_progress.batches} batches, {cleanup_progress.files_deleted} files and "
+                f"{cleanup_progress.directories_deleted} day directories deleted"
+            )
+    except Exception as e:
+        cleanup_progress.last_error = str(e)
+        logger.error(f"Error cleaning up old frames: {e}")
+    finally:
+        cleanup_progress.running = False
+        cleanup_progress.finished_at = utc_now()
+    return cleanup_progress.to_dict()
+
+
+def start_frame_cleanup() -> bool:
+    """Run cleanup as a background task unless one is already running."""
+    global _cleanup_task
+    if _cleanup_task is not None and not _cleanup_task.done():
+        return False
+    _cleanup_task = asyncio.create_task(cleanup_old_frames())
+    return True
+
+
+async def stop_frame_cleanup() -> None:
+    global _cleanup_task
+    if _cleanup_task is not None:
+        _cleanup_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await _cleanup_task
+        _cleanup_task = None
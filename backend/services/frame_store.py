@@ -0,0 +1,144 @@
+"""Content-addressed storage for captured frames with near-duplicate detection.
+
+Frame images are written once per distinct content to
+``data/camera_frames/blobs/<aa>/<sha256>.webp``. A capture whose perceptual
+hash is within ``frame_dedupe_max_distance`` bits of the camera's last stored
+blob is not written at all: its row links to that blob instead. Night-time
+and static cameras therefore cost one row per capture rather than one file.
+Blobs are reference-counted by ``CameraFrame.file_path`` during cleanup.
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..models import CameraFrame
+
+BLOB_DIR = "data/camera_frames/blobs"
+
+
+@dataclass
+class StoredFrame:
+    """Where a capture's bytes live and what identifies them."""
+
+    relative_path: str
+    content_hash: str
+    perceptual_hash: Optional[str]
+    file_size: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+    deduplicated: bool = False
+    new_blob: bool = False
+
+
+def perceptual_hash(data: bytes) -> Optional[str]:
+    """64-bit difference hash (dHash) as 16 hex chars; None without Pillow."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            small = image.convert("L").resize((9, 8), Image.Resampling.BILINEAR)
+    except Exception:
+        return None
+
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:016x}"
+
+
+def hash_frame(data: bytes) -> Tuple[str, Optional[str]]:
+    """(sha256 hex, perceptual hash) of a frame; CPU-bound, run in a thread."""
+    return hashlib.sha256(data).hexdigest(), perceptual_hash(data)
+
+
+def hamming_distance(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def blob_relative_path(content_hash: str) -> str:
+    return f"{BLOB_DIR}/{content_hash[:2]}/{content_hash}.webp"
+
+
+def write_blob(data: bytes, relative_path: str) -> bool:
+    """Write a blob atomically unless it already exists. Returns True if written."""
+    full_path = os.path.join("/app", relative_path)
+    if os.path.exists(full_path):
+        return False
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    partial = f"{full_path}.partial"
+    with open(partial, "wb") as f:
+        f.write(data)
+    os.replace(partial, full_path)
+    return True
+
+
+class FrameStore:
+    """Tracks each camera's last stored blob so near-duplicates can link to it."""
+
+    def __init__(self):
+        self._last: Dict[str, StoredFrame] = {}
+        self._loaded: set = set()
+
+    async def _last_stored(self, camera_name: str) -> Optional[StoredFrame]:
+        if camera_name not in self._loaded:
+            self._loaded.add(camera_name)
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(CameraFrame)
+                    .where(CameraFrame.device_key == camera_name)
+                    .where(CameraFrame.perceptual_hash.is_not(None))
+                    .order_by(CameraFrame.timestamp.desc())
+                    .limit(1)
+                )
+                frame = result.scalar_one_or_none()
+            if frame is not None and camera_name not in self._last:
+                self._last[camera_name] = StoredFrame(
+                    relative_path=frame.file_path,
+                    content_hash=frame.content_hash,
+                    perceptual_hash=frame.perceptual_hash,
+                    file_size=frame.file_size or 0,
+                    width=frame.width,
+                    height=frame.height,
+                )
+        return self._last.get(camera_name)
+
+    async def match_previous(self, camera_name: str, phash: Optional[str]) -> Optional[StoredFrame]:
+        """The camera's last stored blob if ``phash`` is close enough to reuse it."""
+        if not settings.frame_dedupe_enabled or phash is None:
+            return None
+        previous = await self._last_stored(camera_name)
+        if previous is None or previous.perceptual_hash is None:
+            return None
+        if hamming_distance(phash, previous.perceptual_hash) > settings.frame_dedupe_max_distance:
+            return None
+        # Only checked when linking; the blob may have been removed by hand
+        if not await asyncio.to_thread(os.path.exists, os.path.join("/app", previous.relative_path)):
+            self.forget(previous.relative_path)
+            return None
+        return previous
+
+    def remember(self, camera_name: str, stored: StoredFrame) -> None:
+        self._last[camera_name] = stored
+
+    def forget(self, relative_path: str) -> None:
+        """Stop linking to a blob that cleanup deleted."""
+        for camera_name in [c for c, s in self._last.items() if s.relative_path == relative_path]:
+            del self._last[camera_name]
+
+
+frame_store = FrameStore()
@@ -68,6 +68,34 @@ async def upsert_device(
         return device
 
 
+async def deactivate_device(device_key: str, metadata: Optional[str] = None) -> Optional[Device]:
+    """Mark one device inactive right away and notify WebSocket clients."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(Device).where(Device.device_key == device_key)
+        )
+        device = result.scalar_one_or_none()
+        if device is None:
+            return None
+
+        device.is_active = False
+        if metadata is not None and metadata != device.device_meta:
+            device.device_meta = metadata
+        await session.commit()
+
+        try:
+            await event_broker.publish({
+                'type': 'device',
+                'device_id': device.device_key,
+                'is_active': False,
+                'last_seen': epoch_millis(device.last_seen) if device.last_seen else None,
+            })
+        except Exception as e:
+            logger.debug(f"Failed to publish device event for {device.device_key}: {e}")
+
+        return device
+
+
 async def sync_device_metrics(
     device_id: int,
     metric_defs: Sequence[Dict[str, Optional[str]]],
@@ -0,0 +1,252 @@
+"""Timelapse clips assembled from stored camera frames.
+
+Frames in the requested range are fed to a single ffmpeg run through the
+concat demuxer and encoded to H.264 (MP4) or VP9 (WebM). Finished clips are
+cached on disk keyed by camera, fps, format, size and the frames the range
+resolved to, so repeat requests (including "last 7 days" ranges that shift
+slightly between calls but cover the same frames) are served from the file.
+"""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+from datetime import datetime
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import select
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..models import CameraFrame
+from .frame_capture import FRAME_SIZES, derivative_path
+
+TIMELAPSE_FORMATS = {
+    "mp4": ("video/mp4", ["-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
+                          "-pix_fmt", "yuv420p", "-movflags", "+faststart"]),
+    "webm": ("video/webm", ["-c:v", "libvpx-vp9", "-b:v", "0", "-crf", "35",
+                            "-row-mt", "1", "-pix_fmt", "yuv420p"]),
+}
+
+# Only one encode at a time; timelapse builds are CPU heavy
+_build_semaphore = asyncio.Semaphore(1)
+
+
+@dataclass
+class _BuildLock:
+    lock: asyncio.Lock
+    users: int = 0
+
+
+# Per-clip locks, dropped when the last request for the clip is done with them
+_build_locks: Dict[str, _BuildLock] = {}
+
+
+class TimelapseError(RuntimeError):
+    """Raised when a clip cannot be produced for the request."""
+
+
+class NoFramesError(TimelapseError):
+    """The requested range has no usable frames."""
+
+
+def _frame_source(frame: CameraFrame, size: str) -> Optional[str]:
+    full_path = os.path.join("/app", frame.file_path)
+    for candidate in FRAME_SIZES[FRAME_SIZES.index(size):]:
+        path = derivative_path(full_path, candidate)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _size_width(size: str) -> int:
+    """Configured width of a derivative size; 0 for full frames (or a disabled size)."""
+    return {"thumb": settings.frame_thumbnail_width, "medium": settings.frame_medium_width}.get(size, 0)
+
+
+def _output_size(frames: List[CameraFrame], size: str) -> Optional[Tuple[int, int]]:
+    """Even (width, height) every frame is scaled to, from the newest frame with known dimensions.
+
+    Frames without a derivative fall back to a larger file, so the inputs of
+    one clip can differ in size; the encoder needs them all the same.
+    """
+    for frame in reversed(frames):
+        if not frame.width or not frame.height:
+            continue
+        width = frame.width
+        limit = _size_width(size)
+        if limit > 0:
+            width = min(width, limit)
+        height = round(frame.height * width / frame.width)
+        return max(2, width // 2 * 2), max(2, height // 2 * 2)
+    return None
+
+
+def _scale_filter(output_size: Optional[Tuple[int, int]], size: str) -> str:
+    if output_size is not None:
+        width, height = output_size
+        return (
+            f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1"
+        )
+    limit = _size_width(size)
+    if limit > 0:
+        return f"scale={limit // 2 * 2}:-2"
+    # No dimensions on record: keep the first frame's size (encoders need even dimensions)
+    return "scale=trunc(iw/2)*2:trunc(ih/2)*2"
+
+
+def _sample(frames: List[CameraFrame], limit: int) -> List[CameraFrame]:
+    """Evenly thin a frame list down to ``limit`` entries, keeping first and last."""
+    if len(frames) <= limit:
+        return frames
+    if limit < 2:
+        return frames[-1:]
+    step = (len(frames) - 1) / (limit - 1)
+    return [frames[round(i * step)] for i in range(limit)]
+
+
+def _cache_key(device_key: str, fps: int, fmt: str, size: str, frames: List[CameraFrame]) -> str:
+    # The frame ids stand in for the range and change when frames are added or expire
+    parts = [device_key, str(fps), fmt, size, ",".join(str(f.id) for f in frames)]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+
+
+def _prune_cache(keep: str) -> None:
+    """Delete the oldest cached clips once the cache exceeds its size budget."""
+    directory = settings.timelapse_cache_path
+    budget = settings.timelapse_cache_max_mb * 1024 * 1024
+    try:
+        entries = [os.path.join(directory, name) for name in os.listdir(directory)]
+    except FileNotFoundError:
+        return
+    clips = sorted((p for p in entries if os.path.isfile(p)), key=os.path.getmtime)
+    total = sum(os.path.getsize(p) for p in clips)
+    for path in clips:
+        if total <= budget:
+            break
+        if path == keep:
+            continue
+        total -= os.path.getsize(path)
+        os.remove(path)
+
+
+def _write_concat_list(sources: List[str], fps: int) -> str:
+    duration = 1.0 / fps
+    fd, list_path = tempfile.mkstemp(prefix="timelapse_", suffix=".txt")
+    escaped = [source.replace("'", "'\\''") for source in sources]
+    with os.fdopen(fd, "w") as f:
+        for source in escaped:
+            f.write(f"file '{source}'\nduration {duration:.6f}\n")
+        # The concat demuxer ignores the duration of the final entry unless it is repeated
+        f.write(f"file '{escaped[-1]}'\n")
+    return list_path
+
+
+async def build_timelapse(
+    device_key: str,
+    start: datetime,
+    end: datetime,
+    *,
+    fps: int = 24,
+    fmt: str = "mp4",
+    size: str = "medium",
+) -> str:
+    """Return the path of a cached or freshly encoded timelapse clip."""
+    if fmt not in TIMELAPSE_FORMATS:
+        raise TimelapseError(f"Unsupported format {fmt}")
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(CameraFrame)
+            .where(CameraFrame.device_key == device_key)
+            .where(CameraFrame.timestamp >= start)
+            .where(CameraFrame.timestamp <= end)
+            .order_by(CameraFrame.timestamp.asc())
+        )
+        frames = _sample(list(result.scalars().all()), settings.timelapse_max_frames)
+
+    if not frames:
+        raise NoFramesError(f"No frames for camera {device_key} in the requested range")
+
+    key = _cache_key(device_key, fps, fmt, size, frames)
+    os.makedirs(settings.timelapse_cache_path, exist_ok=True)
+    output_path = os.path.join(settings.timelapse_cache_path, f"{device_key}_{key}.{fmt}")
+
+    # Concurrent requests for the same clip wait for one build
+    build_lock = _build_locks.setdefault(key, _BuildLock(asyncio.Lock()))
+    build_lock.users += 1
+    try:
+        async with build_lock.lock:
+            if os.path.exists(output_path):
+                os.utime(output_path)  # Mark as recently used for cache pruning
+                return output_path
+
+            sources = [s for s in (_frame_source(f, size) for f in frames) if s]
+            if not sources:
+                raise NoFramesError("Frame files for the requested range are missing on disk")
+
+            scale = _scale_filter(_output_size(frames, size), size)
+            async with _build_semaphore:
+                await _encode(sources, output_path, fps, fmt, scale)
+    finally:
+        build_lock.users -= 1
+        if build_lock.users == 0:
+            del _build_locks[key]
+
+    await asyncio.to_thread(_prune_cache, output_path)
+    return output_path
+
+
+async def _encode(sources: List[str], output_path: str, fps: int, fmt: str, scale: str) -> None:
+    list_path = await asyncio.to_thread(_write_concat_list, sources, fps)
+    partial_path = f"{output_path}.partial"
+    cmd = [
+        'ffmpeg',
+        '-loglevel', 'error',
+        '-f', 'concat',
+        '-safe', '0',
+        '-i', list_path,
+        '-vf', scale,
+        '-fps_mode', 'cfr',  # FFmpeg 5.1+, like the frame grabber
+        '-r', str(fps),
+        *TIMELAPSE_FORMATS[fmt][1],
+        '-f', fmt,
+        '-y',
+        partial_path,
+    ]
+
+    logger.info(f"Encoding timelapse from {len(sources)} frames -> {output_path}")
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout=settings.timelapse_timeout_seconds)
+    except BaseException as exc:
+        # Timed out, or the request was cancelled (e.g. the client went away)
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        if isinstance(exc, asyncio.TimeoutError):
+            raise TimelapseError("Timelapse encoding timed out") from None
+        raise
+    finally:
+        os.remove(list_path)
+
+    if process.returncode != 0:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise TimelapseError(f"ffmpeg failed: {stderr.decode(errors='replace')[-500:]}")
+
+    # Rename only complete files into place so readers never see a partial clip
+    os.replace(partial_path, output_path)
+
+
+def timelapse_media_type(fmt: str) -> str:
+    return TIMELAPSE_FORMATS[fmt][0]
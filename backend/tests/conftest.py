@@ -0,0 +1,28 @@
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend import database
+from backend.models import Base
+
+
+@pytest_asyncio.fixture
+async def isolated_db(tmp_path, monkeypatch):
+    """A fresh sqlite database for one test.
+
+    Rebinds ``AsyncSessionLocal`` (which services import by name) and
+    ``init_db`` to a file under ``tmp_path``, so tests can use fixed keys
+    without depending on collection order or touching the configured
+    database. Tables are dropped again afterwards.
+    """
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", future=True)
+    original = database.engine
+    monkeypatch.setattr(database, "engine", engine)
+    database.AsyncSessionLocal.configure(bind=engine)
+    await database.init_db()
+    try:
+        yield engine
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+        database.AsyncSessionLocal.configure(bind=original)
@@ -0,0 +1,138 @@
+from datetime import timedelta
+
+import pytest
+
+from backend.database import AsyncSessionLocal
+from backend.events import event_broker
+from backend.models import (
+    AutomationRuleCreate,
+    AutomationRuleUpdate,
+    Device,
+    Metric,
+    Reading,
+    RuleExecutionCreate,
+)
+from backend.services import automation_rules
+from backend.services.backtest import run_backtest
+from backend.utils.time import utc_now
+
+
+def _rule(rule_id, name, enabled=True, priority=100):
+    return AutomationRuleCreate(
+        id=rule_id,
+        name=name,
+        enabled=enabled,
+        priority=priority,
+        conditions={"all_of": [{"type": "time_range", "start": "06:00", "end": "18:00"}]},
+        actions=[{"type": "set_actuator", "device_key": "pump-1", "actuator_key": "relay1", "state": "on"}],
+    )
+
+
+@pytest.mark.asyncio
+async def test_rule_changes_bump_version_and_announce_it(isolated_db):
+    queue = await event_broker.subscribe()
+    try:
+        async with AsyncSessionLocal() as db:
+            start = await automation_rules.current_version(db)
+
+            await automation_rules.create_rule(db, _rule("crud-lights", "crud lights"))
+            with pytest.raises(ValueError):
+                await automation_rules.create_rule(db, _rule("crud-lights", "crud lights again"))
+
+            updated = await automation_rules.update_rule(
+                db, "crud-lights", AutomationRuleUpdate(enabled=False, modified_by="llm_tool")
+            )
+            assert updated.enabled is False and updated.modified_by == "llm_tool"
+            assert await automation_rules.update_rule(db, "crud-missing", AutomationRuleUpdate(enabled=True)) is None
+
+            assert await automation_rules.delete_rule(db, "crud-lights")
+            assert await automation_rules.get_rule(db, "crud-lights") is None
+            assert await automation_rules.current_version(db) == start + 3
+
+            # A deleted id can be reused
+            await automation_rules.create_rule(db, _rule("crud-lights", "crud lights"))
+            assert await automation_rules.current_version(db) == start + 4
+
+            history = await automation_rules.list_rule_versions(db, "crud-lights")
+            assert [v["version"] for v in history["versions"]] == [start + 4, start + 3, start + 2, start + 1]
+            assert [v["deleted"] for v in history["versions"]] == [False, True, False, False]
+            assert history["versions"][2]["enabled"] is False
+            assert history["versions"][2]["modified_by"] == "llm_tool"
+
+        events = [queue.get_nowait() for _ in range(queue.qsize())]
+        assert [e["version"] for e in events if e["type"] == "rules_changed"] == [
+            start + 1, start + 2, start + 3, start + 4
+        ]
+    finally:
+        event_broker.unsubscribe(queue)
+
+
+@pytest.mark.asyncio
+async def test_list_rules_filters_and_pages_in_priority_order(isolated_db):
+    async with AsyncSessionLocal() as db:
+        for i, enabled in enumerate((True, False, True)):
+            await automation_rules.create_rule(db, _rule(f"page-{i}", f"paged rule {i}", enabled, priority=i))
+
+        listed = await automation_rules.list_rules(db, search="paged", limit=2)
+        assert [r["id"] for r in listed["rules"]] == ["page-2", "page-1"]
+        assert (listed["total_count"], listed["enabled_count"]) == (3, 2)
+
+        enabled = await automation_rules.list_rules(db, search="paged", enabled=True, offset=1)
+        assert [r["id"] for r in enabled["rules"]] == ["page-0"]
+
+
+@pytest.mark.asyncio
+async def test_execution_log_is_newest_first_and_filterable(isolated_db):
+    now = utc_now()
+    async with AsyncSessionLocal() as db:
+        await automation_rules.record_executions(db, [
+            RuleExecutionCreate(rule_id="log-rule", fired_at=now - timedelta(minutes=m), duration_ms=3)
+            for m in range(5)
+        ] + [
+            RuleExecutionCreate(rule_id="log-rule", fired_at=now, outcome="error", error="boom"),
+        ])
+
+        page = await automation_rules.list_executions(db, rule_id="log-rule", limit=2, offset=1)
+        assert page["total_count"] == 6
+        assert len(page["executions"]) == 2
+        assert page["executions"][0]["fired_at"] >= page["executions"][1]["fired_at"]
+
+        errors = await automation_rules.list_executions(db, rule_id="log-rule", outcome="error")
+        assert [e["error"] for e in errors["executions"]] == ["boom"]
+
+        recent = await automation_rules.list_executions(db, rule_id="log-rule", since=now - timedelta(minutes=2, seconds=30))
+        assert recent["total_count"] == 4
+
+
+@pytest.mark.asyncio
+async def test_backtest_streams_stored_readings_of_rule_inputs_only(isolated_db):
+    start = utc_now().replace(microsecond=0) - timedelta(hours=6)
+    async with AsyncSessionLocal() as db:
+        device = Device(device_key="backtest-env", device_type="mqtt_sensor", is_active=True, last_seen=start)
+        db.add(device)
+        await db.flush()
+        level = Metric(device_id=device.id, metric_key="level", metric_type="sensor")
+        other = Metric(device_id=device.id, metric_key="temp", metric_type="sensor")
+        db.add_all([level, other])
+        await db.flush()
+        # The reading before the range seeds the state at its start
+        for hours, value in ((-1, 20), (1, 8), (2, 9), (3, 15)):
+            db.add(Reading(metric_id=level.id, timestamp=start + timedelta(hours=hours), value=value))
+            db.add(Reading(metric_id=other.id, timestamp=start + timedelta(hours=hours), value=value))
+        await db.commit()
+
+        rule = {
+            "id": "backtest-low",
+            "name": "backtest-low",
+            "enabled": False,
+            "conditions": {"all_of": [{
+                "type": "sensor_threshold", "device_key": "backtest-env", "metric_key": "level",
+                "operator": "less_than", "value": 10,
+            }]},
+            "actions": [{"type": "set_actuator", "device_key": "backtest-pump", "actuator_key": "relay1", "state": "on"}],
+        }
+        report = await run_backtest(db, [rule], start, start + timedelta(hours=4))
+
+    assert report["readings_replayed"] == 3
+    assert [f["fired_at"] for f in report["firings"]] == [(start + timedelta(hours=1)).isoformat()]
+    assert report["actuators"][0]["switches"] == 1
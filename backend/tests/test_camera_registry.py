@@ -0,0 +1,95 @@
+import httpx
+import pytest
+from fastapi import HTTPException, Request
+
+from backend.config import settings
+from backend.services.camera_registry import CameraRegistry
+
+
+def _registry_with(handler) -> CameraRegistry:
+    registry = CameraRegistry()
+    registry._client = httpx.AsyncClient(base_url="http://mediamtx", transport=httpx.MockTransport(handler))
+    return registry
+
+
+@pytest.mark.asyncio
+async def test_registry_remembers_api_version_and_diffs_paths():
+    requests = []
+    items = [
+        {"name": "camera_1", "ready": True, "readers": [], "bytesSent": 10},
+        {"name": "_internal", "ready": True},
+    ]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        if request.url.path.startswith("/v3"):
+            return httpx.Response(404)
+        return httpx.Response(200, json={"items": items})
+
+    registry = _registry_with(handler)
+
+    changed, removed = await registry.refresh()
+    assert [c.name for c in changed] == ["camera_1"]
+    assert removed == []
+    assert registry.api_version == "v2"
+
+    # Only the byte counter moved, which is not a change
+    items[0]["bytesSent"] = 5000
+    changed, _ = await registry.refresh()
+    assert changed == []
+    assert requests == ["/v3/paths/list", "/v2/paths/list", "/v2/paths/list"]
+
+    items[0]["ready"] = False
+    changed, _ = await registry.refresh()
+    assert [c.ready for c in changed] == [False]
+    assert await registry.active_paths(max_age_seconds=60) == []
+
+    items.clear()
+    _, removed = await registry.refresh()
+    assert removed == ["camera_1"]
+    await registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_hooks_update_cache_and_slow_down_polling(monkeypatch):
+    registry = CameraRegistry()
+    written = []
+
+    async def fake_write(camera):
+        written.append((camera.name, camera.ready))
+
+    monkeypatch.setattr(registry, "_write_camera", fake_write)
+    assert registry.poll_interval == settings.sensor_heartbeat_interval
+
+    await registry.apply_hook("camera_2", ready=True)
+    assert registry.ready_paths() == ["camera_2"]
+    assert registry.poll_interval == settings.camera_reconcile_interval_seconds
+
+    await registry.apply_hook("camera_2", ready=False)
+    assert await registry.apply_hook("_system", ready=True) is None
+    assert registry.ready_paths() == []
+    assert written == [("camera_2", True), ("camera_2", False)]
+
+
+@pytest.mark.asyncio
+async def test_readiness_hook_needs_token_or_loopback(monkeypatch):
+    from backend import api
+
+    async def fake_apply_hook(path, ready):
+        return None
+
+    monkeypatch.setattr(api.camera_registry, "apply_hook", fake_apply_hook)
+
+    def request(host):
+        return Request({"type": "http", "client": (host, 50000)})
+
+    monkeypatch.setattr(settings, "mediamtx_hook_token", None)
+    assert (await api.mediamtx_readiness_hook("ready", request("127.0.0.1"), path="camera_1"))["ready"]
+    with pytest.raises(HTTPException) as rejected:
+        await api.mediamtx_readiness_hook("ready", request("10.0.0.7"), path="camera_1")
+    assert rejected.value.status_code == 403
+
+    monkeypatch.setattr(settings, "mediamtx_hook_token", "s3cret")
+    await api.mediamtx_readiness_hook("not-ready", request("10.0.0.7"), path="camera_1", token="s3cret")
+    with pytest.raises(HTTPException):
+        await api.mediamtx_readiness_hook("ready", request("127.0.0.1"), path="camera_1", token="")
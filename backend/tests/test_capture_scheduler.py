@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from backend.services import capture_scheduler as scheduler_module
+from backend.services import frame_capture
+from backend.services.capture_scheduler import CaptureScheduler, LatencyHistogram
+
+
+@pytest.mark.asyncio
+async def test_run_cycle_limits_concurrency_and_backs_off_failures(monkeypatch):
+    running = 0
+    peak = 0
+
+    async def fake_capture(camera_name):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return None if camera_name == "camera_broken" else object()
+
+    monkeypatch.setattr(scheduler_module, "capture_frame_for_camera", fake_capture)
+    scheduler = CaptureScheduler(max_workers=2)
+    cameras = ["camera_1", "camera_2", "camera_3", "camera_broken"]
+
+    first = await scheduler.run_cycle(cameras)
+    assert (first["captured"], first["failed"]) == (3, 1)
+    assert peak == 2
+
+    # The failing camera sits out the next cycle while in backoff
+    second = await scheduler.run_cycle(cameras)
+    assert (second["captured"], second["skipped"]) == (3, 1)
+    assert scheduler.status()["latency"]["count"] == 6
+
+
+def test_latency_histogram_is_cumulative():
+    histogram = LatencyHistogram(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 5.0):
+        histogram.observe(seconds)
+    assert histogram.to_dict()["buckets"] == {"0.1": 1, "1.0": 2, "+Inf": 3}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_capture_kills_ffmpeg(tmp_path, monkeypatch):
+    spawned = []
+    real_exec = asyncio.create_subprocess_exec
+
+    async def fake_exec(*cmd, **kwargs):
+        # Stands in for an ffmpeg that never gets a frame from the camera
+        process = await real_exec("sleep", "30", **kwargs)
+        spawned.append(process)
+        return process
+
+    monkeypatch.setattr(frame_capture.asyncio, "create_subprocess_exec", fake_exec)
+    task = asyncio.create_task(frame_capture.capture_single_frame("camera_1", str(tmp_path / "f.webp"), timeout=60))
+    while not spawned:
+        await asyncio.sleep(0.01)
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert spawned[0].returncode is not None
@@ -0,0 +1,56 @@
+import pytest
+
+from agents.gardener.automation_runner import AutomationEngine
+from backend.database import AsyncSessionLocal
+from backend.models import AutomationRuleCreate, Device, Metric
+from backend.mqtt_client import mqtt_client
+from backend.services import automation_rules
+from backend.services.automation import EmbeddedHydroClient
+from backend.utils.time import utc_now
+
+
+@pytest.mark.asyncio
+async def test_embedded_engine_reads_cache_and_publishes_batch(tmp_path, monkeypatch, isolated_db):
+    async with AsyncSessionLocal() as session:
+        device = Device(device_key="embedded-pump", device_type="mqtt_sensor", is_active=True, last_seen=utc_now())
+        session.add(device)
+        await session.flush()
+        for key, mode in (("relay1", "auto"), ("relay2", "manual")):
+            session.add(Metric(device_id=device.id, metric_key=key, metric_type="actuator", control_mode=mode))
+        await session.commit()
+
+    published = []
+
+    async def fake_publish(device_id, controls):
+        published.append((device_id, [(c.actuator_key, c.state) for c in controls]))
+
+    monkeypatch.setattr(mqtt_client, "publish_actuator_batch", fake_publish)
+    monkeypatch.setitem(mqtt_client.values_cache, "embedded-env", {"level": 5})
+    monkeypatch.setitem(mqtt_client.values_cache, "embedded-pump", {"relay1": "off", "relay2": "off"})
+
+    async with AsyncSessionLocal() as session:
+        await automation_rules.create_rule(session, AutomationRuleCreate(
+            id="embedded-low-level",
+            name="low-level",
+            enabled=True,
+            conditions={"all_of": [{
+                "type": "sensor_threshold", "device_key": "embedded-env", "metric_key": "level",
+                "operator": "less_than", "value": 10,
+            }]},
+            actions=[
+                {"type": "set_actuator", "device_key": "embedded-pump", "actuator_key": "relay1", "state": "on"},
+                {"type": "set_actuator", "device_key": "embedded-pump", "actuator_key": "relay2", "state": "on"},
+            ],
+        ))
+
+    engine = AutomationEngine(EmbeddedHydroClient(), state_path=tmp_path / "automation_state.json")
+    await engine.run_once()
+
+    # relay2 is in manual mode, so only relay1 is commanded
+    assert published == [("embedded-pump", [("relay1", "on")])]
+
+    # The firing is in the execution log
+    async with AsyncSessionLocal() as session:
+        log = await automation_rules.list_executions(session, rule_id="embedded-low-level")
+    assert log["total_count"] == 1
+    assert log["executions"][0]["outcome"] == "success"
@@ -0,0 +1,36 @@
+import asyncio
+import struct
+
+import pytest
+
+from backend.services.frame_grabber import FrameGrabber, webp_dimensions
+
+
+def _fake_webp(width: int, height: int, payload: bytes = b"") -> bytes:
+    # Minimal lossy WebP: VP8 chunk with a keyframe header carrying dimensions
+    vp8 = b"\x00" * 6 + struct.pack("<HH", width, height) + payload
+    chunk = b"VP8 " + struct.pack("<I", len(vp8)) + vp8
+    body = b"WEBP" + chunk
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def test_webp_dimensions_reads_vp8_header():
+    assert webp_dimensions(_fake_webp(1920, 1080)) == (1920, 1080)
+    assert webp_dimensions(b"not an image") == (None, None)
+
+
+@pytest.mark.asyncio
+async def test_grabber_splits_concatenated_webp_stream():
+    grabber = FrameGrabber("camera_1", "rtsp://example/camera_1")
+    reader = asyncio.StreamReader()
+    first, second = _fake_webp(640, 480, b"a"), _fake_webp(800, 600, b"bc")
+    reader.feed_data(first + second)
+    reader.feed_eof()
+
+    with pytest.raises(asyncio.IncompleteReadError):
+        await grabber._read_frames(reader)
+
+    frame = grabber.latest()
+    assert grabber.frames_received == 2
+    assert frame.data == second
+    assert (frame.width, frame.height) == (800, 600)
@@ -0,0 +1,47 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from backend.database import AsyncSessionLocal
+from backend.models import CameraFrame
+from backend.services.frame_index import FrameIndex, _CameraFrames
+from backend.utils.time import utc_now
+
+
+def test_nearest_frame_directions():
+    frames = _CameraFrames([(100.0, 1), (200.0, 2), (300.0, 3)])
+
+    assert frames.ids[frames.nearest(250.0, "before")] == 2
+    assert frames.ids[frames.nearest(250.0, "after")] == 3
+    assert frames.ids[frames.nearest(240.0, "closest")] == 2
+    assert frames.ids[frames.nearest(200.0, "before")] == 2
+    assert frames.nearest(50.0, "before") is None
+    assert frames.nearest(350.0, "after") is None
+
+
+def test_index_add_and_trim_keep_order():
+    frames = _CameraFrames([(100.0, 1), (300.0, 3)])
+    frames.add(400.0, 4)
+    frames.add(200.0, 2)
+    assert frames.ids == [1, 2, 3, 4]
+
+    frames.trim_before(250.0)
+    assert frames.ids == [3, 4]
+
+
+@pytest.mark.asyncio
+async def test_frames_saved_during_the_initial_load_are_kept(isolated_db):
+    index = FrameIndex()
+    start = utc_now() - timedelta(minutes=10)
+    async with AsyncSessionLocal() as db:
+        db.add(CameraFrame(device_key="race_cam", timestamp=start, file_path="blobs/race0.webp"))
+        await db.commit()
+
+    load = asyncio.create_task(index.nearest_ids("race_cam", [utc_now()], "before"))
+    await asyncio.sleep(0)
+    # Committed after the SELECT started: it may be missing from its result
+    index.add("race_cam", start + timedelta(minutes=5), 999)
+
+    assert await load == [999]
+    assert index._pending == {}
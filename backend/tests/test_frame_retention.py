@@ -0,0 +1,55 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from backend.config import settings
+from backend.database import AsyncSessionLocal
+from backend.models import CameraFrame
+from backend.services import frame_retention
+from backend.utils.time import utc_now
+
+
+def test_expired_day_directories_are_removed_whole(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "frame_storage_path", str(tmp_path))
+    for name in ("2024-01-01", "2024-01-05", "blobs"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "cam.webp").write_bytes(b"x")
+
+    assert frame_retention._remove_expired_date_dirs(date(2024, 1, 5)) == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["2024-01-05", "blobs"]
+
+    assert frame_retention._expired_date_dir("data/camera_frames/2024-01-01/cam.webp", date(2024, 1, 5))
+    assert not frame_retention._expired_date_dir("data/camera_frames/blobs/ab/abc.webp", date(2024, 1, 5))
+
+
+@pytest.mark.asyncio
+async def test_cleanup_deletes_in_batches_and_keeps_shared_files(tmp_path, monkeypatch, isolated_db):
+    monkeypatch.setattr(settings, "frame_storage_path", str(tmp_path))
+    monkeypatch.setattr(settings, "frame_retention_days", 1)
+
+    old = utc_now() - timedelta(days=3)
+    async with AsyncSessionLocal() as db:
+        for i in range(5):
+            db.add(CameraFrame(device_key="retention_cam", timestamp=old, file_path=f"blobs/old{i}.webp"))
+        # A recent frame deduplicated onto an old blob keeps that file alive
+        db.add(CameraFrame(device_key="retention_cam", timestamp=utc_now(), file_path="blobs/old0.webp"))
+        await db.commit()
+
+    deleted_paths = []
+    monkeypatch.setattr(
+        frame_retention, "_delete_frame_files", lambda paths: deleted_paths.extend(paths) or len(paths)
+    )
+
+    progress = await frame_retention.cleanup_old_frames(batch_size=2)
+
+    assert progress["running"] is False
+    assert progress["batches"] == 3
+    assert progress["rows_deleted"] == 5
+    assert sorted(deleted_paths) == [f"blobs/old{i}.webp" for i in range(1, 5)]
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(CameraFrame.file_path).where(CameraFrame.device_key == "retention_cam")
+        )
+        assert result.scalars().all() == ["blobs/old0.webp"]
@@ -1,23 +1,13 @@
-import os
-
 import pytest
 
-DB_PATH = "test_gardener.db"
-if os.path.exists(DB_PATH):
-    os.remove(DB_PATH)
-
-os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///./{DB_PATH}"
-
-from backend.api import get_latest_readings  # noqa: E402
-from backend.database import AsyncSessionLocal, init_db  # noqa: E402
-from backend.models import Device, Metric, Reading  # noqa: E402
-from backend.utils.time import utc_now  # noqa: E402
+from backend.api import get_latest_readings
+from backend.database import AsyncSessionLocal
+from backend.models import Device, Metric, Reading
+from backend.utils.time import utc_now
 
 
 @pytest.mark.asyncio
-async def test_latest_readings_endpoint_returns_metric_snapshot():
-    await init_db()
-
+async def test_latest_readings_endpoint_returns_metric_snapshot(isolated_db):
     async with AsyncSessionLocal() as session:
         device = Device(
             device_key="env-1",
@@ -0,0 +1,76 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from backend.config import settings
+from backend.database import AsyncSessionLocal
+from backend.models import CameraFrame
+from backend.services import timelapse
+from backend.utils.time import utc_now
+
+
+def test_frames_are_scaled_to_one_even_size(monkeypatch):
+    monkeypatch.setattr(settings, "frame_medium_width", 960)
+    frames = [
+        CameraFrame(width=None, height=None),
+        CameraFrame(width=1920, height=1081),
+        CameraFrame(width=None, height=None),
+    ]
+
+    assert timelapse._output_size(frames, "medium") == (960, 540)
+    assert timelapse._output_size(frames, "full") == (1920, 1080)
+    assert timelapse._output_size(frames[:1], "medium") is None
+    assert timelapse._scale_filter(None, "medium") == "scale=960:-2"
+    assert timelapse._scale_filter((960, 540), "medium").startswith("scale=960:540:")
+
+
+@pytest.mark.asyncio
+async def test_waiters_reuse_the_build_lock_after_a_failed_build(tmp_path, monkeypatch, isolated_db):
+    monkeypatch.setattr(settings, "timelapse_cache_path", str(tmp_path))
+    start = utc_now() - timedelta(hours=1)
+    async with AsyncSessionLocal() as db:
+        for minutes in range(3):
+            db.add(CameraFrame(
+                device_key="lapse_cam", timestamp=start + timedelta(minutes=minutes),
+                file_path=f"blobs/lapse{minutes}.webp", width=640, height=480,
+            ))
+        await db.commit()
+
+    running = 0
+    overlapped = False
+    attempts = 0
+
+    async def fake_encode(sources, output_path, fps, fmt, scale):
+        nonlocal running, overlapped, attempts
+        attempts += 1
+        running += 1
+        overlapped = overlapped or running > 1
+        await asyncio.sleep(0.01)
+        running -= 1
+        if attempts == 1:
+            raise timelapse.TimelapseError("ffmpeg failed")
+        with open(output_path, "wb") as f:
+            f.write(b"clip")
+
+    monkeypatch.setattr(timelapse, "_encode", fake_encode)
+    monkeypatch.setattr(timelapse, "_frame_source", lambda frame, size: frame.file_path)
+    # Admit two encodes at once, so only the per-clip lock keeps builds of one clip apart
+    monkeypatch.setattr(timelapse, "_build_semaphore", asyncio.Semaphore(2))
+
+    async def request():
+        return await timelapse.build_timelapse("lapse_cam", start, utc_now())
+
+    first = asyncio.create_task(request())
+    await asyncio.sleep(0)
+    second = asyncio.create_task(request())
+    await asyncio.sleep(0)
+    with pytest.raises(timelapse.TimelapseError):
+        await first
+    # A request arriving after the failure must queue behind the second one
+    third = asyncio.create_task(request())
+
+    assert await second == await third
+    assert attempts == 2
+    assert not overlapped
+    assert timelapse._build_locks == {}